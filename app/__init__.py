@@ -1,11 +1,17 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
+from app.clients.http_transport import http_transport
+from app.config import market_role
 from app.errors.exception_handler import general_exception_handler
+from app.market.funding_store import funding_store
+from app.market.market_data import market_data_service
+from app.market.spread_history import spread_recorder
 from app.middlewares import auth_middleware
 from app.routers.auth import router as auth_router
 from app.routers.watch import router as watch_router
@@ -17,7 +23,26 @@ init_app_log(debugMode)
 logging.getLogger("gunicorn").propagate = False
 logging.getLogger("uvicorn").propagate = False
 
-fast_app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # 后台 ws 行情
+    await market_data_service.start()
+    # 资金费率, reader 读取采集进程发布的结果, 不访问交易所
+    if market_role != "reader":
+        funding_store.start()
+    # 差价历史, reader 由采集进程记录, 只查询
+    if market_role == "standalone":
+        spread_recorder.start()
+    yield
+    await spread_recorder.stop()
+    await funding_store.stop()
+    await market_data_service.stop()
+    await http_transport.aclose()
+
+
+fast_app = FastAPI(lifespan=lifespan)
 
 fast_app.include_router(watch_router)
 fast_app.include_router(auth_router)
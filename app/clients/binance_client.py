@@ -5,6 +5,10 @@ import hmac
 from urllib.parse import urlencode
 import httpx
 
+from app.clients.http_transport import http_transport
+from app.clients.rate_limiter import rate_limits
+from app.config import binance_um_base_url
+
 
 class BinanceF:
     """币安合约"""
@@ -13,13 +17,15 @@ class BinanceF:
         self,
         api_key: str | None = None,
         api_secret: str | None = None,
-        base_url: str = "https://fapi.binance.com",
+        base_url: str = binance_um_base_url,
     ):
         self.api_key = api_key
         self.api_secret = api_secret
         self.base_url = base_url
 
-        self.session = httpx.AsyncClient()
+        # 同一 host 的所有实例共享长连接池
+        self.session = http_transport.async_client(base_url)
+        self.limiter = rate_limits.get(base_url)
 
         # resend the request
         self.err_codes_resend = [-1000, -1001, -1021, -5028, -2010, -2011, -2022]
@@ -27,8 +33,8 @@ class BinanceF:
         self.err_codes_stop = [-2013, -4046, -4059, -5026, -5027]
 
     async def close(self):
-        if self.session:
-            await self.session.aclose()
+        # 连接池由 http_transport 统一管理, 服务关闭时释放
+        pass
 
     def _hash(self, query: str):
         if not self.api_secret:
@@ -42,7 +48,12 @@ class BinanceF:
         return int(datetime.now(timezone.utc).timestamp() * 1000)
 
     async def _send_signed(
-        self, http_method, path, params: dict = {}, full_log: bool = True
+        self,
+        http_method,
+        path,
+        params: dict = {},
+        full_log: bool = True,
+        weight: int = 1,
     ):
         headers = {
             "X-MBX-APIKEY": self.api_key,
@@ -73,7 +84,7 @@ class BinanceF:
             }
 
             try:
-                res = await self.session.request(**req_args)
+                res = await self._request(path, weight, **req_args)
             except httpx.TimeoutException:
                 Lg.error(f"request timeout, args: {req_args}")
                 continue
@@ -104,7 +115,7 @@ class BinanceF:
             if i == times_retry - 1:
                 Lg.error("request failed, reached the max retry times")
 
-    async def _send_public(self, path, params: dict = {}):
+    async def _send_public(self, path, params: dict = {}, weight: int = 1):
         url_params = urlencode(params, True)
         url = self.base_url + path
         if url_params:
@@ -117,7 +128,7 @@ class BinanceF:
         times_retry = 5
         for i in range(times_retry):
             try:
-                res = await self.session.get(**req_args)
+                res = await self._request(path, weight, method="GET", **req_args)
                 if res.status_code == 200:
                     return res
                 else:
@@ -130,6 +141,16 @@ class BinanceF:
             if i == times_retry - 1:
                 Lg.error("request failed, reached the max retry times")
 
+    async def _request(self, path: str, weight: int, **req_args) -> httpx.Response:
+        """按限速规则排队后发送, 并根据响应头校正剩余额度"""
+        if self.limiter:
+            await self.limiter.acquire(path, weight)
+
+        res = await self.session.request(**req_args)
+        if self.limiter:
+            self.limiter.on_response(path, res.status_code, res.headers)
+        return res
+
     async def listen_key(self) :
         """获取listenKey
 
@@ -3,19 +3,26 @@ import asyncio
 import json
 from typing import Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 import websockets
 
 from app.clients.binance_client import BinanceF
+from app.config import binance_spot_ws_base_url, binance_um_ws_base_url
 from app.utils.log_util import Lg
 
 class WsHandle(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     ws: websockets.ClientConnection
     id: str
 
 
 class BinanceWsF:
     """币安合约 ws"""
+
+    ws_base_url = binance_um_ws_base_url
+    market_name = "合约"
+
     def __init__(self, api_key: str | None = None, api_secret: str | None = None):  
         # 公共行情频道ws连接, 一个策略, 可能有多个
         self.ws_public: list[WsHandle] = []
@@ -68,7 +75,7 @@ class BinanceWsF:
         retry_times = 5
         for i in range(retry_times):
             try:
-                async with websockets.connect(f"wss://fstream.binance.com/ws/{listen_key}", ping_interval=None) as ws_account:
+                async with websockets.connect(f"{self.ws_base_url}/ws/{listen_key}", ping_interval=None) as ws_account:
                     self.ws_account = ws_account
 
                     # 保持心跳
@@ -96,21 +103,26 @@ class BinanceWsF:
         for i in range(retry_times):
         
             try:
-                async with websockets.connect(f"wss://fstream.binance.com/stream", ping_interval=None) as ws:
-                    self.ws_public.append({"ws": ws, "id": args["id"]})
-
-                    asyncio.create_task(self.pong_ws(ws))
-
-                    await ws.send(json.dumps(args))
-                    Lg.info("币安: 合约公共频道订阅成功")
-
-                    while 1:
-                        res = json.loads(await ws.recv())
-                        if "result" in res:
-                            Lg.info(res)
-                            continue
-
-                        callback(res)
+                async with websockets.connect(f"{self.ws_base_url}/stream", ping_interval=None) as ws:
+                    handle = WsHandle(ws=ws, id=str(args["id"]))
+                    self.ws_public = [*self.ws_public, handle]
+                    pong = asyncio.create_task(self.pong_ws(ws))
+
+                    try:
+                        await ws.send(json.dumps(args))
+                        Lg.info(f"币安: {self.market_name}公共频道订阅成功")
+
+                        while 1:
+                            res = json.loads(await ws.recv())
+                            if "result" in res:
+                                Lg.info(res)
+                                continue
+
+                            callback(res)
+                    finally:
+                        # 连接结束 (断开重连 / 关闭) 时移除, 不随重连次数累积; 整体替换列表, 不影响 close 中的遍历
+                        self.ws_public = [h for h in self.ws_public if h is not handle]
+                        pong.cancel()
 
             except websockets.ConnectionClosed as e:
                 if self.closed_normally:
@@ -120,3 +132,10 @@ class BinanceWsF:
                     Lg.error(e)
                     Lg.info(f"币安public频道连接断开，正在第{i+1}次重连.....")
                     continue
+
+
+class BinanceWsS(BinanceWsF):
+    """币安现货 ws, 仅用于公共行情"""
+
+    ws_base_url = binance_spot_ws_base_url
+    market_name = "现货"
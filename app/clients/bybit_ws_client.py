@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import websockets
+
+from app.config import bybit_ws_base_url
+from app.utils.log_util import Lg
+
+
+class BybitWs:
+    """Bybit v5 ws, 仅用于公共行情"""
+
+    ws_base_url = bybit_ws_base_url
+
+    # 现货单条订阅消息最多 10 个 topic
+    args_per_msg = 10
+
+    def __init__(self, category: str):
+        # spot / linear
+        self.category = category
+
+        self.ws_public: list[websockets.ClientConnection] = []
+
+        # 是否正常被用户关闭
+        self.closed_normally = False
+
+    async def close(self):
+        self.closed_normally = True
+
+        for ws in self.ws_public:
+            if ws.state == websockets.State.OPEN:
+                await ws.close()
+
+    async def ping_ws(self, ws):
+        """官方建议每 20s 发送一次心跳"""
+        while 1:
+            try:
+                await asyncio.sleep(20)
+                await ws.send(json.dumps({"op": "ping"}))
+            except Exception as e:
+                Lg.error(f"bybit ws ping error: {e}")
+                break
+
+    async def subscribe_public(self, topics: list[str], callback):
+        """订阅公共行情
+
+        Args:
+            topics: eg. ["orderbook.1.BTCUSDT"]
+            callback: 收到推送数据时调用, 参数为整条推送消息
+        """
+        retry_times = 5
+        for i in range(retry_times):
+            try:
+                async with websockets.connect(
+                    f"{self.ws_base_url}/v5/public/{self.category}", ping_interval=None
+                ) as ws:
+                    self.ws_public = [*self.ws_public, ws]
+                    ping = asyncio.create_task(self.ping_ws(ws))
+
+                    try:
+                        for j in range(0, len(topics), self.args_per_msg):
+                            await ws.send(
+                                json.dumps(
+                                    {
+                                        "op": "subscribe",
+                                        "args": topics[j : j + self.args_per_msg],
+                                    }
+                                )
+                            )
+                        Lg.info(f"Bybit: {self.category} 公共频道订阅成功, topic 数 {len(topics)}")
+
+                        while 1:
+                            res = json.loads(await ws.recv())
+                            if "op" in res:
+                                if res.get("success") is False:
+                                    Lg.error(f"Bybit 订阅失败: {res}")
+                                continue
+
+                            callback(res)
+                    finally:
+                        # 连接结束 (断开重连 / 关闭) 时移除, 不随重连次数累积; 整体替换列表, 不影响 close 中的遍历
+                        self.ws_public = [w for w in self.ws_public if w is not ws]
+                        ping.cancel()
+
+            except websockets.ConnectionClosed as e:
+                if self.closed_normally:
+                    Lg.info("Bybit public频道连接正常关闭")
+                    break
+                else:
+                    Lg.error(e)
+                    Lg.info(f"Bybit public频道连接断开，正在第{i+1}次重连.....")
+                    continue
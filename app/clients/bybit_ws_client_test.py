@@ -0,0 +1,52 @@
+import asyncio
+
+import websockets
+
+from app.clients import bybit_ws_client
+from app.clients.bybit_ws_client import BybitWs
+
+
+class FakeWs:
+    """第一次 recv 时连接断开"""
+
+    state = websockets.State.OPEN
+
+    def __init__(self, on_recv):
+        self.on_recv = on_recv
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send(self, msg):
+        pass
+
+    async def recv(self):
+        self.on_recv()
+        raise websockets.ConnectionClosed(None, None)
+
+
+def test_reconnect_releases_handle(monkeypatch):
+    client = BybitWs("spot")
+    sizes = []
+
+    def on_recv():
+        sizes.append(len(client.ws_public))
+        if len(sizes) == 3:
+            client.closed_normally = True
+
+    monkeypatch.setattr(
+        bybit_ws_client.websockets, "connect", lambda *a, **kw: FakeWs(on_recv)
+    )
+
+    async def run():
+        await client.subscribe_public(["orderbook.1.BTCUSDT"], lambda msg: None)
+        # ping 任务随连接一起取消
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert sizes == [1, 1, 1]
+    assert client.ws_public == []
@@ -0,0 +1,135 @@
+import asyncio
+import importlib.util
+import threading
+from typing import Any
+
+import httpx
+
+from app.clients.rate_limiter import rate_limits
+from app.config import (
+    http2_enabled,
+    http_pool_keepalive_expiry_s,
+    http_pool_max_connections,
+    http_pool_max_keepalive,
+    http_timeout_s,
+)
+from app.utils.log_util import Lg
+
+
+class HttpTransport:
+    """所有交易所 rest 请求共享的长连接池
+
+    每个 host (base_url) 一个长期存活的异步 client, 连接复用, 省去每次请求的 tcp/tls 握手.
+    请求经过 rate_limits 调度, 相同的并发 GET 请求合并为一次
+    """
+
+    def __init__(
+        self,
+        http2: bool = http2_enabled,
+        max_connections: int = http_pool_max_connections,
+        max_keepalive: int = http_pool_max_keepalive,
+        keepalive_expiry_s: float = http_pool_keepalive_expiry_s,
+        timeout_s: float = http_timeout_s,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            Lg.warning("h2 未安装, http/2 不可用, 使用 http/1.1")
+            http2 = False
+
+        self.http2 = http2
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self.timeout = httpx.Timeout(timeout_s)
+
+        self._async_clients: dict[str, httpx.AsyncClient] = {}
+        # (base_url, path, params) -> 进行中的请求
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def async_client(self, base_url: str) -> httpx.AsyncClient:
+        """client 绑定到首次使用时的事件循环, 只应在服务的事件循环中使用"""
+        client = self._async_clients.get(base_url)
+        if client is None:
+            with self._lock:
+                client = self._async_clients.get(base_url)
+                if client is None:
+                    client = self._async_clients[base_url] = httpx.AsyncClient(
+                        base_url=base_url,
+                        http2=self.http2,
+                        limits=self.limits,
+                        timeout=self.timeout,
+                    )
+        return client
+
+    async def aget_json(
+        self,
+        base_url: str,
+        path: str,
+        params: dict | None = None,
+        weight: int = 1,
+    ) -> Any:
+        """
+        weight: 交易所规定的请求权重, 用于限速
+        返回的结果可能被并发的相同请求共享, 不要修改
+        """
+        params = _clean(params)
+        key = (base_url, path, tuple(sorted(params.items())) if params else ())
+
+        loading = self._inflight.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._get(base_url, path, params, weight))
+            self._inflight[key] = loading
+            loading.add_done_callback(lambda f: self._done(key, f))
+
+        return await asyncio.shield(loading)
+
+    async def _get(
+        self, base_url: str, path: str, params: dict | None, weight: int
+    ) -> Any:
+        limiter = rate_limits.get(base_url)
+        if limiter:
+            await limiter.acquire(path, weight)
+
+        res = await self.async_client(base_url).get(path, params=params)
+        if limiter:
+            limiter.on_response(path, res.status_code, res.headers)
+        return _parse(res)
+
+    def _done(self, key: tuple, loading: asyncio.Future):
+        if self._inflight.get(key) is loading:
+            del self._inflight[key]
+        if not loading.cancelled():
+            loading.exception()
+
+    async def aclose(self):
+        with self._lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+
+
+def _clean(params: dict | None) -> dict | None:
+    """去掉值为 None 的参数"""
+    if not params:
+        return None
+    return {k: v for k, v in params.items() if v is not None}
+
+
+class HttpStatusError(Exception):
+    """交易所返回非 200, text 为响应体, eg. 币安 {"code":-1121,"msg":"Invalid symbol."}"""
+
+    def __init__(self, status_code: int, url: str, text: str):
+        super().__init__(f"<{status_code}> {url}: {text[:200]}")
+        self.status_code = status_code
+        self.text = text
+
+
+def _parse(res: httpx.Response) -> Any:
+    if res.status_code != 200:
+        raise HttpStatusError(res.status_code, str(res.request.url), res.text)
+    return res.json()
+
+
+http_transport = HttpTransport()
@@ -0,0 +1,55 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.clients.http_transport import HttpTransport, _parse
+
+
+def test_client_shared_per_host():
+    transport = HttpTransport(http2=False)
+    a = transport.async_client("https://api.binance.com")
+    assert transport.async_client("https://api.binance.com") is a
+    assert transport.async_client("https://fapi.binance.com") is not a
+
+    asyncio.run(transport.aclose())
+    assert transport.async_client("https://api.binance.com") is not a
+    asyncio.run(transport.aclose())
+
+
+def test_parse():
+    req = httpx.Request("GET", "https://api.binance.com/api/v3/ticker/bookTicker")
+    assert _parse(httpx.Response(200, json=[{"symbol": "BTCUSDT"}], request=req)) == [
+        {"symbol": "BTCUSDT"}
+    ]
+
+    with pytest.raises(Exception, match="<429>"):
+        _parse(httpx.Response(429, json={"code": -1003}, request=req))
+
+
+def test_coalesce_identical_requests():
+    calls = []
+
+    async def handler(request: httpx.Request):
+        calls.append(str(request.url))
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"ok": 1})
+
+    async def main():
+        transport = HttpTransport(http2=False)
+        transport._async_clients["http://x"] = httpx.AsyncClient(
+            base_url="http://x", transport=httpx.MockTransport(handler)
+        )
+        res = await asyncio.gather(
+            *(
+                transport.aget_json("http://x", "/t", {"b": 1, "a": None})
+                for _ in range(5)
+            ),
+            transport.aget_json("http://x", "/t", {"b": 2}),
+        )
+        await transport.aclose()
+        return res
+
+    res = asyncio.run(main())
+    assert res[0] == {"ok": 1}
+    assert len(calls) == 2
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import websockets
+
+from app.config import okx_ws_base_url
+from app.utils.log_util import Lg
+
+
+class OkxWs:
+    """欧易 ws, 仅用于公共行情"""
+
+    ws_base_url = okx_ws_base_url
+
+    # 单条订阅消息携带的频道数, 消息长度不能超过 64KB
+    args_per_msg = 100
+
+    def __init__(self):
+        self.ws_public: list[websockets.ClientConnection] = []
+
+        # 是否正常被用户关闭
+        self.closed_normally = False
+
+    async def close(self):
+        self.closed_normally = True
+
+        for ws in self.ws_public:
+            if ws.state == websockets.State.OPEN:
+                await ws.close()
+
+    async def ping_ws(self, ws):
+        """30s 内没有任何消息, 服务端会断开连接"""
+        while 1:
+            try:
+                await asyncio.sleep(20)
+                await ws.send("ping")
+            except Exception as e:
+                Lg.error(f"okx ws ping error: {e}")
+                break
+
+    async def subscribe_public(self, args: list[dict], callback):
+        """订阅公共行情
+
+        Args:
+            args: eg. [{"channel": "tickers", "instId": "BTC-USDT"}]
+            callback: 收到推送数据时调用, 参数为整条推送消息
+        """
+        retry_times = 5
+        for i in range(retry_times):
+            try:
+                async with websockets.connect(
+                    f"{self.ws_base_url}/ws/v5/public", ping_interval=None
+                ) as ws:
+                    self.ws_public = [*self.ws_public, ws]
+                    ping = asyncio.create_task(self.ping_ws(ws))
+
+                    try:
+                        for j in range(0, len(args), self.args_per_msg):
+                            await ws.send(
+                                json.dumps(
+                                    {
+                                        "op": "subscribe",
+                                        "args": args[j : j + self.args_per_msg],
+                                    }
+                                )
+                            )
+                        Lg.info(f"欧易: 公共频道订阅成功, 频道数 {len(args)}")
+
+                        while 1:
+                            raw = await ws.recv()
+                            if raw == "pong":
+                                continue
+
+                            res = json.loads(raw)
+                            if "event" in res:
+                                if res["event"] == "error":
+                                    Lg.error(f"欧易订阅失败: {res}")
+                                continue
+
+                            callback(res)
+                    finally:
+                        # 连接结束 (断开重连 / 关闭) 时移除, 不随重连次数累积; 整体替换列表, 不影响 close 中的遍历
+                        self.ws_public = [w for w in self.ws_public if w is not ws]
+                        ping.cancel()
+
+            except websockets.ConnectionClosed as e:
+                if self.closed_normally:
+                    Lg.info("欧易public频道连接正常关闭")
+                    break
+                else:
+                    Lg.error(e)
+                    Lg.info(f"欧易public频道连接断开，正在第{i+1}次重连.....")
+                    continue
@@ -0,0 +1,185 @@
+"""按交易所限速规则调度 rest 请求
+
+每个 host 一个 ExchangeLimiter, 用令牌桶维护请求权重的额度:
+
+- 请求前按权重预占额度, 额度不足时排队等待, 需等待太久则直接失败, 不去触发交易所的 429 / 418
+- 响应头中带有已用额度的 (币安 X-MBX-USED-WEIGHT-1M, Bybit X-Bapi-Limit-Status), 以交易所为准校正
+- 收到 429 / 418 时按 Retry-After 暂停该 host 的所有请求
+"""
+
+import asyncio
+import time
+from typing import Mapping
+
+from app.config import (
+    binance_spot_base_url,
+    binance_um_base_url,
+    bybit_base_url,
+    okx_base_url,
+    rate_limit_headroom,
+    rate_limit_max_wait_ms,
+)
+from app.errors import biz_error
+from app.utils.log_util import Lg
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, window_s: float):
+        self.capacity = capacity
+        self.rate = capacity / window_s
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated_at = time.monotonic()
+
+    def remaining(self, now: float | None = None) -> float:
+        self._refill(now or time.monotonic())
+        return max(self.tokens, 0)
+
+    def reserve(self, weight: float, now: float | None = None) -> float:
+        """预占额度 (可以透支), 返回需要等待的秒数"""
+        now = now or time.monotonic()
+        self._refill(now)
+        self.tokens -= weight
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        return max(wait, self.blocked_until - now)
+
+    def cancel(self, weight: float):
+        self.tokens = min(self.tokens + weight, self.capacity)
+
+    def sync_remaining(self, remaining: float):
+        """交易所返回的剩余额度比本地少时, 以交易所为准"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, remaining)
+
+    def block(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self.tokens = min(self.tokens + elapsed * self.rate, self.capacity)
+            self._updated_at = now
+
+
+class ExchangeLimiter:
+    def __init__(
+        self,
+        name: str,
+        capacity: int,
+        window_s: float,
+        per_path: bool = False,
+        headroom: float = rate_limit_headroom,
+        max_wait_ms: int = rate_limit_max_wait_ms,
+    ):
+        """
+        capacity: 交易所公布的 window_s 内的额度, 实际只使用 headroom 比例
+        per_path: 额度按接口分别计算 (eg. 欧易), 否则整个 host 共用
+        """
+        self.name = name
+        self.limit = capacity
+        self.capacity = capacity * headroom
+        self.window_s = window_s
+        self.per_path = per_path
+        self.max_wait_ms = max_wait_ms
+
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def bucket(self, path: str) -> TokenBucket:
+        key = path if self.per_path else ""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.capacity, self.window_s)
+        return bucket
+
+    async def acquire(self, path: str, weight: int = 1):
+        bucket = self.bucket(path)
+        wait = bucket.reserve(weight)
+        if wait * 1000 > self.max_wait_ms:
+            bucket.cancel(weight)
+            raise biz_error.of(f"{self.name} 请求额度不足, 请 {wait:.1f}s 后重试")
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_response(self, path: str, status: int, headers: Mapping[str, str]):
+        bucket = self.bucket(path)
+        self.sync(bucket, headers)
+
+        if status in (418, 429):
+            retry_after = _to_float(headers.get("retry-after")) or 1
+            Lg.error(f"{self.name} 触发限速 <{status}>, 暂停 {retry_after}s")
+            bucket.block(retry_after)
+
+    def sync(self, bucket: TokenBucket, headers: Mapping[str, str]):
+        """根据响应头校正额度, 由各交易所覆盖"""
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {
+                "exchange": self.name,
+                "path": path or None,
+                "limit": self.limit,
+                "window": self.window_s,
+                "remaining": int(bucket.remaining(now)),
+                "blockedMs": int(max(bucket.blocked_until - now, 0) * 1000),
+            }
+            for path, bucket in self._buckets.items()
+        ]
+
+
+class BinanceLimiter(ExchangeLimiter):
+    """按 ip 统计 1 分钟内的请求权重"""
+
+    def sync(self, bucket: TokenBucket, headers: Mapping[str, str]):
+        used = _to_float(headers.get("x-mbx-used-weight-1m"))
+        if used is not None:
+            bucket.sync_remaining(self.capacity - used)
+
+
+class BybitLimiter(ExchangeLimiter):
+    def sync(self, bucket: TokenBucket, headers: Mapping[str, str]):
+        remaining = _to_float(headers.get("x-bapi-limit-status"))
+        if remaining is None:
+            return
+
+        bucket.sync_remaining(remaining)
+        if remaining <= 0:
+            reset_at = _to_float(headers.get("x-bapi-limit-reset-timestamp"))
+            if reset_at:
+                bucket.block(max(reset_at / 1000 - time.time(), 0))
+
+
+class RateLimits:
+    """base_url -> ExchangeLimiter"""
+
+    def __init__(self):
+        self._limiters: dict[str, ExchangeLimiter] = {}
+
+    def register(self, base_url: str, limiter: ExchangeLimiter):
+        self._limiters[base_url] = limiter
+
+    def get(self, base_url: str) -> ExchangeLimiter | None:
+        return self._limiters.get(base_url)
+
+    def status(self) -> list[dict]:
+        res = []
+        for limiter in self._limiters.values():
+            res += limiter.status()
+        return res
+
+
+def _to_float(val: str | None) -> float | None:
+    try:
+        return float(val) if val else None
+    except ValueError:
+        return None
+
+
+rate_limits = RateLimits()
+# https://developers.binance.com/docs/zh-CN/binance-spot-api-docs/rest-api/limits
+rate_limits.register(binance_spot_base_url, BinanceLimiter("币安-现货", 6000, 60))
+rate_limits.register(binance_um_base_url, BinanceLimiter("币安-合约", 2400, 60))
+# 行情接口按接口分别限速, 大多为 20次/2s
+rate_limits.register(okx_base_url, ExchangeLimiter("欧易", 20, 2, per_path=True))
+# 按 ip 限速, 5s 内 600 次
+rate_limits.register(bybit_base_url, BybitLimiter("Bybit", 600, 5))
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from app.clients.rate_limiter import BinanceLimiter, ExchangeLimiter, TokenBucket
+from app.errors.biz_error import BizException
+
+
+def test_token_bucket_reserve():
+    bucket = TokenBucket(10, 1)
+    now = bucket._updated_at
+
+    assert bucket.reserve(10, now) == 0
+    # 透支 5, 按 10/s 的速度需要 0.5s 补回
+    assert bucket.reserve(5, now) == pytest.approx(0.5)
+    assert bucket.remaining(now + 1) == pytest.approx(5)
+
+
+def test_limiter_rejects_long_wait():
+    limiter = ExchangeLimiter("test", 10, 10, headroom=1, max_wait_ms=100)
+
+    async def main():
+        await limiter.acquire("/a", 10)
+        with pytest.raises(BizException):
+            await limiter.acquire("/a", 5)
+
+    asyncio.run(main())
+    # 被拒绝的请求不占用额度
+    assert limiter.bucket("/a").remaining() < 1
+
+
+def test_binance_limiter_sync_headers():
+    limiter = BinanceLimiter("币安", 6000, 60, headroom=1)
+    path = "/api/v3/ticker/bookTicker"
+    limiter.on_response(path, 200, {"x-mbx-used-weight-1m": "5990"})
+    assert limiter.bucket("").remaining() == pytest.approx(10, abs=1)
+
+    limiter.on_response(path, 429, {"retry-after": "30"})
+    (status,) = limiter.status()
+    assert 29000 < status["blockedMs"] <= 30000
@@ -1,6 +1,4 @@
-from app.routers.handlers.binance import BinanceWatchHandler
-from app.routers.handlers.bybit import BybitWatchHandler
-from app.routers.handlers.okx import OkxWatchHandler
+import os
 
 # @dataclass
 # class Exchange:
@@ -17,14 +15,23 @@ from app.routers.handlers.okx import OkxWatchHandler
 #     markets: list
 
 
+# handler 使用类路径, 用到时才导入, config 不依赖 app 内的其他模块
 datasource = {
     "exchanges": [
-        {"id": "binance", "label": "币安", "handler": BinanceWatchHandler},
-        {"id": "okx", "label": "欧易", "handler": OkxWatchHandler},
+        {
+            "id": "binance",
+            "label": "币安",
+            "handler": "app.routers.handlers.binance.BinanceWatchHandler",
+        },
+        {
+            "id": "okx",
+            "label": "欧易",
+            "handler": "app.routers.handlers.okx.OkxWatchHandler",
+        },
         {
             "id": "bybit",
             "label": "Bybit",
-            "handler": BybitWatchHandler,
+            "handler": "app.routers.handlers.bybit.BybitWatchHandler",
         },
     ],
     "markets": [
@@ -38,3 +45,141 @@ datasource = {
         },
     ],
 }
+
+
+# ----------------------------------------------------------------- 行情快照缓存
+
+# 快照有效期, 有效期内所有请求共享同一份快照, 单位 ms
+quote_cache_ttl_ms = int(os.getenv("QUOTE_CACHE_TTL_MS", "1000"))
+# 超过该时长没有被访问的快照会被淘汰, 单位 ms
+quote_cache_idle_evict_ms = int(os.getenv("QUOTE_CACHE_IDLE_EVICT_MS", "60000"))
+# 最多保留的快照数 (不同的 symbols 组合各占一个)
+quote_cache_max_entries = int(os.getenv("QUOTE_CACHE_MAX_ENTRIES", "64"))
+
+# ----------------------------------------------------------------- ws 行情
+
+# 是否通过 ws 订阅维护实时行情, 关闭则所有盘口走 rest
+market_ws_enabled = os.getenv("MARKET_WS_ENABLED", "1") == "1"
+# 超过该时长没有收到推送, 认为 ws 行情不可用, 回退到 rest, 单位 ms
+market_ws_stale_ms = int(os.getenv("MARKET_WS_STALE_MS", "5000"))
+# 某个 symbol 超过该时长没有推送 (eg. 已下架), 从行情表中移除, 单位 ms
+market_ws_symbol_evict_ms = int(os.getenv("MARKET_WS_SYMBOL_EVICT_MS", "600000"))
+# ws 行情可用时, 快照的有效期 (只是合并同一时刻的并发读), 单位 ms
+market_ws_snapshot_ttl_ms = int(os.getenv("MARKET_WS_SNAPSHOT_TTL_MS", "100"))
+# 欧易订阅的频道: tickers (全量 ticker, 最快 100ms 一次) / bbo-tbt (买一卖一, 逐笔 10ms)
+okx_ws_channel = os.getenv("OKX_WS_CHANNEL", "tickers")
+# Bybit 订阅的 topic: orderbook.1 (买一卖一, 现货/合约均支持) / tickers (仅合约带买一卖一)
+bybit_ws_topic = os.getenv("BYBIT_WS_TOPIC", "orderbook.1")
+# 各交易所 ws 地址 (本地模拟见 tools/exchange_sim.py)
+binance_spot_ws_base_url = os.getenv(
+    "BINANCE_SPOT_WS_BASE_URL", "wss://stream.binance.com:9443"
+)
+binance_um_ws_base_url = os.getenv("BINANCE_UM_WS_BASE_URL", "wss://fstream.binance.com")
+okx_ws_base_url = os.getenv("OKX_WS_BASE_URL", "wss://ws.okx.com:8443")
+bybit_ws_base_url = os.getenv("BYBIT_WS_BASE_URL", "wss://stream.bybit.com")
+
+# ----------------------------------------------------------------- 多进程共享行情
+
+# standalone: 每个进程各自订阅交易所行情 (单进程部署)
+# collector: 独立的采集进程, 订阅所有交易所行情并发布到共享内存, 见 app/market/collector.py
+# reader: gunicorn worker, 只读共享内存, 采集进程不可用时回退到 rest
+market_role = os.getenv("MARKET_ROLE", "standalone")
+# 共享内存文件, 采集进程创建, worker 只读映射
+market_shm_path = os.getenv("MARKET_SHM_PATH", "/dev/shm/hah-quotes")
+# 共享内存大小, 运行中不要调小, 单位 MB
+market_shm_size_mb = int(os.getenv("MARKET_SHM_SIZE_MB", "16"))
+# 采集进程发布快照的间隔, 单位 ms
+market_publish_interval_ms = int(os.getenv("MARKET_PUBLISH_INTERVAL_MS", "100"))
+# 产品信息 / 资金费率的共享内存文件, 采集进程写入, worker 只读
+market_shm_meta_path = os.getenv("MARKET_SHM_META_PATH", market_shm_path + "-meta")
+# 产品信息 / 资金费率的共享内存大小, 单位 MB
+market_shm_meta_size_mb = int(os.getenv("MARKET_SHM_META_SIZE_MB", "16"))
+# worker 检查产品信息 / 资金费率是否有更新的间隔, 单位 ms
+market_meta_sync_ms = int(os.getenv("MARKET_META_SYNC_MS", "1000"))
+
+# ----------------------------------------------------------------- 推送
+
+# /book-tickers/stream 默认推送间隔, 单位 ms
+watch_stream_interval_ms = int(os.getenv("WATCH_STREAM_INTERVAL_MS", "1000"))
+# 推送间隔下限, 客户端传入更小的值时按该值推送, 单位 ms
+watch_stream_min_interval_ms = int(os.getenv("WATCH_STREAM_MIN_INTERVAL_MS", "200"))
+
+# ----------------------------------------------------------------- rest 连接池
+
+# 各交易所 rest 地址 (本地模拟见 tools/exchange_sim.py)
+binance_spot_base_url = os.getenv("BINANCE_SPOT_BASE_URL", "https://api.binance.com")
+binance_um_base_url = os.getenv("BINANCE_UM_BASE_URL", "https://fapi.binance.com")
+okx_base_url = os.getenv("OKX_BASE_URL", "https://www.okx.com")
+bybit_base_url = os.getenv("BYBIT_BASE_URL", "https://api.bybit.com")
+
+# 是否启用 http/2 (需安装 h2, 未安装时回退到 http/1.1)
+http2_enabled = os.getenv("HTTP2_ENABLED", "0") == "1"
+# 每个 host 的最大连接数
+http_pool_max_connections = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+# 每个 host 保持的空闲长连接数
+http_pool_max_keepalive = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+# 空闲长连接的保持时长, 单位 s
+http_pool_keepalive_expiry_s = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY_S", "60"))
+# 请求超时, 单位 s
+http_timeout_s = float(os.getenv("HTTP_TIMEOUT_S", "5"))
+
+# ----------------------------------------------------------------- 限速
+
+# 只使用交易所公布额度的该比例, 给其他进程 / 时钟误差留余量
+rate_limit_headroom = float(os.getenv("RATE_LIMIT_HEADROOM", "0.9"))
+# 额度不足时最多排队等待的时长, 超过则请求直接失败, 单位 ms
+rate_limit_max_wait_ms = int(os.getenv("RATE_LIMIT_MAX_WAIT_MS", "2000"))
+
+# ----------------------------------------------------------------- 产品信息
+
+# 各交易所产品列表 (symbol 映射, 价格精度, 合约乘数) 的刷新间隔, 单位 s
+instrument_refresh_s = int(os.getenv("INSTRUMENT_REFRESH_S", "3600"))
+
+# ----------------------------------------------------------------- 资金费率
+
+# 各交易所资金费率 / 标记价格 / 指数价格的刷新间隔, 单位 ms
+funding_refresh_ms = {
+    # premiumIndex 全部, 权重 10
+    "binance": int(os.getenv("BINANCE_FUNDING_REFRESH_MS", "3000")),
+    # mark-price / funding-rate / index-tickers 各一次
+    "okx": int(os.getenv("OKX_FUNDING_REFRESH_MS", "5000")),
+    # linear tickers 全部
+    "bybit": int(os.getenv("BYBIT_FUNDING_REFRESH_MS", "3000")),
+}
+# 超过该时长未刷新成功, 不再对外提供资金费率, 单位 ms
+funding_stale_ms = int(os.getenv("FUNDING_STALE_MS", "60000"))
+
+# ----------------------------------------------------------------- 条件请求 / 压缩
+
+# 响应体超过该大小且客户端支持时压缩 (br 需安装 brotli, 否则 gzip), 单位 字节
+http_compress_min_bytes = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+# gzip 压缩级别, 1 最快
+http_gzip_level = int(os.getenv("HTTP_GZIP_LEVEL", "5"))
+# 按 ETag 缓存的响应体个数 (每种压缩方式各占一个)
+http_body_cache_entries = int(os.getenv("HTTP_BODY_CACHE_ENTRIES", "64"))
+# 快照年龄 (ageA/ageB) 按该粒度计入 ETag, 缓存的响应体中的年龄最多偏小这么多, 单位 ms
+http_etag_age_bucket_ms = int(os.getenv("HTTP_ETAG_AGE_BUCKET_MS", "1000"))
+
+# ----------------------------------------------------------------- 差价历史
+
+# 差价历史的存储目录, 为空则不记录
+history_dir = os.getenv("HISTORY_DIR", "./data/history")
+# 后台持续计算并记录的映射 (盘口a/盘口b), ',' 分割; 请求中计算过的全市场映射也会记录
+history_mappings = os.getenv("HISTORY_MAPPINGS", "binance-spot/binance-swap")
+# 后台计算和写入的间隔, 单位 ms
+history_interval_ms = int(os.getenv("HISTORY_INTERVAL_MS", "1000"))
+# 每个分段文件覆盖的时长, 单位 s
+history_segment_s = int(os.getenv("HISTORY_SEGMENT_S", "3600"))
+# 每个分段文件最多的行数, 写满后提前切换 (文件预分配, 未写入的部分不占磁盘)
+history_segment_rows = int(os.getenv("HISTORY_SEGMENT_ROWS", "4000000"))
+# 保留天数, 更早的分段文件在切换时删除
+history_retention_days = int(os.getenv("HISTORY_RETENTION_DAYS", "7"))
+# 差价 K 线查询最多返回的点数
+history_candle_max_points = int(os.getenv("HISTORY_CANDLE_MAX_POINTS", "5000"))
+
+# ----------------------------------------------------------------- 差价统计
+
+# diffAb 的 EWMA 均值 / 方差的半衰期, 单位 s
+spread_stats_halflife_s = float(os.getenv("SPREAD_STATS_HALFLIFE_S", "300"))
+# 更新次数达到该值后才给出 z-score
+spread_stats_min_samples = int(os.getenv("SPREAD_STATS_MIN_SAMPLES", "20"))
@@ -0,0 +1,114 @@
+import asyncio
+
+from app.clients.binance_ws_client import BinanceWsF, BinanceWsS
+from app.clients.http_transport import http_transport
+from app.config import binance_spot_base_url
+from app.market.book_store import BookTickerStore
+from app.market.instruments import instruments
+from app.routers.handlers.binance import SPOT_BOOK_TICKER_WEIGHT
+from app.utils.log_util import Lg
+
+# 现货没有全市场的 !bookTicker, 需按 symbol 订阅, 每个连接订阅的 stream 数
+SPOT_STREAMS_PER_CONN = 200
+
+
+def on_book_ticker(store: BookTickerStore, market: str, msg: dict):
+    """combined stream: {"stream": "btcusdt@bookTicker", "data": {...}}"""
+    data = msg.get("data")
+    if not data:
+        return
+
+    symbol = data.get("s")
+    bid = data.get("b")
+    ask = data.get("a")
+    if symbol and bid and ask:
+        symbol = instruments.canonical("binance", market, symbol) or symbol
+        # 合约推送带撮合时间 T, 现货没有, 使用本地接收时间
+        store.update(symbol, bid, ask, data.get("T"))
+
+
+async def load_spot_symbols(store: BookTickerStore) -> list[str]:
+    """通过 rest 拉取一次全市场最优挂单, 得到需订阅的 symbol (交易所产品 id), 并预先填充行情表"""
+    tickers: list[dict] = await http_transport.aget_json(
+        binance_spot_base_url,
+        "/api/v3/ticker/bookTicker",
+        weight=SPOT_BOOK_TICKER_WEIGHT[2],
+    )
+    if not tickers:
+        raise Exception("spot - 获取市场最优挂单失败")
+
+    symbols = []
+    for item in tickers:
+        symbol = item.get("symbol")
+        bid = item.get("bidPrice")
+        ask = item.get("askPrice")
+        if symbol and bid and ask and float(bid) > 0 and float(ask) > 0:
+            store.update(
+                instruments.canonical("binance", "spot", symbol) or symbol, bid, ask
+            )
+            symbols.append(symbol)
+
+    return symbols
+
+
+async def gather_or_cancel(*coros):
+    """其中一个结束或异常时取消其余的, 交给上层统一重连"""
+    tasks = [asyncio.create_task(c) for c in coros]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def register(service):
+    # avoid circular import
+    from app.market.market_data import live_books
+
+    swap_book = live_books[("binance", "swap")]
+    spot_book = live_books[("binance", "spot")]
+
+    swap_client = BinanceWsF()
+
+    async def run_swap():
+        args = {"method": "SUBSCRIBE", "params": ["!bookTicker"], "id": 1}
+        await swap_client.subscribe_public(
+            args, lambda msg: on_book_ticker(swap_book, "swap", msg)
+        )
+
+    spot_clients: list[BinanceWsS] = []
+
+    async def run_spot():
+        await close_spot()
+        spot_clients.clear()
+
+        symbols = await load_spot_symbols(spot_book)
+        Lg.info(f"币安现货 ws 订阅 {len(symbols)} 个交易对")
+
+        coros = []
+        for i in range(0, len(symbols), SPOT_STREAMS_PER_CONN):
+            chunk = symbols[i : i + SPOT_STREAMS_PER_CONN]
+            args = {
+                "method": "SUBSCRIBE",
+                "params": [f"{sy.lower()}@bookTicker" for sy in chunk],
+                "id": i // SPOT_STREAMS_PER_CONN + 1,
+            }
+            client = BinanceWsS()
+            spot_clients.append(client)
+            coros.append(
+                client.subscribe_public(
+                    args, lambda msg: on_book_ticker(spot_book, "spot", msg)
+                )
+            )
+
+        await gather_or_cancel(*coros)
+
+    async def close_spot():
+        for client in spot_clients:
+            await client.close()
+
+    service.add_feed("币安-永续合约", run_swap, [swap_book], swap_client.close)
+    service.add_feed("币安-现货", run_spot, [spot_book], close_spot)
@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+from app.market.binance_feed import on_book_ticker
+from app.market.book_store import BookTickerStore
+
+
+def test_on_book_ticker():
+    store = BookTickerStore("币安-永续合约")
+
+    # 订阅回执, 没有 data
+    on_book_ticker(store, "swap", {"result": None, "id": 1})
+    on_book_ticker(
+        store,
+        "swap",
+        {
+            "stream": "btcusdt@bookTicker",
+            "data": {
+                "e": "bookTicker",
+                "s": "BTCUSDT",
+                "b": "100.10",
+                "B": "1",
+                "a": "100.20",
+                "A": "2",
+                "T": 123,
+            },
+        },
+    )
+    # 现货没有撮合时间 T
+    on_book_ticker(
+        store,
+        "swap",
+        {
+            "stream": "ethusdt@bookTicker",
+            "data": {"s": "ETHUSDT", "b": "10", "a": "10.1"},
+        },
+    )
+    # 缺少卖一的跳过
+    on_book_ticker(store, "swap", {"data": {"s": "DOGEUSDT", "b": "1", "a": ""}})
+
+    book = {ele[0]: ele for ele in store.snapshot() or []}
+    assert sorted(book) == ["BTCUSDT", "ETHUSDT"]
+    assert book["BTCUSDT"][2:] == (Decimal("100.1"), Decimal("100.2"), 123)
+    assert book["ETHUSDT"][4] > 123
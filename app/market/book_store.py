@@ -0,0 +1,130 @@
+import threading
+import time
+from decimal import Decimal
+
+from app.config import market_ws_stale_ms, market_ws_symbol_evict_ms
+from app.market.quote_table import QuoteTable, encode_row
+from app.models.watch_models import BasicPrice
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class BookTickerStore:
+    """由 ws 推送维护的最优挂单 (买一卖一) 内存表
+
+    写入发生在事件循环线程, 读取发生在请求线程, 用锁保护
+    """
+
+    def __init__(
+        self,
+        market_name: str,
+        stale_ms: int = market_ws_stale_ms,
+        evict_ms: int = market_ws_symbol_evict_ms,
+    ):
+        # eg. 币安-现货
+        self.market_name = market_name
+        # 超过该时长没有收到任何推送, 认为 ws 已不可用, 需回退到 rest
+        self.stale_ms = stale_ms
+        # 单个 symbol 超过该时长没有推送, 见 prune
+        self.evict_ms = evict_ms
+
+        self._book: dict[str, BasicPrice] = {}
+        # 与 _book 对应的 QuoteTable 行, 推送时编码, 生成快照时不再逐行转换
+        self._rows: dict[str, tuple] = {}
+        # symbol -> 最近一次收到推送的本地时间
+        self._updated_at: dict[str, int] = {}
+        self._table: QuoteTable | None = None
+        self._table_version = -1
+        self._lock = threading.Lock()
+        self._last_update = 0
+        # 每次推送 +1
+        self.version = 0
+
+    def update(self, symbol: str, bid: str, ask: str, ts: int | None = None):
+        recv_ts = now_ms()
+        bid_price = Decimal(bid)
+        ask_price = Decimal(ask)
+
+        with self._lock:
+            self._last_update = recv_ts
+            self._updated_at[symbol] = recv_ts
+            self.version += 1
+            if bid_price > 0 and ask_price > 0:
+                price = self._book[symbol] = (
+                    symbol,
+                    self.market_name,
+                    bid_price.normalize(),
+                    ask_price.normalize(),
+                    ts or recv_ts,
+                )
+                row = encode_row(*price)
+                if row:
+                    self._rows[symbol] = row
+                else:
+                    self._rows.pop(symbol, None)
+            else:
+                self._book.pop(symbol, None)
+                self._rows.pop(symbol, None)
+
+    def remove(self, symbol: str):
+        """某个 symbol 的买一或卖一被删除, 在重新给出完整盘口之前不再对外提供"""
+        with self._lock:
+            self._last_update = now_ms()
+            if self._book.pop(symbol, None) is not None:
+                self._rows.pop(symbol, None)
+                self.version += 1
+
+    def prune(self, listed: set[str] | None = None, now: int | None = None) -> int:
+        """移除不再推送的 symbol, 返回移除的个数
+
+        - 超过 evict_ms 没有推送
+        - listed (产品表中的 symbol) 不为空时, 不在其中且超过 stale_ms 没有推送 (已下架)
+        """
+        now = now or now_ms()
+        with self._lock:
+            expired = [
+                sy
+                for sy, ts in self._updated_at.items()
+                if now - ts >= self.evict_ms
+                or (listed and sy not in listed and now - ts >= self.stale_ms)
+            ]
+            for sy in expired:
+                del self._updated_at[sy]
+                self._book.pop(sy, None)
+                self._rows.pop(sy, None)
+            if expired:
+                self.version += 1
+        return len(expired)
+
+    def mark_down(self):
+        """连接断开, 在重新收到推送之前不再对外提供数据"""
+        with self._lock:
+            self._last_update = 0
+
+    def is_live(self, now: int | None = None) -> bool:
+        return (now or now_ms()) - self._last_update < self.stale_ms
+
+    def snapshot(self, symbols: list[str] | None = None) -> list[BasicPrice] | None:
+        """ws 不可用时返回 None"""
+        if not self.is_live():
+            return None
+
+        with self._lock:
+            if not symbols:
+                return list(self._book.values())
+            return [self._book[sy] for sy in symbols if sy in self._book]
+
+    def table(self, symbols: list[str] | None = None) -> QuoteTable | None:
+        """同 snapshot, 返回列式的行情表, 每个版本只生成一次"""
+        if not self.is_live():
+            return None
+
+        with self._lock:
+            if self._table_version != self.version:
+                self._table = QuoteTable.from_rows(list(self._rows.values()))
+                self._table_version = self.version
+            table = self._table
+
+        return table.select(symbols)  # type: ignore
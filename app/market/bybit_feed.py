@@ -0,0 +1,108 @@
+from app.clients.bybit_ws_client import BybitWs
+from app.clients.http_transport import http_transport
+from app.config import bybit_base_url, bybit_ws_topic
+from app.market.book_store import BookTickerStore
+from app.market.instruments import instruments
+from app.models.watch_models import BybitRespWrapper
+from app.utils.log_util import Lg
+
+
+async def load_symbols(
+    category: str, market: str, store: BookTickerStore
+) -> list[str]:
+    """通过 rest 拉取一次全市场行情, 得到需订阅的 symbol (交易所产品 id), 并预先填充行情表"""
+    wrapper = BybitRespWrapper.model_validate(
+        await http_transport.aget_json(
+            bybit_base_url, "/v5/market/tickers", {"category": category}
+        )
+    )
+
+    symbols = []
+    for ele in wrapper.result.list:
+        symbols.append(ele.symbol)
+        # 没有挂单的交易对仍然订阅, 等推送给出盘口
+        if ele.bid1Price and ele.ask1Price:
+            symbol = instruments.canonical("bybit", market, ele.symbol) or ele.symbol
+            store.update(symbol, str(ele.bid1Price), str(ele.ask1Price), wrapper.time)
+
+    return symbols
+
+
+# 推送中没有带某一边的字段, 区别于该边被删除 (None)
+_ABSENT = object()
+
+
+class BybitBookHandler:
+    """把 orderbook.1 / tickers 推送写入行情表
+
+    增量推送里可能只带买一或卖一, 没带的一边沿用上一次的价格;
+    带了但档位被删除 (数量为 0 / 价格为空) 时该边清空, 在重新给出之前不再提供该 symbol 的行情
+    """
+
+    def __init__(self, store: BookTickerStore, market: str):
+        self.store = store
+        self.market = market
+        # symbol -> [bid, ask]
+        self.last: dict[str, list[str | None]] = {}
+
+    def __call__(self, msg: dict):
+        data = msg.get("data")
+        if not data:
+            return
+
+        if "s" in data:
+            # orderbook.1: {"s": "BTCUSDT", "b": [["px", "sz"]], "a": [["px", "sz"]]}
+            symbol = data["s"]
+            bid = self._level_px(data.get("b"))
+            ask = self._level_px(data.get("a"))
+        else:
+            # tickers: {"symbol": "BTCUSDT", "bid1Price": "", "ask1Price": ""}
+            symbol = data.get("symbol")
+            bid = data.get("bid1Price", _ABSENT) or None
+            ask = data.get("ask1Price", _ABSENT) or None
+
+        if not symbol:
+            return
+
+        last = self.last.setdefault(symbol, [None, None])
+        if msg.get("type") == "snapshot":
+            last[0] = None if bid is _ABSENT else bid
+            last[1] = None if ask is _ABSENT else ask
+        else:
+            if bid is not _ABSENT:
+                last[0] = bid
+            if ask is not _ABSENT:
+                last[1] = ask
+
+        symbol = instruments.canonical("bybit", self.market, symbol) or symbol
+        if last[0] and last[1]:
+            # cts: 撮合引擎时间, 没有时使用推送时间
+            ts = msg.get("cts") or msg.get("ts")
+            self.store.update(symbol, last[0], last[1], ts)
+        else:
+            self.store.remove(symbol)
+
+    def _level_px(self, levels: list | None) -> str | None:
+        """没有该边的档位返回 _ABSENT, 档位全部被删除返回 None"""
+        if not levels:
+            return _ABSENT  # type: ignore
+        # 数量为 0 表示该档位被删除, 同一条推送里可能先删旧档位再给出新档位
+        return next((px for px, size in levels if float(size) > 0), None)
+
+
+def register(service):
+    # avoid circular import
+    from app.market.market_data import live_books
+
+    for category, market in (("spot", "spot"), ("linear", "swap")):
+        store = live_books[("bybit", market)]
+        client = BybitWs(category)
+
+        async def run(category=category, market=market, store=store, client=client):
+            symbols = await load_symbols(category, market, store)
+            Lg.info(f"Bybit {category} ws 订阅 {len(symbols)} 个交易对")
+
+            topics = [f"{bybit_ws_topic}.{sy}" for sy in symbols]
+            await client.subscribe_public(topics, BybitBookHandler(store, market))
+
+        service.add_feed(store.market_name, run, [store], client.close)
@@ -0,0 +1,85 @@
+import asyncio
+from decimal import Decimal
+
+from app.market import bybit_feed
+from app.market.book_store import BookTickerStore
+from app.market.bybit_feed import BybitBookHandler
+
+
+def book(store: BookTickerStore, symbol: str):
+    price = dict((ele[0], ele) for ele in store.snapshot() or []).get(symbol)
+    return None if price is None else (price[2], price[3])
+
+
+def test_orderbook_snapshot_delta_delete():
+    store = BookTickerStore("Bybit-现货")
+    handler = BybitBookHandler(store, "spot")
+
+    def push(type_: str, b: list | None = None, a: list | None = None):
+        data: dict = {"s": "BTCUSDT"}
+        if b is not None:
+            data["b"] = b
+        if a is not None:
+            data["a"] = a
+        handler({"type": type_, "ts": 1, "data": data})
+
+    push("snapshot", [["100", "1"]], [["101", "2"]])
+    assert book(store, "BTCUSDT") == (Decimal("100"), Decimal("101"))
+
+    # 只带卖一, 买一沿用
+    push("delta", a=[["100.5", "1"]])
+    assert book(store, "BTCUSDT") == (Decimal("100"), Decimal("100.5"))
+
+    # 买一被删除, 不能沿用旧价格
+    push("delta", b=[["100", "0"]])
+    assert book(store, "BTCUSDT") is None
+    push("delta", a=[["100.4", "1"]])
+    assert book(store, "BTCUSDT") is None
+
+    # 同一条推送里删旧档位, 给出新档位
+    push("delta", b=[["100", "0"], ["99.9", "3"]])
+    assert book(store, "BTCUSDT") == (Decimal("99.9"), Decimal("100.4"))
+
+    # 快照里没有的一边视为空
+    push("snapshot", b=[["99", "1"]])
+    assert book(store, "BTCUSDT") is None
+
+
+def test_tickers_delta_delete():
+    store = BookTickerStore("Bybit-永续")
+    handler = BybitBookHandler(store, "swap")
+
+    def push(type_: str, **fields):
+        handler({"type": type_, "ts": 1, "data": {"symbol": "ETHUSDT", **fields}})
+
+    push("snapshot", bid1Price="10", ask1Price="10.1")
+    push("delta", ask1Price="10.2")
+    assert book(store, "ETHUSDT") == (Decimal("10"), Decimal("10.2"))
+
+    push("delta", bid1Price="")
+    assert book(store, "ETHUSDT") is None
+
+
+def test_load_symbols_skips_empty_prices(monkeypatch):
+    async def fake_get_json(*args, **kwargs):
+        return {
+            "retCode": 0,
+            "retExtInfo": {},
+            "retMsg": "OK",
+            "time": 1,
+            "result": {
+                "category": "spot",
+                "list": [
+                    {"symbol": "BTCUSDT", "bid1Price": "100", "ask1Price": "101"},
+                    {"symbol": "NEWUSDT", "bid1Price": "", "ask1Price": ""},
+                ],
+            },
+        }
+
+    monkeypatch.setattr(bybit_feed.http_transport, "aget_json", fake_get_json)
+    store = BookTickerStore("Bybit-现货")
+
+    symbols = asyncio.run(bybit_feed.load_symbols("spot", "spot", store))
+    assert symbols == ["BTCUSDT", "NEWUSDT"]
+    assert book(store, "BTCUSDT") == (Decimal("100"), Decimal("101"))
+    assert book(store, "NEWUSDT") is None
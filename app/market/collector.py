@@ -0,0 +1,134 @@
+"""行情采集进程
+
+独占所有交易所的 ws 订阅 (ws 不可用的盘口改为定时 rest 拉取), 把各盘口的快照发布到共享内存,
+产品信息和资金费率也只由采集进程拉取, 发布到另一块共享内存 (shm_meta).
+gunicorn 的 worker 以 MARKET_ROLE=reader 启动, 只读共享内存, worker 数量不影响交易所的请求量.
+
+    MARKET_ROLE=collector python -m app.market.collector
+"""
+
+import asyncio
+
+from app.clients.http_transport import http_transport
+from app.config import market_publish_interval_ms, quote_cache_ttl_ms
+from app.market.book_store import BookTickerStore, now_ms
+from app.market.funding_store import funding_store
+from app.market.instruments import instruments
+from app.market.market_data import live_books, market_data_service
+from app.market.quote_table import QuoteTable
+from app.market.shm_meta import MetaRegionWriter
+from app.market.shm_quotes import QuoteRegionWriter
+from app.market.spread_history import spread_recorder
+from app.models.watch_models import ExchangeMarket, SymbolRowReq
+from app.utils.log_util import Lg
+
+
+class QuoteCollector:
+    def __init__(
+        self,
+        writer: QuoteRegionWriter,
+        meta_writer: MetaRegionWriter | None = None,
+        interval_ms: int = market_publish_interval_ms,
+        rest_interval_ms: int = quote_cache_ttl_ms,
+    ):
+        self.writer = writer
+        self.meta_writer = meta_writer
+        self.interval_ms = interval_ms
+        self.rest_interval_ms = rest_interval_ms
+
+        # key -> 已发布的 ws 行情表版本
+        self._published: dict[str, int] = {}
+        # key -> 上一次 rest 拉取的时间
+        self._rest_at: dict[str, int] = {}
+        # key -> 进行中的 rest 拉取, 不阻塞其他盘口的发布
+        self._rest_tasks: dict[str, asyncio.Task] = {}
+        # 共享数据 key -> 已发布的数据的更新时间
+        self._meta_published: dict[str, object] = {}
+
+    async def run(self):
+        try:
+            while True:
+                for (e, m), store in live_books.items():
+                    self.publish(f"{e}-{m}", store)
+                self.publish_meta()
+                await asyncio.sleep(self.interval_ms / 1000)
+        finally:
+            for task in self._rest_tasks.values():
+                task.cancel()
+
+    def publish(self, key: str, store: BookTickerStore):
+        now = now_ms()
+        if store.is_live(now):
+            self._rest_at.pop(key, None)
+            if self._published.get(key) == store.version:
+                self.writer.heartbeat(key, now)
+                return
+
+            self._published[key] = store.version
+            self.writer.publish(key, store.table() or QuoteTable.empty(), now)
+            return
+
+        # ws 不可用, 按 rest 的节奏拉取全市场
+        self._published.pop(key, None)
+        task = self._rest_tasks.get(key)
+        if task and not task.done():
+            return
+        if now - self._rest_at.get(key, 0) < self.rest_interval_ms:
+            return
+        self._rest_at[key] = now
+        self._rest_tasks[key] = asyncio.create_task(self._publish_rest(key))
+
+    def publish_meta(self):
+        """产品信息 / 资金费率有更新时发布给 reader"""
+        if self.meta_writer is None:
+            return
+        sources = {
+            "instruments": (instruments.loaded_at, instruments.dump),
+            "funding": (funding_store.updated_at, funding_store.dump),
+        }
+        for key, (updated_at, dump) in sources.items():
+            if not updated_at or self._meta_published.get(key) == updated_at:
+                continue
+            self.meta_writer.publish(key, dump(), now_ms())
+            self._meta_published[key] = updated_at
+
+    async def _publish_rest(self, key: str):
+        try:
+            prices = await ExchangeMarket(key).get_basic_price(SymbolRowReq())
+        except Exception as e:
+            Lg.error(f"{key} rest 行情拉取失败: {e}")
+            return
+        self.writer.publish(key, prices, now_ms())
+
+
+async def run():
+    writer = QuoteRegionWriter([f"{e}-{m}" for e, m in live_books])
+    meta_writer = MetaRegionWriter()
+    Lg.info(f"行情采集进程启动, 共享内存: {writer.path}, {meta_writer.path}")
+
+    await market_data_service.start()
+    funding_store.start()
+    spread_recorder.start()
+    try:
+        await QuoteCollector(writer, meta_writer).run()
+    finally:
+        await spread_recorder.stop()
+        await funding_store.stop()
+        await market_data_service.stop()
+        await http_transport.aclose()
+        writer.close()
+        meta_writer.close()
+
+
+def main() -> int:
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
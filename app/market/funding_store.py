@@ -0,0 +1,137 @@
+"""各交易所永续合约的资金费率和指数差价
+
+后台按各交易所自己的间隔拉取全市场的标记价格 / 指数价格 / 资金费率 (handler 的 get_mark_price),
+按统一 symbol 索引, 请求时直接读内存, 不再访问交易所.
+只在采集进程 / standalone 进程中拉取; reader 进程 (gunicorn worker) 读取采集进程发布到共享内存的结果 (shm_meta).
+资金费率和指数差价在刷新时算好 (百分比, 保留 4 位小数), 读取时不需要再计算
+"""
+
+import asyncio
+from decimal import Decimal
+from typing import TypeAlias
+
+from app.config import datasource, funding_refresh_ms, funding_stale_ms
+from app.market.book_store import now_ms
+from app.market.spread_engine import adjust_precision
+from app.models.watch_models import MarkPrice, SymbolRowReq
+from app.utils.cls_util import get_cls_from_path
+from app.utils.log_util import Lg
+
+# (资金费率 %, 指数差价 %)
+Funding: TypeAlias = tuple[Decimal, Decimal]
+
+
+def to_funding(price: MarkPrice) -> Funding | None:
+    if not price.markPrice:
+        return None
+    return (
+        adjust_precision(price.lastFundingRate * 100),
+        adjust_precision((price.markPrice - price.indexPrice) / price.markPrice * 100),
+    )
+
+
+class FundingStore:
+    def __init__(
+        self,
+        refresh_ms: dict[str, int] = funding_refresh_ms,
+        stale_ms: int = funding_stale_ms,
+    ):
+        self.refresh_ms = refresh_ms
+        self.stale_ms = stale_ms
+
+        # exchange -> symbol -> Funding, 整表替换, 读取方不需要加锁
+        self._rates: dict[str, dict[str, Funding]] = {}
+        self._updated_at: dict[str, int] = {}
+        # 内容有变化时 +1, 用于生成 ETag
+        self._versions: dict[str, int] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def get(self, exchange: str, symbol: str) -> Funding | None:
+        """未加载或已过期返回 None"""
+        if now_ms() - self._updated_at.get(exchange, 0) > self.stale_ms:
+            return None
+        rates = self._rates.get(exchange)
+        return rates.get(symbol) if rates else None
+
+    def put(self, exchange: str, prices: list[MarkPrice]):
+        rates: dict[str, Funding] = {}
+        for ele in prices:
+            if ele.symbol in rates:
+                continue
+            funding = to_funding(ele)
+            if funding:
+                rates[ele.symbol] = funding
+
+        if rates != self._rates.get(exchange):
+            self._versions[exchange] = self._versions.get(exchange, 0) + 1
+        self._rates[exchange] = rates
+        self._updated_at[exchange] = now_ms()
+
+    def version(self, exchange: str) -> tuple[int, bool]:
+        """(内容版本, 是否已过期), 过期后 get 不再返回数据, 同样视为内容变化"""
+        stale = now_ms() - self._updated_at.get(exchange, 0) > self.stale_ms
+        return self._versions.get(exchange, 0), stale
+
+    @property
+    def updated_at(self) -> int:
+        """最近一次刷新成功的时间, 没有刷新过为 0"""
+        return max(self._updated_at.values(), default=0)
+
+    def dump(self) -> dict[str, dict]:
+        """-> json, 采集进程发布给 reader (见 shm_meta)"""
+        return {
+            exchange: {
+                "updatedAt": self._updated_at.get(exchange, 0),
+                "version": self._versions.get(exchange, 0),
+                "rates": rates,
+            }
+            for exchange, rates in self._rates.items()
+        }
+
+    def load(self, data: dict[str, dict]):
+        """dump 的结果, reader 使用, 过期时间仍按采集进程的刷新时间计算"""
+        for exchange, ele in data.items():
+            self._rates[exchange] = {
+                symbol: (Decimal(rate), Decimal(zscj))
+                for symbol, (rate, zscj) in ele["rates"].items()
+            }
+            self._updated_at[exchange] = ele["updatedAt"]
+            self._versions[exchange] = ele["version"]
+
+    async def refresh(self, exchange: str, handler_path: str):
+        handler = get_cls_from_path(handler_path)(SymbolRowReq())
+        self.put(exchange, await handler.get_mark_price())
+
+    def start(self):
+        if self._tasks:
+            return
+
+        for ele in datasource["exchanges"]:
+            exchange = ele["id"]
+            interval_ms = self.refresh_ms.get(exchange)
+            if interval_ms:
+                self._tasks.append(
+                    asyncio.create_task(
+                        self._run_forever(exchange, ele["handler"], interval_ms)
+                    )
+                )
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _run_forever(self, exchange: str, handler_path: str, interval_ms: int):
+        while True:
+            try:
+                await self.refresh(exchange, handler_path)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 沿用上一次的结果, 直到过期
+                Lg.error(f"{exchange} 资金费率刷新失败: {e}")
+            await asyncio.sleep(interval_ms / 1000)
+
+
+funding_store = FundingStore()
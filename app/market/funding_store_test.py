@@ -0,0 +1,56 @@
+from decimal import Decimal
+
+from app.market.funding_store import FundingStore
+from app.market.shm_meta import MetaRegionReader, MetaRegionWriter
+from app.models.watch_models import MarkPrice
+
+
+def mark_price(symbol: str, mark: str, index: str, rate: str) -> MarkPrice:
+    return MarkPrice(
+        symbol=symbol,
+        markPrice=Decimal(mark),
+        indexPrice=Decimal(index),
+        lastFundingRate=Decimal(rate),
+        time=0,
+    )
+
+
+def test_funding_store():
+    store = FundingStore(stale_ms=60_000)
+    assert store.get("okx", "BTCUSDT") is None
+
+    store.put(
+        "okx",
+        [
+            mark_price("BTCUSDT", "50000", "49990", "0.000125"),
+            # 重复的以第一条为准
+            mark_price("BTCUSDT", "1", "1", "0"),
+            # 标记价格为 0 的跳过
+            mark_price("ETHUSDT", "0", "3000", "0.0001"),
+        ],
+    )
+    assert store.get("okx", "BTCUSDT") == (Decimal("0.0125"), Decimal("0.02"))
+    assert store.get("okx", "ETHUSDT") is None
+    assert store.get("bybit", "BTCUSDT") is None
+
+    # 过期后不再提供
+    store.stale_ms = -1
+    assert store.get("okx", "BTCUSDT") is None
+
+
+def test_funding_store_published_to_reader(tmp_path):
+    path = str(tmp_path / "meta")
+    writer = MetaRegionWriter(path=path, size_mb=1)
+    reader = MetaRegionReader(path)
+
+    collector = FundingStore(stale_ms=60_000)
+    collector.put("okx", [mark_price("BTCUSDT", "50000", "49990", "0.000125")])
+    writer.publish("funding", collector.dump(), 1)
+
+    worker = FundingStore(stale_ms=60_000)
+    worker.load(reader.read("funding")[2])
+    assert worker.get("okx", "BTCUSDT") == (Decimal("0.0125"), Decimal("0.02"))
+    assert worker.version("okx") == collector.version("okx")
+    assert worker.updated_at == collector.updated_at
+
+    writer.close()
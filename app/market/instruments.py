@@ -0,0 +1,312 @@
+"""各交易所的产品信息
+
+启动时从各交易所的产品列表 (币安 exchangeInfo, 欧易 instruments, Bybit instruments-info) 加载,
+之后在后台定时刷新:
+
+- 交易所的产品 id -> 统一 symbol (基础币 + 计价币, eg. BTC-USDT-SWAP -> BTCUSDT), 不用每行行情都做字符串转换
+- 统一 symbol 分配进程内稠密的整数 id, 跨交易所 join 时按整数 id 对齐
+- 价格精度 (tick size) 和合约乘数, 按行存放, 与 symbol id 对齐
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+import numpy as np
+
+from app.clients.http_transport import http_transport
+from app.config import (
+    binance_spot_base_url,
+    binance_um_base_url,
+    bybit_base_url,
+    instrument_refresh_s,
+    okx_base_url,
+)
+from app.utils.log_util import Lg
+
+# (交易所产品 id, 统一 symbol, tick size, 合约乘数)
+InstrumentRow = tuple[str, str, str, str]
+
+
+@dataclass
+class InstrumentTable:
+    """某个 (交易所, 市场) 的产品表, 各列按行对齐"""
+
+    exchange: str
+    market: str
+    inst_ids: list[str]
+    symbols: list[str]
+    symbol_ids: np.ndarray
+    tick_sizes: list[Decimal]
+    multipliers: np.ndarray
+    loaded_at: int
+    # 交易所产品 id -> 行
+    by_inst_id: dict[str, int] = field(default_factory=dict)
+    # 统一 symbol -> 行
+    by_symbol: dict[str, int] = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.inst_ids)
+
+
+class InstrumentRegistry:
+    def __init__(self, refresh_s: int = instrument_refresh_s):
+        self.refresh_s = refresh_s
+
+        # 统一 symbol <-> 稠密 id, 只增不减, id 在进程内保持稳定
+        self._ids: dict[str, int] = {}
+        self._names: list[str] = []
+        self._lock = threading.Lock()
+
+        self._tables: dict[tuple[str, str], InstrumentTable] = {}
+        self._task: asyncio.Task | None = None
+
+    # --------------------------------------------------------- symbol id
+
+    def symbol_id(self, symbol: str) -> int:
+        sid = self._ids.get(symbol)
+        if sid is None:
+            with self._lock:
+                sid = self._ids.get(symbol)
+                if sid is None:
+                    sid = self._ids[symbol] = len(self._names)
+                    self._names.append(symbol)
+        return sid
+
+    def find_id(self, symbol: str) -> int | None:
+        """不分配新 id"""
+        return self._ids.get(symbol)
+
+    def symbol_ids(self, symbols: list[str]) -> np.ndarray:
+        return np.fromiter(
+            (self.symbol_id(sy) for sy in symbols), dtype=np.int32, count=len(symbols)
+        )
+
+    def symbol_name(self, sid: int) -> str:
+        return self._names[sid]
+
+    @property
+    def size(self) -> int:
+        return len(self._names)
+
+    # --------------------------------------------------------- 产品
+
+    def table(self, exchange: str, market: str) -> InstrumentTable | None:
+        return self._tables.get((exchange, market))
+
+    def canonical(self, exchange: str, market: str, inst_id: str) -> str | None:
+        """交易所产品 id -> 统一 symbol, 产品表未加载或不存在返回 None"""
+        table = self._tables.get((exchange, market))
+        if table is None:
+            return None
+        i = table.by_inst_id.get(inst_id)
+        return None if i is None else table.symbols[i]
+
+    def inst_id(self, exchange: str, market: str, symbol: str) -> str | None:
+        """canonical 的逆运算"""
+        table = self._tables.get((exchange, market))
+        if table is None:
+            return None
+        i = table.by_symbol.get(symbol)
+        return None if i is None else table.inst_ids[i]
+
+    def put(self, exchange: str, market: str, rows: list[InstrumentRow]):
+        symbols = [ele[1] for ele in rows]
+        table = InstrumentTable(
+            exchange=exchange,
+            market=market,
+            inst_ids=[ele[0] for ele in rows],
+            symbols=symbols,
+            symbol_ids=self.symbol_ids(symbols),
+            tick_sizes=[Decimal(ele[2] or "0").normalize() for ele in rows],
+            multipliers=np.array([float(ele[3] or 1) for ele in rows], np.float64),
+            loaded_at=int(time.time() * 1000),
+        )
+        for i, (inst_id, symbol, *_) in enumerate(rows):
+            table.by_inst_id[inst_id] = i
+            table.by_symbol.setdefault(symbol, i)
+
+        # 整表替换, 读取方不需要加锁
+        self._tables[(exchange, market)] = table
+
+    @property
+    def loaded_at(self) -> int:
+        """最近一次产品表更新的时间, 没有加载过为 0"""
+        return max((t.loaded_at for t in self._tables.values()), default=0)
+
+    def dump(self) -> dict[str, list]:
+        """产品表 -> json, 采集进程发布给 reader (见 shm_meta)"""
+        return {
+            f"{e}-{m}": [
+                [inst_id, symbol, str(tick), repr(float(mult))]
+                for inst_id, symbol, tick, mult in zip(
+                    t.inst_ids, t.symbols, t.tick_sizes, t.multipliers.tolist()
+                )
+            ]
+            for (e, m), t in self._tables.items()
+        }
+
+    def load(self, data: dict[str, list]):
+        """dump 的结果, reader 使用; symbol id 仍在本进程内分配"""
+        for key, rows in data.items():
+            exchange, market = key.split("-", 1)
+            self.put(exchange, market, [tuple(ele) for ele in rows])  # type: ignore
+
+    async def refresh(self):
+        loaders = {
+            ("binance", "spot"): load_binance_spot,
+            ("binance", "swap"): load_binance_swap,
+            ("okx", "spot"): lambda: load_okx("SPOT"),
+            ("okx", "swap"): lambda: load_okx("SWAP"),
+            ("bybit", "spot"): lambda: load_bybit("spot"),
+            ("bybit", "swap"): lambda: load_bybit("linear"),
+        }
+        results = await asyncio.gather(
+            *(loader() for loader in loaders.values()), return_exceptions=True
+        )
+        for (exchange, market), res in zip(loaders, results):
+            if isinstance(res, BaseException):
+                # 沿用上一次的产品表
+                Lg.error(f"{exchange}-{market} 产品信息加载失败: {res}")
+                continue
+            self.put(exchange, market, res)
+
+    async def start(self):
+        """首次加载完成后返回, 之后在后台定时刷新"""
+        if self._task is None:
+            await self.refresh()
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_forever(self):
+        while True:
+            await asyncio.sleep(self.refresh_s)
+            await self.refresh()
+
+
+def join_by_id(ids_a: np.ndarray, ids_b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """按 symbol id 对齐两份行情
+
+    id 重复时以第一次出现的为准, 结果按 a 中第一次出现的顺序排列
+
+    Returns:
+        (a 的行号, b 的行号)
+    """
+    size = int(max(ids_a.max(initial=-1), ids_b.max(initial=-1))) + 1
+    pos_a = _first_positions(ids_a, size)
+    pos_b = _first_positions(ids_b, size)
+
+    rows_a = np.sort(pos_a[pos_a >= 0])
+    rows_b = pos_b[ids_a[rows_a]]
+    matched = rows_b >= 0
+    return rows_a[matched], rows_b[matched]
+
+
+def _first_positions(ids: np.ndarray, size: int) -> np.ndarray:
+    """id -> 第一次出现的行号, 不存在为 -1"""
+    pos = np.full(size, -1, dtype=np.int64)
+    # 重复下标赋值时后写入的生效, 倒序写入使第一次出现的生效
+    pos[ids[::-1]] = np.arange(len(ids) - 1, -1, -1)
+    return pos
+
+
+# --------------------------------------------------------- 各交易所的产品列表
+
+
+def _price_filter(filters: list[dict]) -> str:
+    return next(
+        (f.get("tickSize", "") for f in filters if f.get("filterType") == "PRICE_FILTER"),
+        "",
+    )
+
+
+async def load_binance_spot() -> list[InstrumentRow]:
+    data = await http_transport.aget_json(
+        binance_spot_base_url, "/api/v3/exchangeInfo", weight=20
+    )
+    return [
+        (
+            ele["symbol"],
+            ele["baseAsset"] + ele["quoteAsset"],
+            _price_filter(ele.get("filters", [])),
+            "1",
+        )
+        for ele in data["symbols"]
+        if ele.get("status") == "TRADING"
+    ]
+
+
+async def load_binance_swap() -> list[InstrumentRow]:
+    data = await http_transport.aget_json(binance_um_base_url, "/fapi/v1/exchangeInfo")
+    return [
+        (
+            ele["symbol"],
+            ele["baseAsset"] + ele["quoteAsset"],
+            _price_filter(ele.get("filters", [])),
+            "1",
+        )
+        for ele in data["symbols"]
+        if ele.get("status") == "TRADING" and ele.get("contractType") == "PERPETUAL"
+    ]
+
+
+async def load_okx(inst_type: str) -> list[InstrumentRow]:
+    data = await http_transport.aget_json(
+        okx_base_url, "/api/v5/public/instruments", {"instType": inst_type}
+    )
+
+    res = []
+    for ele in data["data"]:
+        if ele.get("state") != "live":
+            continue
+        if inst_type == "SWAP":
+            # uly: BTC-USDT, 合约面值 ctVal * ctMult
+            symbol = ele["uly"].replace("-", "")
+            multiplier = str(
+                Decimal(ele.get("ctVal") or "1") * Decimal(ele.get("ctMult") or "1")
+            )
+        else:
+            symbol = ele["baseCcy"] + ele["quoteCcy"]
+            multiplier = "1"
+        res.append((ele["instId"], symbol, ele.get("tickSz", ""), multiplier))
+
+    return res
+
+
+async def load_bybit(category: str) -> list[InstrumentRow]:
+    res = []
+    cursor = None
+    while True:
+        data = await http_transport.aget_json(
+            bybit_base_url,
+            "/v5/market/instruments-info",
+            {"category": category, "limit": 1000, "cursor": cursor},
+        )
+        result = data["result"]
+        for ele in result["list"]:
+            if ele.get("status") != "Trading":
+                continue
+            if category == "linear" and ele.get("contractType") != "LinearPerpetual":
+                continue
+            res.append(
+                (
+                    ele["symbol"],
+                    ele["baseCoin"] + ele["quoteCoin"],
+                    ele.get("priceFilter", {}).get("tickSize", ""),
+                    "1",
+                )
+            )
+
+        cursor = result.get("nextPageCursor")
+        if not cursor:
+            return res
+
+
+instruments = InstrumentRegistry()
@@ -0,0 +1,42 @@
+import numpy as np
+
+from app.market.instruments import InstrumentRegistry, join_by_id
+
+
+def test_registry_canonical():
+    registry = InstrumentRegistry()
+    registry.put(
+        "okx",
+        "swap",
+        [
+            ("BTC-USDT-SWAP", "BTCUSDT", "0.1", "0.01"),
+            ("ETH-USDT-SWAP", "ETHUSDT", "0.01", "0.1"),
+        ],
+    )
+
+    assert registry.canonical("okx", "swap", "BTC-USDT-SWAP") == "BTCUSDT"
+    assert registry.inst_id("okx", "swap", "ETHUSDT") == "ETH-USDT-SWAP"
+    assert registry.canonical("okx", "swap", "DOGE-USDT-SWAP") is None
+    assert registry.canonical("okx", "spot", "BTC-USDT") is None
+
+    table = registry.table("okx", "swap")
+    ids = registry.symbol_ids(["BTCUSDT", "ETHUSDT"])
+    assert table.symbol_ids.tolist() == ids.tolist()
+    assert table.multipliers.tolist() == [0.01, 0.1]
+    # 同一个 symbol 在所有交易所得到同一个 id
+    assert registry.symbol_id("ETHUSDT") == table.symbol_ids[1]
+    assert registry.symbol_name(table.symbol_ids[0]) == "BTCUSDT"
+
+
+def test_join_by_id():
+    ids_a = np.array([3, 1, 4, 1, 5], dtype=np.int32)
+    ids_b = np.array([9, 5, 1, 3, 1], dtype=np.int32)
+
+    rows_a, rows_b = join_by_id(ids_a, ids_b)
+    # 按 a 的顺序, 重复的 id 取第一条
+    assert rows_a.tolist() == [0, 1, 4]
+    assert rows_b.tolist() == [3, 2, 1]
+
+    empty = np.array([], dtype=np.int32)
+    rows_a, rows_b = join_by_id(empty, ids_b)
+    assert len(rows_a) == 0 and len(rows_b) == 0
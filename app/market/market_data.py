@@ -0,0 +1,173 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from app.config import market_meta_sync_ms, market_role, market_ws_enabled
+from app.market.book_store import BookTickerStore
+from app.market.funding_store import funding_store
+from app.market.instruments import instruments
+from app.market.shm_meta import MetaRegionReader
+from app.market.shm_quotes import QuoteRegionReader, SharedBook
+from app.utils.log_util import Lg
+
+# 清理行情表中不再推送的 symbol 的间隔, 见 BookTickerStore.prune
+PRUNE_INTERVAL_S = 60
+
+# (exchange, market) -> ws 维护的最优挂单表
+live_books: dict[tuple[str, str], BookTickerStore] = {
+    ("binance", "spot"): BookTickerStore("币安-现货"),
+    ("binance", "swap"): BookTickerStore("币安-永续合约"),
+    ("okx", "spot"): BookTickerStore("欧易-现货"),
+    ("okx", "swap"): BookTickerStore("欧易-永续合约"),
+    ("bybit", "spot"): BookTickerStore("Bybit-现货"),
+    ("bybit", "swap"): BookTickerStore("Bybit-永续"),
+}
+
+
+# reader 进程读取采集进程发布到共享内存的行情, key 与 live_books 一致
+shared_books: dict[tuple[str, str], SharedBook] = {}
+if market_role == "reader":
+    _reader = QuoteRegionReader()
+    shared_books = {
+        (e, m): SharedBook(_reader, f"{e}-{m}", store.market_name)
+        for (e, m), store in live_books.items()
+    }
+
+
+def get_live_book(exchange: str, market: str) -> BookTickerStore | SharedBook | None:
+    """返回可用的 ws 行情表, ws 未开启或不可用时返回 None
+
+    reader 进程返回共享内存中的行情
+    """
+    books = shared_books if market_role == "reader" else live_books
+    store = books.get((exchange, market))
+    if store is None or not store.is_live():
+        return None
+    return store
+
+
+class MarketDataService:
+    """后台行情服务, 负责各交易所 ws 行情订阅的启动, 断线重连和关闭"""
+
+    def __init__(self):
+        self._feeds: list[tuple[str, Callable[[], Awaitable], list[BookTickerStore]]] = []
+        self._tasks: list[asyncio.Task] = []
+        self._closers: list[Callable[[], Awaitable]] = []
+        self._closed = False
+
+        # reader 进程: 共享内存中的产品信息 / 资金费率, key -> 已加载的版本
+        self._meta_reader = MetaRegionReader()
+        self._meta_versions: dict[str, int] = {}
+
+    def add_feed(
+        self,
+        name: str,
+        run: Callable[[], Awaitable],
+        stores: list[BookTickerStore],
+        close: Callable[[], Awaitable] | None = None,
+    ):
+        """
+        run: 订阅并持续消费推送的协程, 返回或抛异常后会自动重连
+        stores: run 所维护的行情表, 断线时置为不可用
+        """
+        self._feeds.append((name, run, stores))
+        if close:
+            self._closers.append(close)
+
+    async def start(self):
+        if market_role == "reader":
+            # 产品信息和资金费率同样由采集进程拉取后发布, worker 不访问交易所
+            Lg.info("行情, 产品信息和资金费率由采集进程通过共享内存提供")
+            self._closed = False
+            self.sync_meta()
+            self._tasks.append(asyncio.create_task(self._sync_meta_forever()))
+            return
+
+        # 产品信息加载失败时, 各交易所退回按字符串规则转换 symbol
+        await instruments.start()
+
+        if not market_ws_enabled:
+            Lg.info("ws 行情未开启, 使用 rest 拉取行情")
+            return
+
+        # avoid circular import
+        from app.market import binance_feed, bybit_feed, okx_feed
+
+        binance_feed.register(self)
+        okx_feed.register(self)
+        bybit_feed.register(self)
+
+        self._closed = False
+        for name, run, stores in self._feeds:
+            self._tasks.append(asyncio.create_task(self._run_forever(name, run, stores)))
+        self._tasks.append(asyncio.create_task(self._prune_forever()))
+
+    async def stop(self):
+        self._closed = True
+        await instruments.stop()
+        for closer in self._closers:
+            try:
+                await closer()
+            except Exception as e:
+                Lg.error(f"ws 行情关闭异常: {e}")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        self._tasks.clear()
+        self._feeds.clear()
+        self._closers.clear()
+
+    def sync_meta(self):
+        """reader 进程: 加载采集进程发布的产品信息和资金费率, 只在有新版本时解析"""
+        loaders = {"instruments": instruments.load, "funding": funding_store.load}
+        for key, load in loaders.items():
+            try:
+                res = self._meta_reader.read(key, self._meta_versions.get(key, 0))
+                if res is None or res[2] is None:
+                    continue
+                load(res[2])
+                self._meta_versions[key] = res[0]
+            except Exception as e:
+                Lg.error(f"共享内存 {key} 加载失败: {e}")
+
+    async def _sync_meta_forever(self):
+        while not self._closed:
+            await asyncio.sleep(market_meta_sync_ms / 1000)
+            self.sync_meta()
+
+    def prune(self):
+        """移除各行情表中不再推送的 symbol, 产品表刷新后已下架的 symbol 也在这里移除"""
+        for (exchange, market), store in live_books.items():
+            table = instruments.table(exchange, market)
+            count = store.prune(set(table.by_symbol) if table else None)
+            if count:
+                Lg.info(f"{store.market_name} 移除 {count} 个不再推送的交易对")
+
+    async def _prune_forever(self):
+        while not self._closed:
+            await asyncio.sleep(PRUNE_INTERVAL_S)
+            self.prune()
+
+    async def _run_forever(self, name: str, run, stores: list[BookTickerStore]):
+        delay = 1
+        while not self._closed:
+            try:
+                await run()
+                delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                Lg.error(f"{name} ws 行情异常: {e}")
+
+            for store in stores:
+                store.mark_down()
+
+            if self._closed:
+                break
+            Lg.info(f"{name} ws 行情 {delay}s 后重连")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+market_data_service = MarketDataService()
@@ -0,0 +1,78 @@
+from app.clients.http_transport import http_transport
+from app.clients.okx_ws_client import OkxWs
+from app.config import okx_base_url, okx_ws_channel
+from app.market.book_store import BookTickerStore
+from app.models.watch_models import RespWrapper, Ticker
+from app.routers.handlers.okx import okx_symbol
+from app.utils.log_util import Lg
+
+
+async def load_inst_ids(inst_type: str, store: BookTickerStore) -> dict[str, str]:
+    """通过 rest 拉取一次全市场行情, 得到需订阅的产品, 并预先填充行情表
+
+    Returns:
+        instId -> symbol
+    """
+    wrap = RespWrapper[Ticker].model_validate(
+        await http_transport.aget_json(
+            okx_base_url, "/api/v5/market/tickers", {"instType": inst_type}
+        )
+    )
+
+    res: dict[str, str] = {}
+    for ele in wrap.data:
+        symbol, _ = okx_symbol(ele.instId, inst_type)
+        res[ele.instId] = symbol
+        if ele.bidPx and ele.askPx and ele.ts:
+            store.update(symbol, ele.bidPx, ele.askPx, int(ele.ts))
+
+    return res
+
+
+def on_push(store: BookTickerStore, inst_symbols: dict[str, str], msg: dict):
+    """
+    tickers: {"arg": {...}, "data": [{"instId": "BTC-USDT", "bidPx": "", "askPx": "", "ts": ""}]}
+    bbo-tbt: {"arg": {"instId": "BTC-USDT"}, "data": [{"bids": [[px, sz, ..]], "asks": [...], "ts": ""}]}
+    """
+    arg = msg.get("arg") or {}
+    for ele in msg.get("data") or []:
+        inst_id = ele.get("instId") or arg.get("instId")
+        symbol = inst_symbols.get(inst_id)
+        if not symbol:
+            continue
+
+        if "bids" in ele:
+            bids = ele.get("bids")
+            asks = ele.get("asks")
+            bid = bids[0][0] if bids else None
+            ask = asks[0][0] if asks else None
+        else:
+            bid = ele.get("bidPx")
+            ask = ele.get("askPx")
+
+        ts = ele.get("ts")
+        if bid and ask:
+            store.update(symbol, bid, ask, int(ts) if ts else None)
+
+
+def register(service):
+    # avoid circular import
+    from app.market.market_data import live_books
+
+    for inst_type, market in (("SPOT", "spot"), ("SWAP", "swap")):
+        store = live_books[("okx", market)]
+        client = OkxWs()
+
+        async def run(inst_type=inst_type, store=store, client=client):
+            inst_symbols = await load_inst_ids(inst_type, store)
+            Lg.info(f"欧易 {inst_type} ws 订阅 {len(inst_symbols)} 个产品")
+
+            args = [
+                {"channel": okx_ws_channel, "instId": inst_id}
+                for inst_id in inst_symbols
+            ]
+            await client.subscribe_public(
+                args, lambda msg: on_push(store, inst_symbols, msg)
+            )
+
+        service.add_feed(store.market_name, run, [store], client.close)
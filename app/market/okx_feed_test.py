@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from app.market.book_store import BookTickerStore
+from app.market.okx_feed import on_push
+
+
+def test_on_push():
+    store = BookTickerStore("欧易-永续合约")
+    inst_symbols = {"BTC-USDT-SWAP": "BTCUSDT", "ETH-USDT-SWAP": "ETHUSDT"}
+
+    # tickers
+    on_push(
+        store,
+        inst_symbols,
+        {
+            "arg": {"channel": "tickers", "instId": "BTC-USDT-SWAP"},
+            "data": [
+                {
+                    "instId": "BTC-USDT-SWAP",
+                    "bidPx": "100.0",
+                    "askPx": "100.1",
+                    "ts": "12",
+                },
+                # 未订阅的产品
+                {"instId": "DOGE-USDT", "bidPx": "1", "askPx": "1.1", "ts": "12"},
+            ],
+        },
+    )
+    # bbo-tbt, instId 只在 arg 中
+    on_push(
+        store,
+        inst_symbols,
+        {
+            "arg": {"channel": "bbo-tbt", "instId": "ETH-USDT-SWAP"},
+            "data": [
+                {
+                    "bids": [["10", "3", "0", "1"]],
+                    "asks": [["10.1", "2", "0", "1"]],
+                    "ts": "34",
+                }
+            ],
+        },
+    )
+    # 没有挂单的一边为空, 跳过
+    on_push(
+        store,
+        inst_symbols,
+        {
+            "arg": {"instId": "ETH-USDT-SWAP"},
+            "data": [{"bids": [], "asks": [["9", "1"]]}],
+        },
+    )
+    # 订阅回执
+    on_push(store, inst_symbols, {"event": "subscribe", "arg": {"channel": "tickers"}})
+
+    book = {ele[0]: ele for ele in store.snapshot() or []}
+    assert sorted(book) == ["BTCUSDT", "ETHUSDT"]
+    assert book["BTCUSDT"][2:] == (Decimal("100"), Decimal("100.1"), 12)
+    assert book["ETHUSDT"][2:] == (Decimal("10"), Decimal("10.1"), 34)
+
+
+def test_prune_stale_symbols(monkeypatch):
+    from app.market import book_store
+
+    now = [1_000_000]
+    monkeypatch.setattr(book_store, "now_ms", lambda: now[0])
+
+    store = BookTickerStore("欧易-现货", stale_ms=5_000, evict_ms=600_000)
+    store.update("BTCUSDT", "100", "101")
+    store.update("OLDUSDT", "1", "1.1")
+    store.update("NEWUSDT", "2", "2.1")
+
+    # 产品表未加载, 只按 evict_ms 清理
+    now[0] += 10_000
+    assert store.prune() == 0
+
+    # 产品表中已没有 OLDUSDT, 且不再推送
+    version = store.version
+    assert store.prune({"BTCUSDT", "NEWUSDT"}) == 1
+    assert store.version > version
+    assert sorted(store._book) == ["BTCUSDT", "NEWUSDT"]
+
+    # 长时间没有推送的都移除
+    now[0] += 590_000
+    store.update("BTCUSDT", "100", "101")
+    assert store.prune() == 1
+    assert sorted(store._book) == ["BTCUSDT"]
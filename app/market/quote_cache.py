@@ -0,0 +1,157 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+import numpy as np
+
+from app.config import (
+    quote_cache_idle_evict_ms,
+    quote_cache_max_entries,
+    quote_cache_ttl_ms,
+)
+from app.market.quote_table import QuoteTable
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+@dataclass
+class QuoteSnapshot:
+    """某个 (交易所, 市场) 的一次全量(或指定 symbols)行情快照"""
+
+    key: Hashable
+    table: QuoteTable
+    # 从交易所拉取完成的时间, ms
+    fetched_at: int
+    # 进程内单调递增, 每次刷新都会得到新的版本号
+    version: int
+    # 价格没有变化时沿用上一个快照的 data_version, 用于生成 ETag
+    data_version: int = field(default=0)
+    # 最近一次被读取的时间, 用于淘汰
+    accessed_at: int = field(default=0)
+
+    @property
+    def symbol_ids(self) -> np.ndarray:
+        """跨交易所 join 时使用"""
+        return self.table.symbol_ids
+
+    def age_ms(self, now: int | None = None) -> int:
+        return max((now or now_ms()) - self.fetched_at, 0)
+
+    def is_fresh(self, ttl_ms: int, now: int | None = None) -> bool:
+        return self.age_ms(now) < ttl_ms
+
+
+class QuoteCache:
+    """进程内共享的行情快照缓存
+
+    - ttl 内的并发请求读取同一个快照
+    - 快照过期后, 同一个 key 只有一个协程去交易所拉取, 其余协程等待并复用结果
+    - 超过 idle_evict_ms 未被访问, 或者条目数超过 max_entries 时淘汰 (LRU)
+    """
+
+    def __init__(
+        self,
+        ttl_ms: int = quote_cache_ttl_ms,
+        idle_evict_ms: int = quote_cache_idle_evict_ms,
+        max_entries: int = quote_cache_max_entries,
+    ):
+        self.ttl_ms = ttl_ms
+        self.idle_evict_ms = idle_evict_ms
+        self.max_entries = max_entries
+
+        # 按访问时间排序, 最久未访问的在最前面
+        self._entries: OrderedDict[Hashable, QuoteSnapshot] = OrderedDict()
+        self._version_seq = itertools.count(1)
+        # key -> 正在进行的拉取
+        self._loading: dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def peek(self, key: Hashable, ttl_ms: int | None = None) -> QuoteSnapshot | None:
+        """取未过期的快照, 不触发拉取"""
+        ttl_ms = self.ttl_ms if ttl_ms is None else ttl_ms
+        now = now_ms()
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is None or not snapshot.is_fresh(ttl_ms, now):
+                return None
+            self._touch(key, snapshot, now)
+            return snapshot
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[QuoteTable | list[Any]]],
+        ttl_ms: int | None = None,
+    ) -> QuoteSnapshot:
+        """
+        ttl_ms: 覆盖默认有效期, eg. 行情来自 ws 内存表时只需要很短的有效期
+        """
+        snapshot = self.peek(key, ttl_ms)
+        if snapshot is not None:
+            return snapshot
+
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(key, loader))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda f: self._loaded(key, f))
+
+        # 某个请求被取消 (eg. 客户端断开) 不影响其他等待同一次拉取的请求
+        return await asyncio.shield(loading)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    async def _load(
+        self, key: Hashable, loader: Callable[[], Awaitable[QuoteTable | list[Any]]]
+    ) -> QuoteSnapshot:
+        table = QuoteTable.of(await loader())
+        now = now_ms()
+        with self._lock:
+            version = next(self._version_seq)
+            prev = self._entries.get(key)
+            snapshot = QuoteSnapshot(
+                key=key,
+                table=table,
+                fetched_at=now,
+                version=version,
+                data_version=(
+                    prev.data_version
+                    if prev is not None and prev.table.same_prices(table)
+                    else version
+                ),
+            )
+            self._touch(key, snapshot, now)
+            self._evict(now)
+
+        return snapshot
+
+    def _loaded(self, key: Hashable, loading: asyncio.Future):
+        if self._loading.get(key) is loading:
+            del self._loading[key]
+        # 所有等待者都已取消时, 避免 "exception was never retrieved"
+        if not loading.cancelled():
+            loading.exception()
+
+    def _touch(self, key: Hashable, snapshot: QuoteSnapshot, now: int):
+        snapshot.accessed_at = now
+        self._entries[key] = snapshot
+        self._entries.move_to_end(key)
+
+    def _evict(self, now: int):
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            idle = now - oldest.accessed_at >= self.idle_evict_ms
+            if not idle and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+
+
+quote_cache = QuoteCache()
@@ -0,0 +1,40 @@
+import asyncio
+
+from app.market.quote_cache import QuoteCache
+
+
+def test_quote_cache_shares_snapshot():
+    cache = QuoteCache(ttl_ms=1000, idle_evict_ms=60000, max_entries=8)
+
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return [("BTCUSDT", "币安-现货", 1, 2, 0)]
+
+    async def main():
+        return await asyncio.gather(*(cache.get("k", loader) for _ in range(8)))
+
+    snapshots = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert len({id(s) for s in snapshots}) == 1
+
+
+def test_quote_cache_ttl_and_evict():
+    cache = QuoteCache(ttl_ms=0, idle_evict_ms=60000, max_entries=2)
+
+    async def empty():
+        return []
+
+    async def main():
+        first = await cache.get("a", empty)
+        second = await cache.get("a", empty)
+        assert second.version > first.version
+
+        await cache.get("b", empty)
+        await cache.get("c", empty)
+        assert list(cache._entries.keys()) == ["b", "c"]
+
+    asyncio.run(main())
@@ -0,0 +1,252 @@
+"""列式存储的行情表
+
+一份快照 (某个盘口的全部买一卖一) 不再是每行一个 (str, str, Decimal, Decimal, int) 元组,
+而是几列 numpy 数组:
+
+- symbol: 统一 symbol 的稠密 id (instruments.symbol_id)
+- 盘口名称: LabelPool 中的小整数
+- 价格: (整数, 10 的指数) 两列, 还原后与原 Decimal 完全一致; 计算用的 float64 列按需生成
+- 时间戳: int64
+
+只有最终输出的前 n 行才还原为 BasicPrice 元组
+"""
+
+import threading
+from decimal import Decimal
+from functools import cached_property
+
+import numpy as np
+
+from app.market.instruments import instruments
+from app.models.watch_models import BasicPrice
+
+_I8_MAX = 2**63
+
+
+def encode_decimal(val: Decimal) -> tuple[int, int] | None:
+    """Decimal -> (整数, 指数), 超出范围返回 None"""
+    if not isinstance(val, Decimal):
+        val = Decimal(val)
+    sign, digits, exp = val.as_tuple()
+    if not isinstance(exp, int) or not -128 <= exp <= 127:
+        return None
+
+    m = int("".join(map(str, digits)) or "0")
+    if m >= _I8_MAX:
+        return None
+    return (-m if sign else m), exp
+
+
+def decode_decimal(m: int, exp: int) -> Decimal:
+    return Decimal(m).scaleb(exp)
+
+
+class LabelPool:
+    """盘口名称 (eg. 币安-现货) <-> 小整数, 只增不减"""
+
+    def __init__(self):
+        self._ids: dict[str, int] = {}
+        self._labels: list[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, label: str) -> int:
+        i = self._ids.get(label)
+        if i is None:
+            with self._lock:
+                i = self._ids.get(label)
+                if i is None:
+                    i = self._ids[label] = len(self._labels)
+                    self._labels.append(label)
+        return i
+
+    def label(self, i: int) -> str:
+        return self._labels[i]
+
+
+market_labels = LabelPool()
+
+
+class DecimalColumn:
+    """一列 Decimal, 以 (整数, 指数) 保存, 下标访问时才还原为 Decimal"""
+
+    def __init__(self, mantissa: np.ndarray, exp: np.ndarray):
+        self.mantissa = mantissa
+        self.exp = exp
+
+    def __len__(self):
+        return len(self.mantissa)
+
+    def __getitem__(self, i: int) -> Decimal:
+        return decode_decimal(int(self.mantissa[i]), int(self.exp[i]))
+
+    def take(self, rows: np.ndarray) -> "DecimalColumn":
+        return DecimalColumn(self.mantissa[rows], self.exp[rows])
+
+    @cached_property
+    def floats(self) -> np.ndarray:
+        """与 float(Decimal) 一致: 10 的幂在 float64 中是精确的, 除法只舍入一次"""
+        m = self.mantissa.astype(np.float64)
+        exp = self.exp.astype(np.int64)
+        neg = exp < 0
+        return np.where(
+            neg,
+            m / np.power(10.0, np.where(neg, -exp, 0)),
+            m * np.power(10.0, np.where(neg, 0, exp)),
+        )
+
+
+class QuoteTable:
+    """某个盘口的一份行情, 各列按行对齐"""
+
+    __slots__ = ("symbol_ids", "labels", "bid", "ask", "ts")
+
+    def __init__(
+        self,
+        symbol_ids: np.ndarray,
+        labels: np.ndarray,
+        bid: DecimalColumn,
+        ask: DecimalColumn,
+        ts: np.ndarray,
+    ):
+        self.symbol_ids = symbol_ids
+        self.labels = labels
+        self.bid = bid
+        self.ask = ask
+        self.ts = ts
+
+    def __len__(self):
+        return len(self.symbol_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            arr.nbytes
+            for arr in (
+                self.symbol_ids,
+                self.labels,
+                self.bid.mantissa,
+                self.bid.exp,
+                self.ask.mantissa,
+                self.ask.exp,
+                self.ts,
+            )
+        )
+
+    @classmethod
+    def empty(cls) -> "QuoteTable":
+        return cls.from_rows([])
+
+    @classmethod
+    def of(cls, prices: "QuoteTable | list[BasicPrice]") -> "QuoteTable":
+        return prices if isinstance(prices, QuoteTable) else cls.from_prices(prices)
+
+    @classmethod
+    def from_prices(cls, prices: list[BasicPrice]) -> "QuoteTable":
+        rows = []
+        for symbol, label, bid, ask, ts in prices:
+            row = encode_row(symbol, label, bid, ask, ts)
+            if row:
+                rows.append(row)
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_rows(cls, rows: list[tuple]) -> "QuoteTable":
+        """rows: encode_row 的结果"""
+        arr = np.array(rows, dtype=np.int64).reshape(len(rows), 7)
+        return cls(
+            arr[:, 0].astype(np.int32),
+            arr[:, 1].astype(np.int16),
+            DecimalColumn(arr[:, 2], arr[:, 3].astype(np.int8)),
+            DecimalColumn(arr[:, 4], arr[:, 5].astype(np.int8)),
+            arr[:, 6],
+        )
+
+    def same_prices(self, other: "QuoteTable") -> bool:
+        """symbol, 盘口, 买一卖一都相同 (不比较时间戳)"""
+        if other is self:
+            return True
+        return len(other) == len(self) and all(
+            np.array_equal(x, y)
+            for x, y in (
+                (self.symbol_ids, other.symbol_ids),
+                (self.labels, other.labels),
+                (self.bid.mantissa, other.bid.mantissa),
+                (self.bid.exp, other.bid.exp),
+                (self.ask.mantissa, other.ask.mantissa),
+                (self.ask.exp, other.ask.exp),
+            )
+        )
+
+    def take(self, rows: np.ndarray) -> "QuoteTable":
+        return QuoteTable(
+            self.symbol_ids[rows],
+            self.labels[rows],
+            self.bid.take(rows),
+            self.ask.take(rows),
+            self.ts[rows],
+        )
+
+    def select(self, symbols: list[str] | None) -> "QuoteTable":
+        """只保留指定的 symbols, 不指定返回自身"""
+        if not symbols:
+            return self
+        ids = [sid for sid in map(instruments.find_id, symbols) if sid is not None]
+        return self.take(np.flatnonzero(np.isin(self.symbol_ids, ids)))
+
+    def symbol(self, i: int) -> str:
+        return instruments.symbol_name(int(self.symbol_ids[i]))
+
+    def row(self, i: int) -> BasicPrice:
+        return (
+            self.symbol(i),
+            market_labels.label(int(self.labels[i])),
+            self.bid[i],
+            self.ask[i],
+            int(self.ts[i]),
+        )
+
+    def rows(self) -> list[BasicPrice]:
+        return self.rows_at(np.arange(len(self)))
+
+    def rows_at(self, rows: np.ndarray) -> list[BasicPrice]:
+        """同 [self.row(i) for i in rows], 按列一次取出, 不逐个访问 numpy 标量"""
+        columns = (
+            self.symbol_ids,
+            self.labels,
+            self.bid.mantissa,
+            self.bid.exp,
+            self.ask.mantissa,
+            self.ask.exp,
+            self.ts,
+        )
+        return [
+            (
+                instruments.symbol_name(sid),
+                market_labels.label(label),
+                decode_decimal(bid, bid_exp),
+                decode_decimal(ask, ask_exp),
+                ts,
+            )
+            for sid, label, bid, bid_exp, ask, ask_exp, ts in zip(
+                *(col[rows].tolist() for col in columns)
+            )
+        ]
+
+
+def encode_row(
+    symbol: str, label: str, bid: Decimal, ask: Decimal, ts: int | None
+) -> tuple | None:
+    """BasicPrice -> QuoteTable 的一行, 价格超出范围返回 None"""
+    b = encode_decimal(bid)
+    a = encode_decimal(ask)
+    if b is None or a is None:
+        return None
+    return (
+        instruments.symbol_id(symbol),
+        market_labels.intern(label),
+        b[0],
+        b[1],
+        a[0],
+        a[1],
+        int(ts or 0),
+    )
@@ -0,0 +1,24 @@
+from decimal import Decimal
+
+from app.market.quote_table import QuoteTable
+
+
+def test_quote_table_round_trip():
+    prices = [
+        ("BTCUSDT", "币安-现货", Decimal("65000.10"), Decimal("1E+2"), 1),
+        ("PEPEUSDT", "欧易-现货", Decimal("0.00001234"), Decimal("0.00001235"), 2),
+        ("ETHUSDT", "币安-现货", Decimal("3000.5"), Decimal("3000.51"), 3),
+    ]
+    table = QuoteTable.from_prices(prices)
+
+    assert len(table) == 3
+    assert table.rows() == prices
+    # 还原后的 Decimal 表示完全一致
+    assert str(table.bid[0]) == "65000.10"
+    assert str(table.ask[0]) == "1E+2"
+    assert table.bid.floats.tolist() == [float(ele[2]) for ele in prices]
+    assert table.ask.floats.tolist() == [float(ele[3]) for ele in prices]
+
+    assert table.select(["ETHUSDT", "DOGEUSDT"]).rows() == [prices[2]]
+    assert table.select(None) is table
+    assert QuoteTable.empty().rows() == []
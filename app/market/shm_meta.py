@@ -0,0 +1,175 @@
+"""采集进程发布给 reader 的低频数据 (产品信息, 资金费率)
+
+与行情 (shm_quotes) 分开的一个 mmap 文件, 每项数据一个 slot, 内容为一份 json:
+
+    header (64 字节): magic, 布局版本, slot 数, 每个 slot 占用的字节数
+    slot * n:
+        slot header (64 字节): key, seq, version, published_at, 当前缓冲区, 两个缓冲区的字节数
+        buffer * 2: 双缓冲
+
+写入和读取的协议同 shm_quotes (seqlock, 被写入打断时退避重试). 数据只由采集进程定时拉取, reader 按版本号判断是否需要重新解析,
+worker 数量不影响交易所的请求量.
+"""
+
+import itertools
+import json
+import mmap
+import os
+import struct
+from typing import Any
+
+from app.config import market_shm_meta_path, market_shm_meta_size_mb
+from app.market.shm_quotes import retry_backoff
+from app.utils import json_util
+from app.utils.log_util import Lg
+
+MAGIC = b"HAHM"
+LAYOUT_VERSION = 1
+
+# 产品信息 (InstrumentRegistry.dump), 资金费率 (FundingStore.dump)
+META_KEYS = ("instruments", "funding")
+
+# magic, 布局版本, slot 数, slot 字节数
+_HEADER = struct.Struct("<4sIII")
+_HEADER_SIZE = 64
+
+# key, seq, version, published_at, active, size0, size1
+_SLOT = struct.Struct("<32sQQqIII")
+_SLOT_SIZE = 64
+_SEQ = struct.Struct("<Q")
+_SEQ_OFFSET = 32
+
+
+class MetaRegionWriter:
+    """采集进程使用"""
+
+    def __init__(
+        self,
+        keys: tuple[str, ...] = META_KEYS,
+        path: str = market_shm_meta_path,
+        size_mb: int = market_shm_meta_size_mb,
+    ):
+        size = size_mb * 1024 * 1024
+        self.slot_size = (size - _HEADER_SIZE) // len(keys) // 8 * 8
+        self.capacity = (self.slot_size - _SLOT_SIZE) // 2
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+
+        self.mm[:size] = bytes(size)
+        _HEADER.pack_into(self.mm, 0, MAGIC, LAYOUT_VERSION, len(keys), self.slot_size)
+        self.slots = {}
+        for i, key in enumerate(keys):
+            offset = _HEADER_SIZE + i * self.slot_size
+            _SLOT.pack_into(self.mm, offset, key.encode(), 0, 0, 0, 0, 0, 0)
+            self.slots[key] = offset
+
+        self.path = path
+        self._version_seq = itertools.count(1)
+
+    def publish(self, key: str, data: Any, published_at: int) -> int | None:
+        """写入一项数据, 返回新的版本号, 超出空间时不写入并返回 None"""
+        body = json_util.dumps(data)
+        if len(body) > self.capacity:
+            Lg.error(f"{key} 共享数据 {len(body)} 字节, 超出空间, 请调大 MARKET_SHM_META_SIZE_MB")
+            return None
+
+        slot = self.slots[key]
+        _, seq, _, _, active, *sizes = _SLOT.unpack_from(self.mm, slot)
+        buf = 1 - active
+        offset = slot + _SLOT_SIZE + buf * self.capacity
+        self.mm[offset : offset + len(body)] = body
+        sizes[buf] = len(body)
+
+        version = next(self._version_seq)
+        _SEQ.pack_into(self.mm, slot + _SEQ_OFFSET, seq + 1)
+        _SLOT.pack_into(
+            self.mm, slot, key.encode(), seq + 1, version, published_at, buf, *sizes
+        )
+        _SEQ.pack_into(self.mm, slot + _SEQ_OFFSET, seq + 2)
+        return version
+
+    def close(self):
+        self.mm.close()
+
+
+class MetaRegionReader:
+    """worker 使用, 文件不存在时视为不可用, 采集进程重建文件后重新映射"""
+
+    def __init__(self, path: str = market_shm_meta_path):
+        self.path = path
+        self._mm: mmap.mmap | None = None
+        self._slots: dict[str, int] = {}
+        self._capacity = 0
+        self._inode: tuple[int, int] | None = None
+
+    def read(
+        self, key: str, known_version: int = 0, retries: int = 5
+    ) -> tuple[int, int, Any] | None:
+        """
+        Returns:
+            (version, published_at, data), 版本与 known_version 相同时 data 为 None;
+            不可用或重试后仍被写入打断时返回 None
+        """
+        if not self._open() or key not in self._slots:
+            return None
+
+        mm, slot = self._mm, self._slots[key]
+        for attempt in range(retries):
+            if attempt:
+                retry_backoff(attempt - 1)
+            seq = _SEQ.unpack_from(mm, slot + _SEQ_OFFSET)[0]  # type: ignore
+            if seq % 2:
+                continue
+            _, _, version, published_at, active, *sizes = _SLOT.unpack_from(mm, slot)  # type: ignore
+            if version == 0:
+                return None
+
+            body = None
+            if version != known_version:
+                offset = slot + _SLOT_SIZE + active * self._capacity
+                body = mm[offset : offset + min(sizes[active], self._capacity)]  # type: ignore
+            if _SEQ.unpack_from(mm, slot + _SEQ_OFFSET)[0] != seq:  # type: ignore
+                continue
+            return version, published_at, None if body is None else json.loads(body)
+
+        return None
+
+    def _open(self) -> bool:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self._mm is not None and self._inode == (st.st_ino, st.st_size):
+            return True
+
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if st.st_size < _HEADER_SIZE:
+            return False
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            mm = mmap.mmap(fd, st.st_size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, layout, slot_count, slot_size = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            mm.close()
+            return False
+
+        self._slots = {}
+        for i in range(slot_count):
+            offset = _HEADER_SIZE + i * slot_size
+            key = _SLOT.unpack_from(mm, offset)[0].rstrip(b"\0").decode()
+            self._slots[key] = offset
+        self._capacity = (slot_size - _SLOT_SIZE) // 2
+        self._mm = mm
+        self._inode = (st.st_ino, st.st_size)
+        return True
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from app.market.instruments import InstrumentRegistry
+from app.market.shm_meta import MetaRegionReader, MetaRegionWriter
+
+
+def test_instruments_published_to_reader(tmp_path):
+    path = str(tmp_path / "meta")
+    reader = MetaRegionReader(path)
+    assert reader.read("instruments") is None
+
+    writer = MetaRegionWriter(path=path, size_mb=1)
+    assert reader.read("instruments") is None
+
+    collector = InstrumentRegistry()
+    collector.put(
+        "okx",
+        "swap",
+        [
+            ("BTC-USDT-SWAP", "BTCUSDT", "0.1", "0.01"),
+            ("ETH-USDT-SWAP", "ETHUSDT", "0.01", "0.1"),
+        ],
+    )
+    collector.put("binance", "spot", [("BTCUSDT", "BTCUSDT", "0.01000000", "")])
+    version = writer.publish("instruments", collector.dump(), 1)
+
+    worker = InstrumentRegistry()
+    # worker 中已有其他 symbol, id 在各进程内独立分配
+    worker.symbol_id("DOGEUSDT")
+    res = reader.read("instruments")
+    assert res is not None and res[0] == version
+    worker.load(res[2])
+
+    assert worker.canonical("okx", "swap", "ETH-USDT-SWAP") == "ETHUSDT"
+    assert worker.inst_id("binance", "spot", "BTCUSDT") == "BTCUSDT"
+    table = worker.table("okx", "swap")
+    assert table.tick_sizes == [Decimal("0.1"), Decimal("0.01")]
+    assert table.multipliers.tolist() == [0.01, 0.1]
+    assert table.symbol_ids.tolist() == worker.symbol_ids(["BTCUSDT", "ETHUSDT"]).tolist()
+    assert worker.table("binance", "spot").tick_sizes == [Decimal("0.01")]
+
+    # 版本没有变化时不再解析
+    assert reader.read("instruments", version) == (version, 1, None)
+
+    writer.close()
+
+
+def test_meta_reader_backs_off_while_writer_holds_seq(tmp_path, monkeypatch):
+    from app.market import shm_meta
+
+    path = str(tmp_path / "meta")
+    writer = MetaRegionWriter(path=path, size_mb=1)
+    reader = MetaRegionReader(path)
+    version = writer.publish("funding", {"okx": {}}, 1)
+
+    seq_offset = writer.slots["funding"] + shm_meta._SEQ_OFFSET
+    seq = shm_meta._SEQ.unpack_from(writer.mm, seq_offset)[0]
+    shm_meta._SEQ.pack_into(writer.mm, seq_offset, seq + 1)
+
+    waits = []
+
+    def backoff(attempt):
+        waits.append(attempt)
+        if attempt == 2:
+            shm_meta._SEQ.pack_into(writer.mm, seq_offset, seq)
+
+    monkeypatch.setattr(shm_meta, "retry_backoff", backoff)
+    assert reader.read("funding") == (version, 1, {"okx": {}})
+    assert waits == [0, 1, 2]
+
+    writer.close()
@@ -0,0 +1,328 @@
+"""跨进程共享的行情快照
+
+采集进程 (writer) 把每个盘口的最优挂单写入一个 mmap 文件, 所有 gunicorn worker (reader)
+只读映射同一个文件, 不再各自连接交易所.
+
+布局:
+
+    header (64 字节): magic, 布局版本, 盘口数, 每个盘口占用的字节数
+    slot * n: 每个盘口一个 slot
+        slot header (128 字节): 盘口 key, seq, version, published_at, 当前缓冲区, 两个缓冲区的条数
+        buffer * 2: 定长记录 RECORD, 双缓冲
+
+写入时先写不活跃的缓冲区, 再切换 active, 期间 seq 为奇数.
+读取 (seqlock): 读到偶数的 seq, 复制 slot header 和记录, 再读一次 seq, 两次相等才是完整的快照,
+否则退避后重试 (retry_backoff). 版本没有变化时不复制记录.
+"""
+
+import itertools
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from app.config import market_shm_path, market_shm_size_mb, market_ws_stale_ms
+from app.market.book_store import now_ms
+from app.market.instruments import instruments
+from app.market.quote_table import DecimalColumn, QuoteTable, market_labels
+from app.models.watch_models import BasicPrice
+from app.utils.log_util import Lg
+
+MAGIC = b"HAHQ"
+LAYOUT_VERSION = 1
+
+# magic, 布局版本, slot 数, slot 字节数
+_HEADER = struct.Struct("<4sIII")
+_HEADER_SIZE = 64
+
+# key, seq, version, published_at, active, count0, count1
+_SLOT = struct.Struct("<32sQQqIII")
+_SLOT_SIZE = 128
+_SEQ = struct.Struct("<Q")
+_SEQ_OFFSET = 32
+_PUBLISHED_AT = struct.Struct("<q")
+_PUBLISHED_AT_OFFSET = 48
+
+# 价格以 (整数, 10 的指数) 保存, 还原后与原 Decimal 完全一致
+RECORD = np.dtype(
+    [
+        ("symbol", "S32"),
+        ("bid", "<i8"),
+        ("bid_exp", "i1"),
+        ("ask", "<i8"),
+        ("ask_exp", "i1"),
+        ("ts", "<i8"),
+    ]
+)
+
+# 读取被写入打断后, 第 i 次重试前等待 _RETRY_BACKOFF_S * 2^i
+_RETRY_BACKOFF_S = 0.0001
+
+
+def retry_backoff(attempt: int):
+    """采集进程写完一个 slot 通常不到 1ms, 立即重试只会撞上同一次写入, 让出 cpu 等它写完"""
+    time.sleep(_RETRY_BACKOFF_S * (1 << attempt))
+
+
+class _Region:
+    def __init__(self, mm: mmap.mmap, slot_size: int, slots: dict[str, int]):
+        self.mm = mm
+        self.slot_size = slot_size
+        # key -> slot 起始偏移
+        self.slots = slots
+        self.capacity = (slot_size - _SLOT_SIZE) // 2 // RECORD.itemsize
+
+    def buffer_offset(self, slot: int, buf: int) -> int:
+        return slot + _SLOT_SIZE + buf * self.capacity * RECORD.itemsize
+
+
+class QuoteRegionWriter:
+    """采集进程使用, 创建共享内存并发布快照"""
+
+    def __init__(
+        self,
+        keys: list[str],
+        path: str = market_shm_path,
+        size_mb: int = market_shm_size_mb,
+    ):
+        size = size_mb * 1024 * 1024
+        slot_size = (size - _HEADER_SIZE) // len(keys) // 8 * 8
+
+        # 沿用同一个 inode, worker 已有的映射在采集进程重启后仍然有效
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            mm = mmap.mmap(fd, size, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+
+        mm[:size] = bytes(size)
+        _HEADER.pack_into(mm, 0, MAGIC, LAYOUT_VERSION, len(keys), slot_size)
+        slots = {}
+        for i, key in enumerate(keys):
+            offset = _HEADER_SIZE + i * slot_size
+            _SLOT.pack_into(mm, offset, key.encode(), 0, 0, 0, 0, 0, 0)
+            slots[key] = offset
+
+        self.path = path
+        self._region = _Region(mm, slot_size, slots)
+        self._version_seq = itertools.count(1)
+
+    def publish(
+        self, key: str, prices: QuoteTable | list[BasicPrice], published_at: int
+    ) -> int:
+        """写入一个盘口的全量快照, 返回新的版本号"""
+        region = self._region
+        slot = region.slots[key]
+        _, seq, _, _, active, *counts = _SLOT.unpack_from(region.mm, slot)
+
+        records = self._encode(key, prices)
+        buf = 1 - active
+        offset = region.buffer_offset(slot, buf)
+        region.mm[offset : offset + records.nbytes] = records.tobytes()
+
+        counts[buf] = len(records)
+
+        version = next(self._version_seq)
+        _SEQ.pack_into(region.mm, slot + _SEQ_OFFSET, seq + 1)
+        _SLOT.pack_into(
+            region.mm, slot, key.encode(), seq + 1, version, published_at, buf, *counts
+        )
+        _SEQ.pack_into(region.mm, slot + _SEQ_OFFSET, seq + 2)
+        return version
+
+    def heartbeat(self, key: str, published_at: int):
+        """数据没有变化, 只刷新发布时间, 让 reader 知道快照仍然有效"""
+        region = self._region
+        _PUBLISHED_AT.pack_into(
+            region.mm, region.slots[key] + _PUBLISHED_AT_OFFSET, published_at
+        )
+
+    def close(self):
+        self._region.mm.close()
+
+    def _encode(self, key: str, prices: QuoteTable | list[BasicPrice]) -> np.ndarray:
+        table = QuoteTable.of(prices)
+        symbols = [
+            instruments.symbol_name(sid).encode() for sid in table.symbol_ids.tolist()
+        ]
+        too_long = [i for i, sy in enumerate(symbols) if len(sy) > 32]
+        if too_long:
+            Lg.warning(f"{key} {len(too_long)} 个 symbol 过长, 无法写入共享内存, 跳过")
+            keep = np.ones(len(table), dtype=bool)
+            keep[too_long] = False
+            table = table.take(np.flatnonzero(keep))
+            symbols = [sy for sy in symbols if len(sy) <= 32]
+
+        capacity = self._region.capacity
+        if len(table) > capacity:
+            Lg.error(
+                f"{key} 共享内存空间不足, 只写入前 {capacity} 条, 请调大 MARKET_SHM_SIZE_MB"
+            )
+            table = table.take(np.arange(capacity))
+            symbols = symbols[:capacity]
+
+        records = np.empty(len(table), dtype=RECORD)
+        records["symbol"] = symbols
+        records["bid"] = table.bid.mantissa
+        records["bid_exp"] = table.bid.exp
+        records["ask"] = table.ask.mantissa
+        records["ask_exp"] = table.ask.exp
+        records["ts"] = table.ts
+        return records
+
+
+class QuoteRegionReader:
+    """worker 使用, 只读映射共享内存, 文件不存在时视为不可用"""
+
+    def __init__(self, path: str = market_shm_path):
+        self.path = path
+        self._region: _Region | None = None
+        self._inode: tuple[int, int] | None = None
+
+    def read(
+        self, key: str, known_version: int = 0, retries: int = 5
+    ) -> tuple[int, int, np.ndarray | None] | None:
+        """
+        Returns:
+            (version, published_at, records), records 为复制出共享内存的记录,
+            版本与 known_version 相同时为 None; 不可用或重试后仍被写入打断时返回 None
+        """
+        region = self._open()
+        if region is None or key not in region.slots:
+            return None
+
+        slot = region.slots[key]
+        for attempt in range(retries):
+            if attempt:
+                retry_backoff(attempt - 1)
+            seq = _SEQ.unpack_from(region.mm, slot + _SEQ_OFFSET)[0]
+            if seq % 2:
+                continue
+            _, _, version, published_at, active, *counts = _SLOT.unpack_from(
+                region.mm, slot
+            )
+            records = None
+            if version != known_version:
+                records = self._copy_records(region, slot, active, counts[active])
+            if _SEQ.unpack_from(region.mm, slot + _SEQ_OFFSET)[0] == seq:
+                return version, published_at, records
+
+        return None
+
+    def published_at(self, key: str) -> int:
+        region = self._open()
+        if region is None or key not in region.slots:
+            return 0
+        return _PUBLISHED_AT.unpack_from(
+            region.mm, region.slots[key] + _PUBLISHED_AT_OFFSET
+        )[0]
+
+    def _copy_records(self, region: _Region, slot: int, buf: int, count: int) -> np.ndarray:
+        # count 可能来自被打断的读取, 不能越过缓冲区
+        count = min(count, region.capacity)
+        return np.frombuffer(
+            region.mm, dtype=RECORD, count=count, offset=region.buffer_offset(slot, buf)
+        ).copy()
+
+    def reopen_if_replaced(self):
+        """采集进程以不同的大小重建了共享内存, 重新映射"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self._inode is not None and self._inode != (st.st_ino, st.st_size):
+            self._region = None
+
+    def _open(self) -> _Region | None:
+        if self._region is not None:
+            return self._region
+
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            st = os.fstat(fd)
+            if st.st_size < _HEADER_SIZE:
+                return None
+            mm = mmap.mmap(fd, st.st_size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+
+        magic, layout, slot_count, slot_size = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            mm.close()
+            return None
+
+        slots = {}
+        for i in range(slot_count):
+            offset = _HEADER_SIZE + i * slot_size
+            key = _SLOT.unpack_from(mm, offset)[0].rstrip(b"\0").decode()
+            slots[key] = offset
+
+        self._region = _Region(mm, slot_size, slots)
+        self._inode = (st.st_ino, st.st_size)
+        return self._region
+
+
+class SharedBook:
+    """共享内存中某个盘口的只读视图, 接口与 BookTickerStore 一致
+
+    每个版本只解码一次, 之后的读取复用
+    """
+
+    def __init__(
+        self,
+        reader: QuoteRegionReader,
+        key: str,
+        market_name: str,
+        stale_ms: int = market_ws_stale_ms,
+    ):
+        self.reader = reader
+        self.key = key
+        self.market_name = market_name
+        self.stale_ms = stale_ms
+        self.version = 0
+
+        self._table = QuoteTable.empty()
+        self._label = market_labels.intern(market_name)
+
+    def is_live(self, now: int | None = None) -> bool:
+        live = (now or now_ms()) - self.reader.published_at(self.key) < self.stale_ms
+        if not live:
+            self.reader.reopen_if_replaced()
+        return live
+
+    def snapshot(self, symbols: list[str] | None = None) -> list[BasicPrice] | None:
+        """采集进程不可用时返回 None"""
+        table = self.table(symbols)
+        return None if table is None else table.rows()
+
+    def table(self, symbols: list[str] | None = None) -> QuoteTable | None:
+        """同 snapshot, 返回列式的行情表, 不逐行还原"""
+        if not self.is_live() or not self._refresh():
+            return None
+        return self._table.select(symbols)
+
+    def _refresh(self) -> bool:
+        res = self.reader.read(self.key, self.version)
+        if res is None:
+            # 重试后仍被写入打断: 已有完整的快照时继续使用 (最多晚一次发布), 不回退到 rest
+            return self.version > 0
+
+        version, _, records = res
+        if records is None:
+            return True
+
+        self._table = QuoteTable(
+            instruments.symbol_ids([sy.decode() for sy in records["symbol"]]),
+            np.full(len(records), self._label, dtype=np.int16),
+            DecimalColumn(records["bid"], records["bid_exp"]),
+            DecimalColumn(records["ask"], records["ask_exp"]),
+            records["ts"],
+        )
+        self.version = version
+        return True
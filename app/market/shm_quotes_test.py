@@ -0,0 +1,118 @@
+from decimal import Decimal
+
+from app.market.book_store import now_ms
+from app.market.shm_quotes import QuoteRegionReader, QuoteRegionWriter, SharedBook
+
+
+def test_shared_book_round_trip(tmp_path):
+    path = str(tmp_path / "quotes")
+    writer = QuoteRegionWriter(["binance-spot", "okx-swap"], path, size_mb=1)
+    reader = QuoteRegionReader(path)
+    book = SharedBook(reader, "okx-swap", "欧易-永续合约")
+
+    assert book.snapshot() is None
+
+    prices = [
+        ("BTCUSDT", "欧易-永续合约", Decimal("65000.10"), Decimal("1E+2"), 1),
+        ("PEPEUSDT", "欧易-永续合约", Decimal("0.00001234"), Decimal("0.00001235"), 2),
+    ]
+    writer.publish("okx-swap", prices, now_ms())
+
+    res = book.snapshot()
+    assert res == prices
+    # 还原后的 Decimal 表示完全一致
+    assert [str(ele[2]) for ele in res] == ["65000.10", "0.00001234"]
+    assert str(res[0][3]) == "1E+2"
+    assert book.snapshot(["PEPEUSDT", "ETHUSDT"]) == [prices[1]]
+
+    # 版本不变时复用已解码的结果
+    version = book.version
+    book.snapshot()
+    assert book.version == version
+
+    writer.publish("okx-swap", prices[:1], now_ms())
+    assert book.snapshot() == prices[:1]
+    assert book.version > version
+
+    # 其他盘口没有发布过, 不可用
+    assert SharedBook(reader, "binance-spot", "币安-现货").snapshot() is None
+
+    writer.close()
+
+
+def test_reader_retries_when_writer_interleaves(tmp_path, monkeypatch):
+    path = str(tmp_path / "quotes")
+    writer = QuoteRegionWriter(["okx-swap"], path, size_mb=1)
+    reader = QuoteRegionReader(path)
+
+    def prices(n: int, px: str):
+        return [(f"S{i}USDT", "欧易-永续合约", Decimal(px), Decimal(px), 1) for i in range(n)]
+
+    writer.publish("okx-swap", prices(3, "1"), now_ms())
+
+    # 在读取 header 之后, 复制记录之前, 写入两次: 第二次改写的正是 header 指向的缓冲区,
+    # 并且条数不同 (旧的 active 和新的 counts 组合会读到错误的条数)
+    copy = QuoteRegionReader._copy_records
+    interleaved = []
+
+    def copy_with_writer(self, region, slot, buf, count):
+        if not interleaved:
+            interleaved.append(count)
+            writer.publish("okx-swap", prices(5, "2"), now_ms())
+            writer.publish("okx-swap", prices(2, "3"), now_ms())
+        return copy(self, region, slot, buf, count)
+
+    monkeypatch.setattr(QuoteRegionReader, "_copy_records", copy_with_writer)
+    version, _, records = reader.read("okx-swap")
+
+    # 第一次读取被丢弃, 重试后读到最新的完整快照
+    assert interleaved == [3]
+    assert version == 3
+    assert len(records) == 2
+    assert records["bid"].tolist() == [3, 3]
+
+    writer.close()
+
+
+def test_reader_backs_off_while_writer_holds_seq(tmp_path, monkeypatch):
+    from app.market import shm_quotes
+
+    path = str(tmp_path / "quotes")
+    writer = QuoteRegionWriter(["okx-swap"], path, size_mb=1)
+    reader = QuoteRegionReader(path)
+    book = SharedBook(reader, "okx-swap", "欧易-永续合约")
+
+    prices = [("BTCUSDT", "欧易-永续合约", Decimal("1"), Decimal("2"), 1)]
+    writer.publish("okx-swap", prices, now_ms())
+    assert book.snapshot() == prices
+
+    # 采集进程写到一半: seq 保持为奇数
+    mm = writer._region.mm
+    seq_offset = writer._region.slots["okx-swap"] + shm_quotes._SEQ_OFFSET
+    seq = shm_quotes._SEQ.unpack_from(mm, seq_offset)[0]
+    shm_quotes._SEQ.pack_into(mm, seq_offset, seq + 1)
+
+    # 退避期间写入完成, 读取成功
+    waits = []
+    release = [True]
+
+    def backoff(attempt):
+        waits.append(attempt)
+        if attempt == 1 and release:
+            release.clear()
+            shm_quotes._SEQ.pack_into(mm, seq_offset, seq)
+
+    monkeypatch.setattr(shm_quotes, "retry_backoff", backoff)
+    res = reader.read("okx-swap")
+    assert waits == [0, 1]
+    assert res is not None and res[2]["bid"].tolist() == [1]
+
+    # 一直写不完: 读取失败, 已有快照的继续使用, 不回退到 rest
+    shm_quotes._SEQ.pack_into(mm, seq_offset, seq + 1)
+    waits.clear()
+    assert reader.read("okx-swap") is None
+    assert waits == [0, 1, 2, 3]
+    assert book.snapshot() == prices
+    assert SharedBook(reader, "okx-swap", "欧易-永续合约").snapshot() is None
+
+    writer.close()
@@ -0,0 +1,295 @@
+import bisect
+import itertools
+import threading
+import time
+from typing import Callable, Hashable
+
+import numpy as np
+
+from app.config import quote_cache_idle_evict_ms
+from app.errors import biz_error
+from app.market.instruments import instruments, join_by_id
+from app.market.quote_table import QuoteTable
+from app.market.spread_engine import (
+    SCALE,
+    SpreadColumns,
+    direction_code,
+    spread_sort_key,
+)
+from app.market.spread_stats import SpreadStats
+from app.models.watch_models import BasicPrice
+from app.utils.log_util import Lg
+
+
+class SpreadEntry:
+    __slots__ = ("spread", "rank")
+
+    def __init__(self, spread: tuple, rank: tuple):
+        # SpreadColumns.row 的结果
+        self.spread = spread
+        # 在排名列表中的元素: (-排序值, 首次出现的序号, symbol id)
+        self.rank = rank
+
+
+class SpreadRow:
+    """top_n 返回的一行, 每次读取各自构造, 不修改差价表中共享的 SpreadEntry"""
+
+    __slots__ = ("a", "b", "spread", "stats")
+
+    def __init__(self, a: BasicPrice, b: BasicPrice, spread: tuple, stats: dict):
+        # 盘口 a/b 的行情, 从行情表还原
+        self.a = a
+        self.b = b
+        self.spread = spread
+        # SpreadStats.fields 的结果
+        self.stats = stats
+
+
+# 差价计算结果的监听者 (历史记录, 统计等), 在 SpreadBook 的锁内调用, 只能做轻量的工作
+# (book key, 重新计算的 symbol id, 计算结果, 计算时间 ms)
+SpreadListener = Callable[[Hashable, np.ndarray, SpreadColumns, int], None]
+spread_listeners: list[SpreadListener] = []
+
+
+# 排序方式: 推荐方向的差价降序 / |diffAbZ| 降序
+SORT_KEYS = ("spread", "zscore")
+
+
+class SpreadBook:
+    """一个 a/b 映射的差价表, 维护按 direction 排序的排名
+
+    新快照到来时只重新计算买一卖一有变化的 symbol, 排名通过二分插入/删除增量更新,
+    读取前 n 条只需从头遍历.
+    行情以列的形式保存 (最新的两份 QuoteTable + 按 symbol id 下标的数组), 只有前 n 条才还原为元组
+    """
+
+    def __init__(self, key: Hashable = None):
+        # (快照 a 的 key, 快照 b 的 key)
+        self.key = key
+        # symbol id -> SpreadEntry
+        self.entries: dict[int, SpreadEntry] = {}
+        # 升序, 即排序值降序
+        self.ranking: list[tuple] = []
+        # 已应用的快照版本, 旧快照不会覆盖新快照
+        self.versions = (0, 0)
+        self.accessed_at = 0
+
+        self.table_a = QuoteTable.empty()
+        self.table_b = QuoteTable.empty()
+        # 以下按 symbol id 下标: 是否参与 join, 在 table_a/table_b 中的行, 上次计算时的价格
+        self._present = np.zeros(0, dtype=bool)
+        self._row_a = np.zeros(0, dtype=np.int64)
+        self._row_b = np.zeros(0, dtype=np.int64)
+        self._quotes = np.zeros((0, 8), dtype=np.int64)
+        # diffAb 的在线统计, 随重新计算更新
+        self.stats = SpreadStats()
+
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def update(self, snapshot_a, snapshot_b):
+        """用新的快照更新差价表, 参与 join 的是 a 的全部 symbol"""
+        with self._lock:
+            self.accessed_at = int(time.time() * 1000)
+
+            versions = (snapshot_a.version, snapshot_b.version)
+            if versions == self.versions or (
+                versions[0] < self.versions[0] or versions[1] < self.versions[1]
+            ):
+                return
+            self.versions = versions
+
+            # 按 symbol id 对齐, symbol 重复时以第一条为准
+            table_a: QuoteTable = snapshot_a.table
+            table_b: QuoteTable = snapshot_b.table
+            rows_a, rows_b = join_by_id(table_a.symbol_ids, table_b.symbol_ids)
+            sids = table_a.symbol_ids[rows_a].astype(np.int64)
+            self._grow(instruments.size)
+
+            quotes = np.column_stack(
+                (
+                    table_a.bid.mantissa[rows_a],
+                    table_a.bid.exp[rows_a],
+                    table_a.ask.mantissa[rows_a],
+                    table_a.ask.exp[rows_a],
+                    table_b.bid.mantissa[rows_b],
+                    table_b.bid.exp[rows_b],
+                    table_b.ask.mantissa[rows_b],
+                    table_b.ask.exp[rows_b],
+                )
+            ).astype(np.int64)
+            changed = ~self._present[sids] | (self._quotes[sids] != quotes).any(axis=1)
+
+            alive = np.zeros(len(self._present), dtype=bool)
+            alive[sids] = True
+            for sid in np.flatnonzero(self._present & ~alive).tolist():
+                self._remove(sid)
+
+            # 价格没变的只更新时间戳等, 即指向新的行
+            self._present = alive
+            self._quotes[sids] = quotes
+            self._row_a[sids] = rows_a
+            self._row_b[sids] = rows_b
+            self.table_a = table_a
+            self.table_b = table_b
+
+            if changed.any():
+                self._recompute(
+                    sids[changed],
+                    table_a.take(rows_a[changed]),
+                    table_b.take(rows_b[changed]),
+                )
+
+    def top_n(
+        self,
+        top_n: int | None,
+        direction: str | None = None,
+        symbols: set[str] | None = None,
+        sort_by: str | None = None,
+    ) -> list[SpreadRow]:
+        """sort_by: 见 SORT_KEYS
+
+        按差价排序时只遍历排名的前部, 代价与 n (和被过滤掉的行数) 成正比, 与 symbol 总数无关;
+        按 z-score 排序需要全部 symbol 的 z-score
+        """
+        sort_by = (sort_by or "spread").strip().lower()
+        if sort_by not in SORT_KEYS:
+            raise biz_error.of(f"unsupported sortBy: {sort_by}")
+
+        code = None
+        if direction and direction.strip():
+            code = direction_code(direction)
+            if code is None:
+                return []
+
+        ids = None
+        if symbols is not None:
+            ids = {instruments.find_id(sy) for sy in symbols}
+
+        with self._lock:
+            if sort_by == "zscore" and self.ranking:
+                # 按 |z| 降序, 相等 (包括没有 z-score) 时保持差价的排名, 需要全部的 symbol
+                order = np.array([sid for _, _, sid in self.ranking], dtype=np.int64)
+                z = np.abs(self.stats.zscores(order))
+                z[np.isnan(z)] = -1
+                sids = order[np.argsort(-z, kind="stable")].tolist()
+            else:
+                # 按差价排名从头遍历, 取够 n 条即停止
+                sids = (sid for _, _, sid in self.ranking)
+
+            selected: list[int] = []
+            for sid in sids:
+                if ids is not None and sid not in ids:
+                    continue
+                if code is not None and self.entries[sid].spread[4] != code:
+                    continue
+                selected.append(sid)
+                if top_n and top_n > 0 and len(selected) >= top_n:
+                    break
+
+            if not selected:
+                return []
+
+            # 选出的行一次从行情表还原
+            idx = np.array(selected, dtype=np.int64)
+            rows_a = self.table_a.rows_at(self._row_a[idx])
+            rows_b = self.table_b.rows_at(self._row_b[idx])
+            return [
+                SpreadRow(a, b, self.entries[sid].spread, self.stats.fields(sid))
+                for sid, a, b in zip(selected, rows_a, rows_b)
+            ]
+
+    def _recompute(self, sids: np.ndarray, table_a: QuoteTable, table_b: QuoteTable):
+        spreads = SpreadColumns(table_a.bid, table_a.ask, table_b.bid, table_b.ask)
+        now = int(time.time() * 1000)
+        self.stats.update(sids, spreads.diff_ab / SCALE, now)
+
+        if spread_listeners and is_full_market(self.key):
+            for listener in spread_listeners:
+                try:
+                    listener(self.key, sids, spreads, now)
+                except Exception as e:
+                    Lg.error(f"spread listener error: {e}")
+
+        for i, sid in enumerate(sids.tolist()):
+            spread = spreads.row(i)
+            entry = self.entries.get(sid)
+            seq = entry.rank[1] if entry else next(self._seq)
+            rank = (-spread_sort_key(spread), seq, sid)
+
+            if entry is None:
+                self.entries[sid] = SpreadEntry(spread, rank)
+                bisect.insort(self.ranking, rank)
+                continue
+
+            if rank != entry.rank:
+                self._unrank(entry.rank)
+                bisect.insort(self.ranking, rank)
+            entry.spread = spread
+            entry.rank = rank
+
+    def _remove(self, sid: int):
+        entry = self.entries.pop(sid)
+        self._unrank(entry.rank)
+
+    def _unrank(self, rank: tuple):
+        i = bisect.bisect_left(self.ranking, rank)
+        if i < len(self.ranking) and self.ranking[i] == rank:
+            del self.ranking[i]
+
+    def _grow(self, size: int):
+        """symbol id 数增加时扩容按 id 下标的数组"""
+        n = len(self._present)
+        if size <= n:
+            return
+        size = max(size, n * 2)
+        self._present = np.concatenate((self._present, np.zeros(size - n, dtype=bool)))
+        self._row_a = np.concatenate((self._row_a, np.zeros(size - n, dtype=np.int64)))
+        self._row_b = np.concatenate((self._row_b, np.zeros(size - n, dtype=np.int64)))
+        self._quotes = np.concatenate(
+            (self._quotes, np.zeros((size - n, 8), dtype=np.int64))
+        )
+
+
+def is_full_market(key: Hashable) -> bool:
+    """两个快照都是全市场的 (不是按 symbols 拉取的子集)"""
+    return isinstance(key, tuple) and all(
+        isinstance(k, tuple) and len(k) == 3 and k[2] is None for k in key
+    )
+
+
+def mapping_id(key: tuple) -> str:
+    """book key -> 'binance-spot/okx-swap'"""
+    (e_a, m_a, _), (e_b, m_b, _) = key
+    return f"{e_a}-{m_a}/{e_b}-{m_b}"
+
+
+class SpreadBooks:
+    """(快照 a 的 key, 快照 b 的 key) -> SpreadBook, 长时间未访问的会被淘汰"""
+
+    def __init__(self, idle_evict_ms: int = quote_cache_idle_evict_ms):
+        self.idle_evict_ms = idle_evict_ms
+        self._books: dict[Hashable, SpreadBook] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> SpreadBook:
+        with self._lock:
+            book = self._books.get(key)
+            if book is None:
+                self._evict()
+                book = self._books[key] = SpreadBook(key)
+            book.accessed_at = int(time.time() * 1000)
+            return book
+
+    def clear(self):
+        with self._lock:
+            self._books.clear()
+
+    def _evict(self):
+        now = int(time.time() * 1000)
+        for key, book in list(self._books.items()):
+            if now - book.accessed_at >= self.idle_evict_ms:
+                del self._books[key]
+
+
+spread_books = SpreadBooks()
@@ -0,0 +1,77 @@
+import random
+from decimal import Decimal
+
+from app.market.quote_cache import QuoteSnapshot
+from app.market.quote_table import QuoteTable
+from app.market.spread_book import SpreadBook
+from app.market.spread_engine import SpreadColumns, spread_fields
+
+
+def gen_snapshot(version: int, prices: dict[str, Decimal], label: str):
+    return QuoteSnapshot(
+        key=label,
+        table=QuoteTable.from_prices(
+            [(sy, label, p, p + Decimal("0.01"), version) for sy, p in prices.items()]
+        ),
+        fetched_at=0,
+        version=version,
+    )
+
+
+def test_spread_book_incremental_ranking():
+    random.seed(3)
+    symbols = [f"S{i}USDT" for i in range(500)]
+    prices_a = {sy: Decimal(random.randint(100, 200)) for sy in symbols}
+    prices_b = {sy: Decimal(random.randint(100, 200)) for sy in symbols}
+
+    book = SpreadBook()
+    for version in range(1, 20):
+        # 每轮只有少量 symbol 变化, 偶尔有 symbol 下架
+        for sy in random.sample(symbols, 10):
+            prices_b[sy] = Decimal(random.randint(100, 200))
+        if version % 5 == 0:
+            prices_a.pop(random.choice(list(prices_a)), None)
+
+        snapshot_a = gen_snapshot(version, prices_a, "a")
+        snapshot_b = gen_snapshot(version, prices_b, "b")
+        book.update(snapshot_a, snapshot_b)
+
+        joined = [(sy, prices_a[sy], prices_b[sy]) for sy in prices_a if sy in prices_b]
+        spreads = SpreadColumns(
+            [p for _, p, _ in joined],
+            [p + Decimal("0.01") for _, p, _ in joined],
+            [p for _, _, p in joined],
+            [p + Decimal("0.01") for _, _, p in joined],
+        )
+        expected = [spreads.fields(i) for i in spreads.top_n(50)]
+        actual = [spread_fields(e.spread) for e in book.top_n(50)]
+
+        # 排序值相同时的先后顺序可能不同, 只比较排序值序列
+        def sort_value(f: dict):
+            return f["diffAb"] if f.get("direction") == "A_B" else f["diffBa"]
+
+        assert [sort_value(f) for f in actual] == [sort_value(f) for f in expected]
+        assert len(book.entries) == len(joined)
+
+
+def test_spread_book_top_n_reads_only_head():
+    prices = {f"S{i}USDT": Decimal(100 + i) for i in range(1000)}
+    book = SpreadBook()
+    book.update(gen_snapshot(1, prices, "a"), gen_snapshot(1, {sy: Decimal(150) for sy in prices}, "b"))
+
+    visited = []
+
+    class Ranking(list):
+        def __iter__(self):
+            for ele in super().__iter__():
+                visited.append(ele)
+                yield ele
+
+    book.ranking = Ranking(book.ranking)
+    first = book.top_n(5)
+    assert len(first) == 5 and len(visited) == 5
+
+    # 每次读取返回新的行, 不共享可变状态
+    second = book.top_n(5)
+    assert all(x is not y for x, y in zip(first, second))
+    assert [e.a for e in first] == [e.a for e in second]
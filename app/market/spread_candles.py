@@ -0,0 +1,218 @@
+"""差价 K 线
+
+由 SpreadRecorder 在写入差价历史时增量生成, 逐级聚合: 差价 -> 1s -> 1m -> 5m -> 1h,
+每一级只由下一级收盘的 K 线更新, 不回看历史. 收盘的 K 线写入各自的分段文件
+(布局见 spread_history.CANDLE_COLUMNS):
+
+    {history_dir}/candles/{1s,1m,5m,1h}/{开始时间 ms}-{序号}.seg
+
+K 线只统计 diffAb (放大 10^4 的整数), 没有差价更新的时间段没有 K 线.
+
+查询时按时间范围和点数选择级别, 读取的行数与时间范围的长短无关;
+尚未收盘 (还没有写入文件) 的最后一段由更细的级别临时聚合
+"""
+
+import os
+
+import numpy as np
+
+from app.config import history_dir, history_retention_days, history_segment_rows
+from app.market.spread_engine import from_scaled
+from app.market.spread_history import LAYOUT_CANDLES, HistoryWriter, scan
+
+# 名称 -> 周期 ms, 从细到粗
+RESOLUTIONS = {"1s": 1000, "1m": 60_000, "5m": 300_000, "1h": 3600_000}
+_LEVELS = list(RESOLUTIONS.items())
+
+# 每个分段覆盖的 K 线根数 (每个 pair)
+_CANDLES_PER_SEGMENT = 3600
+
+# (开始时间, pair, 开, 高, 低, 收)
+Candle = tuple[int, str, int, int, int, int]
+
+
+def candle_dir(directory: str, name: str) -> str:
+    return os.path.join(directory, "candles", name)
+
+
+class CandleLevel:
+    """一个级别的未收盘 K 线, 每个 pair 一根"""
+
+    def __init__(self, res_ms: int):
+        self.res_ms = res_ms
+        # pair -> [开始时间, 开, 高, 低, 收]
+        self._open: dict[str, list[int]] = {}
+        # 被同一 pair 的新 K 线替换下来的, 等 close 时一起返回
+        self._closed: list[Candle] = []
+        # 该时间之前的 K 线都已收盘
+        self.closed_until = 0
+
+    def add(self, rows: list[Candle]):
+        """rows: 按时间排序"""
+        res = self.res_ms
+        for ts, pair, o, h, l, c in rows:
+            # 收盘后才到达的少量数据, 计入当前的 K 线
+            ts = max(ts, self.closed_until)
+            bucket = ts - ts % res
+            cur = self._open.get(pair)
+            if cur is None or cur[0] != bucket:
+                if cur is not None:
+                    self._closed.append((cur[0], pair, *cur[1:]))  # type: ignore
+                self._open[pair] = [bucket, o, h, l, c]
+                continue
+            if h > cur[2]:
+                cur[2] = h
+            if l < cur[3]:
+                cur[3] = l
+            cur[4] = c
+
+    def close(self, now: int) -> list[Candle]:
+        """结束时间不晚于 now 的 K 线收盘, 按开始时间排序返回"""
+        res, self._closed = self._closed, []
+        for pair in [p for p, cur in self._open.items() if cur[0] + self.res_ms <= now]:
+            cur = self._open.pop(pair)
+            res.append((cur[0], pair, *cur[1:]))  # type: ignore
+        self.closed_until = max(self.closed_until, now - now % self.res_ms)
+        res.sort(key=lambda ele: ele[0])
+        return res
+
+
+class CandlePyramid:
+    """各级 K 线的生成和写入, 单线程调用 (SpreadRecorder.flush)"""
+
+    def __init__(
+        self,
+        directory: str = history_dir,
+        segment_rows: int = history_segment_rows,
+        retention_days: int = history_retention_days,
+    ):
+        self.levels = [CandleLevel(ms) for _, ms in _LEVELS]
+        self.writers = [
+            HistoryWriter(
+                candle_dir(directory, name),
+                segment_s=ms // 1000 * _CANDLES_PER_SEGMENT,
+                segment_rows=segment_rows,
+                retention_days=retention_days,
+                layout=LAYOUT_CANDLES,
+            )
+            for name, ms in _LEVELS
+        ]
+
+    def add(self, ts: np.ndarray, pairs: list[str], diff_ab: np.ndarray):
+        """按时间排序的差价"""
+        values = diff_ab.tolist()
+        self.levels[0].add(
+            [(t, p, v, v, v, v) for t, p, v in zip(ts.tolist(), pairs, values)]
+        )
+
+    def close(self, now: int):
+        """逐级收盘, 收盘的 K 线写入文件并计入上一级"""
+        rows = self.levels[0].close(now)
+        for i, writer in enumerate(self.writers):
+            if rows:
+                ts, pairs, o, h, l, c = zip(*rows)
+                writer.append(
+                    np.array(ts, dtype=np.int64),
+                    list(pairs),
+                    {
+                        "open": np.array(o, dtype=np.int64),
+                        "high": np.array(h, dtype=np.int64),
+                        "low": np.array(l, dtype=np.int64),
+                        "close": np.array(c, dtype=np.int64),
+                    },
+                )
+            if i + 1 < len(self.levels):
+                self.levels[i + 1].add(rows)
+                rows = self.levels[i + 1].close(now)
+
+    def close_writers(self):
+        for writer in self.writers:
+            writer.close()
+
+
+def choose_resolution(start: int, end: int, points: int) -> str:
+    """点数不超过 points 的最细级别, 都超过时取最粗的级别"""
+    for name, ms in _LEVELS:
+        if (end - start) / ms <= points:
+            return name
+    return _LEVELS[-1][0]
+
+
+def aggregate(candles: dict[str, np.ndarray], res_ms: int) -> dict[str, np.ndarray]:
+    """按时间排序的 K 线 (或差价) 聚合为 res_ms 周期的 K 线"""
+    ts = candles["ts"]
+    if len(ts) == 0:
+        return candles
+
+    bucket = ts - ts % res_ms
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+    return {
+        "ts": bucket[starts],
+        "open": candles["open"][starts],
+        "high": np.maximum.reduceat(candles["high"], starts),
+        "low": np.minimum.reduceat(candles["low"], starts),
+        "close": candles["close"][ends],
+    }
+
+
+def read_candles(
+    pair: str, resolution: str, start: int, end: int, now: int, directory: str = history_dir
+) -> dict[str, np.ndarray]:
+    """某个 "映射 symbol" 在 [start, end) 内的 K 线, 按开始时间排序"""
+    level = list(RESOLUTIONS).index(resolution)
+    return _read_level(pair, level, start, end, now, directory)
+
+
+def _read_level(
+    pair: str, level: int, start: int, end: int, now: int, directory: str
+) -> dict[str, np.ndarray]:
+    name, res_ms = _LEVELS[level]
+    start -= start % res_ms
+
+    closed = _concat(scan(pair, start, end, candle_dir(directory, name)))
+    covered = int(closed["ts"][-1]) + res_ms if len(closed["ts"]) else start
+
+    # 最近一到两根 K 线可能还没有收盘写入, 由更细的级别聚合
+    tail_start = max(covered, now - now % res_ms - res_ms)
+    if tail_start >= end:
+        return closed
+
+    if level > 0:
+        finer = _read_level(pair, level - 1, tail_start, end, now, directory)
+    else:
+        ticks = _concat(scan(pair, tail_start, end, directory))
+        v = ticks.get("diff_ab", np.zeros(0, dtype=np.int64))
+        finer = {"ts": ticks["ts"], "open": v, "high": v, "low": v, "close": v}
+
+    tail = aggregate(finer, res_ms)
+    keep = tail["ts"] >= covered
+    return {k: np.concatenate((closed[k], tail[k][keep])) for k in closed}
+
+
+def _concat(chunks) -> dict[str, np.ndarray]:
+    chunks = list(chunks)
+    if not chunks:
+        empty = np.zeros(0, dtype=np.int64)
+        return {k: empty for k in ("ts", "open", "high", "low", "close")}
+    return {k: np.concatenate([ele[k] for ele in chunks]) for k in chunks[0]}
+
+
+def decode_candles(candles: dict[str, np.ndarray]) -> list[dict]:
+    """read_candles 的结果 -> [{"timestamp", "open", "high", "low", "close"}], 差价为 %"""
+    return [
+        {
+            "timestamp": ts,
+            "open": from_scaled(o, False),
+            "high": from_scaled(h, False),
+            "low": from_scaled(l, False),
+            "close": from_scaled(c, False),
+        }
+        for ts, o, h, l, c in zip(
+            candles["ts"].tolist(),
+            candles["open"].tolist(),
+            candles["high"].tolist(),
+            candles["low"].tolist(),
+            candles["close"].tolist(),
+        )
+    ]
@@ -0,0 +1,78 @@
+import random
+
+import numpy as np
+
+from app.market.spread_candles import (
+    CandlePyramid,
+    aggregate,
+    choose_resolution,
+    read_candles,
+)
+from app.market.spread_history import HistoryWriter
+
+
+def test_choose_resolution():
+    assert choose_resolution(0, 600_000, 1000) == "1s"
+    assert choose_resolution(0, 3600_000, 1000) == "1m"
+    assert choose_resolution(0, 86400_000, 1000) == "5m"
+    assert choose_resolution(0, 30 * 86400_000, 1000) == "1h"
+
+
+def test_candles_match_ticks(tmp_path):
+    directory = str(tmp_path)
+    writer = HistoryWriter(directory, segment_s=3600, segment_rows=100_000)
+    pyramid = CandlePyramid(directory, segment_rows=100_000)
+
+    random.seed(5)
+    start = 1_700_000_000_000 - 1_700_000_000_000 % 3600_000
+    ts, values = [], []
+    at = start
+    # 约 2 小时的差价, 间隔不均匀, 分批写入并收盘
+    while at < start + 2 * 3600_000:
+        batch_ts = []
+        for _ in range(random.randint(1, 5)):
+            at += random.choice([200, 700, 1500, 40_000])
+            batch_ts.append(at)
+        batch = np.array(batch_ts, dtype=np.int64)
+        batch_v = np.array([random.randint(-500, 500) for _ in batch_ts], dtype=np.int64)
+        pairs = ["binance-spot/okx-swap BTCUSDT"] * len(batch)
+
+        writer.append(batch, pairs, {"diff_ab": batch_v, **_zeros(len(batch))})
+        pyramid.add(batch, pairs, batch_v)
+        pyramid.close(at + 1)
+        ts += batch_ts
+        values += batch_v.tolist()
+
+    writer.close()
+    pyramid.close_writers()
+
+    ticks = {"ts": np.array(ts)}
+    for k in ("open", "high", "low", "close"):
+        ticks[k] = np.array(values)
+
+    now = at + 1
+    for name, res_ms in (("1s", 1000), ("1m", 60_000), ("5m", 300_000), ("1h", 3600_000)):
+        # 包括尚未收盘的最后一根 K 线
+        candles = read_candles(
+            "binance-spot/okx-swap BTCUSDT", name, start, now + 1, now, directory
+        )
+        expected = aggregate(ticks, res_ms)
+        for k in expected:
+            assert candles[k].tolist() == expected[k].tolist(), (name, k)
+
+    # 查询范围内的部分
+    mid = start + 1800_000
+    candles = read_candles(
+        "binance-spot/okx-swap BTCUSDT", "1m", mid, mid + 600_000, now, directory
+    )
+    assert candles["ts"].tolist() == [
+        ele for ele in aggregate(ticks, 60_000)["ts"].tolist() if mid <= ele < mid + 600_000
+    ]
+
+
+def _zeros(n: int) -> dict:
+    return {
+        "diff_ba": np.zeros(n, dtype=np.int64),
+        "qccj": np.zeros(n, dtype=np.int64),
+        "flags": np.zeros(n, dtype=np.uint8),
+    }
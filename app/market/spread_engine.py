@@ -0,0 +1,270 @@
+"""批量计算差价
+
+与 WatchMapping.calc_direction 的逐行 Decimal 计算结果完全一致 (保留 4 位小数, 四舍五入):
+
+- 先用 float64 整列计算, 再放大 10^4 后四舍五入为整数
+- float 的误差远小于 1e-6, 只有放大后的小数部分落在 0.5 附近 (或结果接近 0, 需要区分 -0)
+  的少数元素, 才回退到与逐行计算相同的 Decimal 表达式
+- 放大后的绝对值超过 _MAX_SCALED (价格相差上百倍的异常行情) 时 float 的误差不再可以忽略,
+  同样回退到 Decimal; 结果超出 int64 的 (价格相差 10^13 倍以上), 列中保存饱和值,
+  精确的整数另外保存, row / fields 返回精确值
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Callable, Sequence
+
+import numpy as np
+
+from app.market.quote_table import DecimalColumn
+from app.models.watch_models import TradeDirection
+
+SCALE = 10_000
+# 放大后距离 .5 小于该值的元素回退到 Decimal 计算
+_EPS = 1e-6
+# 放大后绝对值不小于该值的元素回退到 Decimal 计算, 此时 float 的误差 (几个 ulp) 仍远小于 _EPS
+_MAX_SCALED = 1e8
+_INT64_MAX = 2**63 - 1
+
+# direction 编码
+DIRECTION_NONE = 0
+DIRECTION_AB = 1
+DIRECTION_BA = -1
+
+_DIRECTION_NAMES = {
+    DIRECTION_AB: TradeDirection.A_B.name,
+    DIRECTION_BA: TradeDirection.B_A.name,
+}
+
+
+def adjust_precision(val: Decimal) -> Decimal:
+    """同 WatchMapping._adjust_precision"""
+    if not val:
+        return Decimal("0")
+
+    return val.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP).normalize()
+
+
+def to_scaled(val: Decimal) -> tuple[int, bool]:
+    """已保留 4 位小数的 Decimal -> (放大 10^4 后的整数, 是否为负)"""
+    return int(val.scaleb(4)), val.is_signed()
+
+
+def from_scaled(q: int, neg: bool) -> Decimal:
+    """to_scaled 的逆运算, 保留 -0"""
+    if q == 0:
+        return Decimal("-0") if neg else Decimal("0")
+    return Decimal(int(q)).scaleb(-4).normalize()
+
+
+def direction_name(code: int) -> str | None:
+    """DIRECTION_AB -> 'A_B', 没有方向返回 None"""
+    return _DIRECTION_NAMES.get(code)
+
+
+def direction_code(direction: str) -> int | None:
+    """'a_b' -> DIRECTION_AB, 无法识别返回 None"""
+    return next(
+        (k for k, v in _DIRECTION_NAMES.items() if v == direction.upper()), None
+    )
+
+
+def _round_half_up(
+    raw: np.ndarray, exact: Callable[[int], Decimal], where: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray, dict[int, int]]:
+    """
+    raw: float 计算的结果
+    exact: 下标 -> 按 Decimal 计算并保留精度后的结果
+    where: 只处理这些位置, 其余为 0
+
+    Returns:
+        (放大后的 int64, 是否为负, 下标 -> 超出 int64 的精确值 (列中为饱和值))
+    """
+    with np.errstate(invalid="ignore", over="ignore"):
+        scaled = raw * SCALE
+        a = np.abs(scaled)
+        frac = a - np.floor(a)
+        unsure = (
+            ~np.isfinite(scaled)
+            | (a >= _MAX_SCALED)
+            | (np.abs(frac - 0.5) < _EPS)
+            | (a < _EPS)
+        )
+        if where is not None:
+            unsure &= where
+        q = np.where(unsure, 0.0, np.sign(scaled) * np.floor(a + 0.5))
+
+    if where is not None:
+        q = np.where(where, q, 0.0)
+    q = q.astype(np.int64)
+    neg = scaled < 0
+
+    big: dict[int, int] = {}
+    for i in np.flatnonzero(unsure).tolist():
+        val, neg[i] = to_scaled(exact(i))
+        if abs(val) > _INT64_MAX:
+            big[i] = val
+            val = _INT64_MAX if val > 0 else -_INT64_MAX
+        q[i] = val
+
+    return q, neg, big
+
+class SpreadColumns:
+    """整列的差价计算结果, 数值均为放大 10^4 后的 int64 (超出范围的为饱和值, 精确值见 row)"""
+
+    def __init__(
+        self,
+        bid_a: Sequence[Decimal],
+        ask_a: Sequence[Decimal],
+        bid_b: Sequence[Decimal],
+        ask_b: Sequence[Decimal],
+    ):
+        """价格可以是 Decimal 列表, 也可以是 QuoteTable 的 DecimalColumn"""
+        self.size = len(bid_a)
+
+        fa_bid = _to_float(bid_a)
+        fa_ask = _to_float(ask_a)
+        fb_bid = _to_float(bid_b)
+        fb_ask = _to_float(ask_b)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # a -> b, b买一 - a卖一
+            self.diff_ab, self.diff_ab_neg, big_ab = _round_half_up(
+                (fb_bid - fa_ask) / fb_bid * 100,
+                lambda i: adjust_precision(((bid_b[i] - ask_a[i]) / bid_b[i]) * 100),
+            )
+            # b -> a
+            self.diff_ba, self.diff_ba_neg, big_ba = _round_half_up(
+                (fa_bid - fb_ask) / fa_bid * 100,
+                lambda i: adjust_precision(((bid_a[i] - ask_b[i]) / bid_a[i]) * 100),
+            )
+
+            self.direction = np.sign(self.diff_ab).astype(np.int8)
+            is_ab = self.direction == DIRECTION_AB
+            has_direction = self.direction != DIRECTION_NONE
+
+            # 清仓差价
+            # a 买 b 卖: (b 卖1 - a 买1) / b 卖 1
+            # a 卖 b 买: (a 卖1 - b 买1) / a 卖 1
+            def exact_qccj(i: int) -> Decimal:
+                if is_ab[i]:
+                    return adjust_precision((ask_b[i] - bid_a[i]) / ask_b[i] * 100)
+                return adjust_precision((ask_a[i] - bid_b[i]) / ask_a[i] * 100)
+
+            self.has_qccj = has_direction
+            self.qccj, self.qccj_neg, big_qccj = _round_half_up(
+                np.where(is_ab, (fb_ask - fa_bid) / fb_ask, (fa_ask - fb_bid) / fa_ask)
+                * 100,
+                exact_qccj,
+                has_direction,
+            )
+
+            # 盘差 (清仓差价-推荐差价)/清仓差价)
+            self.has_pc = (
+                self.has_qccj
+                & (self.qccj != 0)
+                & (self.diff_ab != 0)
+                & (self.diff_ba != 0)
+            )
+            diff = np.where(is_ab, self.diff_ab, self.diff_ba)
+
+            def exact_pc(i: int) -> Decimal:
+                qccj = from_scaled(big_qccj.get(i, self.qccj[i]), self.qccj_neg[i])
+                d = (
+                    from_scaled(big_ab.get(i, self.diff_ab[i]), self.diff_ab_neg[i])
+                    if is_ab[i]
+                    else from_scaled(big_ba.get(i, self.diff_ba[i]), self.diff_ba_neg[i])
+                )
+                return adjust_precision(abs((qccj - d) / qccj) * 100)
+
+            # 饱和值参与的 float 计算不可信, 一律回退到 Decimal
+            saturated = np.zeros(self.size, dtype=bool)
+            saturated[[*big_ab, *big_ba, *big_qccj]] = True
+            self.pc, _, big_pc = _round_half_up(
+                np.where(
+                    saturated,
+                    np.nan,
+                    np.abs((self.qccj - diff) / self.qccj.astype(np.float64)) * 100,
+                ),
+                exact_pc,
+                self.has_pc,
+            )
+
+        # 下标 -> row 中各列超出 int64 的精确值, 绝大多数情况下为空
+        self._big: dict[int, dict[int, int]] = {}
+        for col, big in ((0, big_ab), (2, big_ba), (5, big_qccj), (7, big_pc)):
+            for i, val in big.items():
+                self._big.setdefault(i, {})[col] = val
+
+    def direction_name(self, i: int) -> str | None:
+        return direction_name(int(self.direction[i]))
+
+    def sort_key(self) -> np.ndarray:
+        """A_B 按 diffAb 排序, 其余按 diffBa"""
+        return np.where(self.direction == DIRECTION_AB, self.diff_ab, self.diff_ba)
+
+    def top_n(self, top_n: int | None, direction: str | None = None) -> np.ndarray:
+        """按方向过滤, 降序排序 (相等时保持原有顺序), 取前 n 条的下标"""
+        idx = np.arange(self.size)
+        if direction and direction.strip():
+            code = direction_code(direction)
+            idx = idx[self.direction == code] if code is not None else idx[:0]
+
+        order = idx[np.argsort(-self.sort_key()[idx], kind="stable")]
+        if top_n and top_n > 0:
+            order = order[:top_n]
+        return order
+
+    def row(self, i: int) -> tuple:
+        """第 i 行的计算结果, 紧凑的元组, 见 spread_fields"""
+        if self._big and i in self._big:
+            row = list(self._row(i))
+            for col, val in self._big[i].items():
+                row[col] = val
+            return tuple(row)
+        return self._row(i)
+
+    def _row(self, i: int) -> tuple:
+        return (
+            int(self.diff_ab[i]),
+            bool(self.diff_ab_neg[i]),
+            int(self.diff_ba[i]),
+            bool(self.diff_ba_neg[i]),
+            int(self.direction[i]),
+            int(self.qccj[i]),
+            bool(self.qccj_neg[i]),
+            int(self.pc[i]) if self.has_pc[i] else None,
+        )
+
+    def fields(self, i: int) -> dict:
+        """第 i 行的 SymbolRow 差价相关字段"""
+        return spread_fields(self.row(i))
+
+
+def spread_sort_key(row: tuple) -> int:
+    """A_B 按 diffAb 排序, 其余按 diffBa"""
+    return row[0] if row[4] == DIRECTION_AB else row[2]
+
+
+def spread_fields(row: tuple) -> dict:
+    """SpreadColumns.row 的结果 -> SymbolRow 差价相关字段"""
+    diff_ab, diff_ab_neg, diff_ba, diff_ba_neg, direction, qccj, qccj_neg, pc = row
+    res = {
+        "diffAb": from_scaled(diff_ab, diff_ab_neg),
+        "diffBa": from_scaled(diff_ba, diff_ba_neg),
+    }
+
+    name = _DIRECTION_NAMES.get(direction)
+    if name:
+        res["direction"] = name
+        res["directionDesc"] = TradeDirection[name].value
+        res["qccj"] = from_scaled(qccj, qccj_neg)
+    if pc is not None:
+        res["pc"] = from_scaled(pc, False)
+
+    return res
+
+
+def _to_float(values: Sequence[Decimal]) -> np.ndarray:
+    if isinstance(values, DecimalColumn):
+        return values.floats
+    return np.fromiter((float(x) for x in values), dtype=np.float64, count=len(values))
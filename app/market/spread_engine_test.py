@@ -0,0 +1,109 @@
+import random
+from decimal import Decimal
+
+from app.market.spread_engine import SpreadColumns
+from app.models.watch_models import ExchangeMarket, SymbolRow, WatchMapping
+
+
+def gen_prices(n: int) -> list[tuple[Decimal, Decimal, Decimal, Decimal]]:
+    random.seed(7)
+    res = []
+    for _ in range(n):
+        exp = random.randint(0, 8)
+        base = random.randint(1, 10**8)
+        bid_a = Decimal(base).scaleb(-exp)
+        ask_a = bid_a + Decimal(random.randint(0, 50)).scaleb(-exp)
+        bid_b = bid_a + Decimal(random.randint(-200, 200)).scaleb(-exp)
+        if bid_b <= 0:
+            bid_b = ask_a
+        ask_b = bid_b + Decimal(random.randint(0, 50)).scaleb(-exp)
+        res.append((bid_a, ask_a, bid_b, ask_b))
+
+    # 四舍五入的临界值, 0 和 -0
+    res += [
+        (Decimal("99.99995"), Decimal("99.99995"), Decimal("100"), Decimal("100.1")),
+        (Decimal("100"), Decimal("100.00005"), Decimal("100"), Decimal("100")),
+        (Decimal("1"), Decimal("1"), Decimal("1"), Decimal("1")),
+        (Decimal("1"), Decimal("1.000001"), Decimal("1"), Decimal("1.000001")),
+        (Decimal("3"), Decimal("3"), Decimal("3.000001"), Decimal("3.0000015")),
+        (Decimal("100"), Decimal("100"), Decimal("99.99999"), Decimal("100")),
+    ]
+    return res
+
+
+def gen_extreme_prices(n: int) -> list[tuple[Decimal, Decimal, Decimal, Decimal]]:
+    """a/b 价格相差 10^2 ~ 10^17 倍, eg. 同名但不同的币, 或价格字段错误"""
+    random.seed(11)
+    res = []
+    for _ in range(n):
+        small = Decimal(random.randint(1, 10**6)).scaleb(-random.randint(6, 14))
+        big = Decimal(random.randint(1, 10**8)).scaleb(-random.randint(0, 3))
+        if random.random() < 0.5:
+            small, big = big, small
+        res.append((small, small * Decimal("1.0001"), big, big * Decimal("1.0002")))
+    res.append((Decimal("65399"), Decimal("65400"), Decimal("3.5E-13"), Decimal("3.6E-13")))
+    return res
+
+
+def test_spread_columns_match_calc_direction():
+    assert_match_calc_direction(gen_prices(5000))
+
+
+def test_spread_columns_extreme_ratios():
+    assert_match_calc_direction(gen_extreme_prices(3000))
+
+
+def assert_match_calc_direction(prices):
+    mapping = WatchMapping(ExchangeMarket("binance-spot"), ExchangeMarket("binance-swap"))
+
+    spreads = SpreadColumns(*(list(col) for col in zip(*prices)))
+
+    fields = ["diffAb", "diffBa", "direction", "directionDesc", "qccj", "pc"]
+    for i, (bid_a, ask_a, bid_b, ask_b) in enumerate(prices):
+        row = SymbolRow(
+            symbol="X",
+            bookA="a",
+            bidPriceA=bid_a,
+            askPriceA=ask_a,
+            bookB="b",
+            bidPriceB=bid_b,
+            askPriceB=ask_b,
+            timestamp=0,
+        )
+        mapping.calc_direction(row)
+        expected = {f: getattr(row, f) for f in fields}
+
+        got = SymbolRow(
+            symbol="X",
+            bookA="a",
+            bidPriceA=bid_a,
+            askPriceA=ask_a,
+            bookB="b",
+            bidPriceB=bid_b,
+            askPriceB=ask_b,
+            timestamp=0,
+            **spreads.fields(i),
+        )
+        actual = {f: getattr(got, f) for f in fields}
+
+        # str 比较, 确保 -0 / 指数形式也一致
+        assert {k: str(v) for k, v in actual.items()} == {
+            k: str(v) for k, v in expected.items()
+        }, (i, prices[i])
+
+
+def test_spread_columns_top_n():
+    prices = gen_prices(300)
+    spreads = SpreadColumns(*(list(col) for col in zip(*prices)))
+
+    keys = [
+        spreads.fields(i)["diffAb"]
+        if spreads.direction_name(i) == "A_B"
+        else spreads.fields(i)["diffBa"]
+        for i in range(spreads.size)
+    ]
+    expected = sorted(range(spreads.size), key=lambda i: keys[i], reverse=True)[:20]
+    assert list(spreads.top_n(20)) == expected
+
+    for i in spreads.top_n(None, "b_a"):
+        assert spreads.direction_name(i) == "B_A"
@@ -0,0 +1,527 @@
+"""差价历史
+
+每次重新计算出的 diffAb / diffBa / qccj 按 (映射, symbol) 追加写入列式的分段文件:
+
+    {history_dir}/{开始时间 ms}-{序号}.seg     分段, 按时间 (history_segment_s) 或行数切换
+    {history_dir}/{开始时间 ms}-{序号}.pairs   分段内 pair id -> "映射 symbol", 每行一个, 只追加
+
+分段文件布局:
+
+    header (64 字节): magic, 布局, 容量 (行数), 已提交的行数, 开始时间, 结束时间
+    column * n: 每列连续存放 capacity 个值, 见 LAYOUTS (差价为 COLUMNS, K 线见 spread_candles)
+
+文件按容量预分配后 mmap 写入, 先写各列再更新 header 中的行数, 读取方只读已提交的行.
+时间索引: 分段按开始时间命名, 查询时只打开时间范围有重叠的分段; 分段内的 ts 单调递增,
+二分查找起止位置.
+
+差价以 SpreadColumns 的形式 (放大 10^4 的整数 + 符号位) 保存, 与接口返回的值完全一致.
+记录只在 spread_listeners 中把结果放入内存队列, 写文件在后台线程, 不占用请求
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Hashable, Iterator
+
+import numpy as np
+
+from app.config import (
+    history_dir,
+    history_interval_ms,
+    history_mappings,
+    history_retention_days,
+    history_segment_rows,
+    history_segment_s,
+)
+from app.market.instruments import instruments
+from app.market.spread_book import (
+    is_full_market,
+    mapping_id,
+    spread_books,
+    spread_listeners,
+)
+from app.market.spread_engine import SpreadColumns, direction_name, from_scaled
+from app.utils.log_util import Lg
+
+MAGIC = b"HAHS"
+
+# magic, 布局版本, 容量, 已提交的行数, 开始时间, 结束时间
+_HEADER = struct.Struct("<4sIIIqq")
+_HEADER_SIZE = 64
+_COUNT_OFFSET = 12
+
+COLUMNS = [
+    ("ts", np.dtype("<i8")),
+    ("pair", np.dtype("<i4")),
+    ("diff_ab", np.dtype("<i8")),
+    ("diff_ba", np.dtype("<i8")),
+    ("qccj", np.dtype("<i8")),
+    # FLAG_*
+    ("flags", np.dtype("u1")),
+]
+
+# 差价 K 线, 见 spread_candles; 开始时间 + diffAb 的开高低收 (放大 10^4)
+CANDLE_COLUMNS = [
+    ("ts", np.dtype("<i8")),
+    ("pair", np.dtype("<i4")),
+    ("open", np.dtype("<i8")),
+    ("high", np.dtype("<i8")),
+    ("low", np.dtype("<i8")),
+    ("close", np.dtype("<i8")),
+]
+
+LAYOUT_TICKS = 1
+LAYOUT_CANDLES = 2
+LAYOUTS = {LAYOUT_TICKS: COLUMNS, LAYOUT_CANDLES: CANDLE_COLUMNS}
+
+FLAG_DIFF_AB_NEG = 1
+FLAG_DIFF_BA_NEG = 2
+FLAG_QCCJ_NEG = 4
+# 有推荐方向时才有清仓差价
+FLAG_HAS_QCCJ = 8
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def column_offsets(capacity: int, columns: list = COLUMNS) -> dict[str, int]:
+    res = {}
+    offset = _HEADER_SIZE
+    for name, dtype in columns:
+        res[name] = offset
+        offset += capacity * dtype.itemsize
+    return res
+
+
+def file_size(capacity: int, columns: list = COLUMNS) -> int:
+    return _HEADER_SIZE + capacity * sum(dtype.itemsize for _, dtype in columns)
+
+
+def encode_flags(spreads: SpreadColumns) -> np.ndarray:
+    return (
+        spreads.diff_ab_neg * FLAG_DIFF_AB_NEG
+        | spreads.diff_ba_neg * FLAG_DIFF_BA_NEG
+        | spreads.qccj_neg * FLAG_QCCJ_NEG
+        | spreads.has_qccj * FLAG_HAS_QCCJ
+    ).astype(np.uint8)
+
+
+class Segment:
+    """一个分段文件, 写入方读写映射, 读取方只读映射"""
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        self.pairs_path = path[: -len(".seg")] + ".pairs"
+
+        fd = os.open(path, os.O_RDWR if writable else os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            self.mm = mmap.mmap(
+                fd, size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            )
+        finally:
+            os.close(fd)
+
+        magic, layout, self.capacity, _, self.start_ms, self.end_ms = (
+            _HEADER.unpack_from(self.mm, 0)
+        )
+        if magic != MAGIC or layout not in LAYOUTS:
+            self.mm.close()
+            raise ValueError(f"not a spread history segment: {path}")
+        self.layout = layout
+        self.columns = LAYOUTS[layout]
+        self.offsets = column_offsets(self.capacity, self.columns)
+
+    @classmethod
+    def create(
+        cls, path: str, layout: int, capacity: int, start_ms: int, end_ms: int
+    ) -> "Segment":
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.truncate(file_size(capacity, LAYOUTS[layout]))
+            f.write(_HEADER.pack(MAGIC, layout, capacity, 0, start_ms, end_ms))
+        os.replace(tmp, path)
+        open(path[: -len(".seg")] + ".pairs", "a").close()
+        return cls(path, writable=True)
+
+    @property
+    def count(self) -> int:
+        return struct.unpack_from("<I", self.mm, _COUNT_OFFSET)[0]
+
+    def column(self, name: str, count: int | None = None) -> np.ndarray:
+        dtype = dict(self.columns)[name]
+        return np.frombuffer(
+            self.mm,
+            dtype=dtype,
+            count=self.count if count is None else count,
+            offset=self.offsets[name],
+        )
+
+    def search(self, start_ms: int, end_ms: int, count: int) -> tuple[int, int]:
+        """[start_ms, end_ms) 对应的行的范围"""
+        ts = self.column("ts", count)
+        return (
+            int(np.searchsorted(ts, start_ms, side="left")),
+            int(np.searchsorted(ts, end_ms, side="left")),
+        )
+
+    def read(self, pid: int, begin: int, end: int, count: int) -> dict[str, np.ndarray]:
+        """[begin, end) 中属于 pid 的行, 复制出来, 不持有 mmap 的引用 (否则无法关闭)"""
+        rows = np.flatnonzero(self.column("pair", count)[begin:end] == pid)
+        return {
+            name: self.column(name, count)[begin:end][rows]
+            for name, _ in self.columns
+            if name != "pair"
+        }
+
+    def append(self, columns: dict[str, np.ndarray]) -> int:
+        """追加若干行, 返回实际写入的行数 (受容量限制)"""
+        count = self.count
+        n = min(len(columns["ts"]), self.capacity - count)
+        if n <= 0:
+            return 0
+
+        for name, dtype in self.columns:
+            start = self.offsets[name] + count * dtype.itemsize
+            data = np.ascontiguousarray(columns[name][:n], dtype=dtype)
+            self.mm[start : start + data.nbytes] = data.tobytes()
+        # 各列写完后再提交行数
+        struct.pack_into("<I", self.mm, _COUNT_OFFSET, count + n)
+        return n
+
+    def pairs(self) -> list[str]:
+        try:
+            with open(self.pairs_path, encoding="utf-8") as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def close(self):
+        self.mm.close()
+
+
+def list_segments(directory: str) -> list[tuple[int, str]]:
+    """(开始时间, 路径), 按开始时间排序"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+
+    res = []
+    for name in names:
+        if not name.endswith(".seg"):
+            continue
+        start, _, seq = name[: -len(".seg")].partition("-")
+        if start.isdigit() and seq.isdigit():
+            res.append((int(start), int(seq), os.path.join(directory, name)))
+    return [(start, path) for start, _, path in sorted(res)]
+
+
+class HistoryWriter:
+    """按时间切换分段, 单线程调用"""
+
+    def __init__(
+        self,
+        directory: str = history_dir,
+        segment_s: int = history_segment_s,
+        segment_rows: int = history_segment_rows,
+        retention_days: int = history_retention_days,
+        layout: int = LAYOUT_TICKS,
+    ):
+        self.directory = directory
+        self.layout = layout
+        self.segment_ms = segment_s * 1000
+        self.segment_rows = segment_rows
+        self.retention_ms = retention_days * 86400_000
+
+        self._segment: Segment | None = None
+        # "映射 symbol" -> 当前分段内的 pair id
+        self._pair_ids: dict[str, int] = {}
+        self._last_ts = 0
+
+    def append(self, ts: np.ndarray, pairs: list[str], columns: dict[str, np.ndarray]):
+        """
+        ts: 单调不减
+        pairs: 每行的 "映射 symbol"
+        columns: 布局中除 ts / pair 以外的各列
+        """
+        # 分段内的 ts 必须单调不减, 批次之间的少量乱序 (多个线程计算) 按上一批的时间记录
+        ts = np.maximum(ts, self._last_ts)
+        if len(ts):
+            self._last_ts = int(ts[-1])
+
+        written = 0
+        while written < len(ts):
+            segment = self._current(int(ts[written]))
+            end = written + self._rows_in_window(ts[written:], segment)
+            pair_ids = self._intern(segment, pairs[written:end])
+
+            n = segment.append(
+                {
+                    "ts": ts[written:end],
+                    "pair": pair_ids,
+                    **{k: v[written:end] for k, v in columns.items()},
+                }
+            )
+            if n < end - written:
+                # 写满, 下一轮切换新的分段
+                self._rotate(int(ts[written + n]))
+            written += n
+
+    def close(self):
+        if self._segment:
+            self._segment.close()
+            self._segment = None
+
+    def _rows_in_window(self, ts: np.ndarray, segment: Segment) -> int:
+        return int(np.searchsorted(ts, segment.end_ms, side="left"))
+
+    def _current(self, ts: int) -> Segment:
+        segment = self._segment
+        if segment is None or ts >= segment.end_ms:
+            segment = self._rotate(ts)
+        return segment
+
+    def _rotate(self, ts: int) -> Segment:
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+
+        start = ts - ts % self.segment_ms
+        existing = [path for s, path in list_segments(self.directory) if s == start]
+        seq = len(existing)
+        path = os.path.join(self.directory, f"{start}-{seq}.seg")
+        self._segment = Segment.create(
+            path, self.layout, self.segment_rows, start, start + self.segment_ms
+        )
+        self._pair_ids = {}
+        Lg.info(f"差价历史切换分段: {path}")
+
+        self._purge(ts)
+        return self._segment
+
+    def _intern(self, segment: Segment, pairs: list[str]) -> np.ndarray:
+        new = []
+        ids = np.empty(len(pairs), dtype=np.int32)
+        for i, pair in enumerate(pairs):
+            pid = self._pair_ids.get(pair)
+            if pid is None:
+                pid = self._pair_ids[pair] = len(self._pair_ids)
+                new.append(pair)
+            ids[i] = pid
+
+        # pair 先于引用它的行落盘
+        if new:
+            with open(segment.pairs_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{ele}\n" for ele in new))
+        return ids
+
+    def _purge(self, now: int):
+        segments = list_segments(self.directory)
+        # 最后一个分段的结束时间未知, 总是保留
+        for (start, path), (next_start, _) in zip(segments, segments[1:]):
+            if next_start < now - self.retention_ms:
+                for ele in (path, path[: -len(".seg")] + ".pairs"):
+                    try:
+                        os.remove(ele)
+                    except FileNotFoundError:
+                        pass
+
+
+def scan(
+    pair: str,
+    start_ms: int,
+    end_ms: int,
+    directory: str = history_dir,
+    chunk_rows: int = 4096,
+) -> Iterator[dict[str, np.ndarray]]:
+    """读取某个 "映射 symbol" 在 [start_ms, end_ms) 内的历史, 按时间顺序分块返回
+
+    只打开时间范围有重叠的分段
+    """
+    segments = list_segments(directory)
+    for i, (seg_start, path) in enumerate(segments):
+        # 同一时间窗口写满后会有多个分段, 以下一个时间窗口的开始时间为上界
+        next_start = next((s for s, _ in segments[i + 1 :] if s > seg_start), None)
+        if seg_start >= end_ms or (next_start is not None and next_start <= start_ms):
+            continue
+
+        try:
+            segment = Segment(path)
+        except (ValueError, OSError) as e:
+            Lg.error(f"差价历史分段无法读取: {path}, {e}")
+            continue
+
+        try:
+            pairs = segment.pairs()
+            if pair not in pairs:
+                continue
+            pid = pairs.index(pair)
+
+            count = segment.count
+            lo, hi = segment.search(start_ms, end_ms, count)
+            for begin in range(lo, hi, chunk_rows):
+                chunk = segment.read(pid, begin, min(begin + chunk_rows, hi), count)
+                if len(chunk["ts"]):
+                    yield chunk
+        finally:
+            segment.close()
+
+
+class SpreadRecorder:
+    """监听差价计算结果, 批量写入分段文件
+
+    - 监听在计算线程中调用, 只把结果放入内存队列
+    - 后台任务定时把队列写入文件 (在线程池中执行), 并持续计算 history_mappings 中的映射
+    - 同时生成各级 K 线, 见 spread_candles
+    """
+
+    def __init__(
+        self,
+        writer: HistoryWriter | None = None,
+        mappings: str = history_mappings,
+        interval_ms: int = history_interval_ms,
+    ):
+        # avoid circular import
+        from app.market.spread_candles import CandlePyramid
+
+        self.writer = writer or HistoryWriter()
+        self.candles = CandlePyramid(self.writer.directory)
+        self.mappings = [ele.strip() for ele in mappings.split(",") if ele.strip()]
+        self.interval_ms = interval_ms
+
+        self._pending: list[tuple[Hashable, np.ndarray, SpreadColumns, int]] = []
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+
+    def on_spreads(self, key: Hashable, sids: np.ndarray, spreads: SpreadColumns, ts: int):
+        with self._lock:
+            self._pending.append((key, sids, spreads, ts))
+
+    def start(self):
+        if not self.writer.directory:
+            Lg.info("差价历史未配置存储目录, 不记录")
+            return
+        if self._task is None:
+            spread_listeners.append(self.on_spreads)
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        spread_listeners.remove(self.on_spreads)
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        await asyncio.to_thread(self.flush)
+        self.writer.close()
+        # 未收盘的 K 线不写入
+        self.candles.close_writers()
+
+    def flush(self, now: int | None = None):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        # 在取出队列之后, 队列中的差价都不晚于 now
+        now = now_ms() if now is None else now
+
+        self._write(pending)
+        self.candles.close(now)
+
+    def _write(self, pending: list):
+        ts, pairs, diff_ab, diff_ba, qccj, flags = [], [], [], [], [], []
+        for key, sids, spreads, at in pending:
+            if not is_full_market(key):
+                continue
+            prefix = mapping_id(key)  # type: ignore
+            ts.append(np.full(len(sids), at, dtype=np.int64))
+            pairs += [f"{prefix} {instruments.symbol_name(sid)}" for sid in sids.tolist()]
+            diff_ab.append(spreads.diff_ab)
+            diff_ba.append(spreads.diff_ba)
+            qccj.append(spreads.qccj)
+            flags.append(encode_flags(spreads))
+        if not ts:
+            return
+
+        ts_col = np.concatenate(ts)
+        # 多个监听批次可能交错, 按时间稳定排序后写入
+        order = np.argsort(ts_col, kind="stable")
+        ts_col = ts_col[order]
+        pairs = [pairs[i] for i in order.tolist()]
+        diff_ab_col = np.concatenate(diff_ab)[order]
+        self.candles.add(ts_col, pairs, diff_ab_col)
+        self.writer.append(
+            ts_col,
+            pairs,
+            {
+                "diff_ab": diff_ab_col,
+                "diff_ba": np.concatenate(diff_ba)[order],
+                "qccj": np.concatenate(qccj)[order],
+                "flags": np.concatenate(flags)[order],
+            },
+        )
+
+    async def _run_forever(self):
+        # avoid circular import
+        from app.models.watch_models import ExchangeMarket, SymbolRowReq
+
+        targets = []
+        for ele in self.mappings:
+            try:
+                a, b = ele.split("/")
+                targets.append((ExchangeMarket(a), ExchangeMarket(b)))
+            except Exception as e:
+                Lg.error(f"差价历史映射无效: {ele}, {e}")
+
+        params = SymbolRowReq()
+        while True:
+            # 持续计算需要记录的映射, 结果通过 spread_listeners 进入队列
+            for a, b in targets:
+                try:
+                    snapshot_a, snapshot_b = await asyncio.gather(
+                        a.get_snapshot(params), b.get_snapshot(params)
+                    )
+                    spread_books.get((snapshot_a.key, snapshot_b.key)).update(
+                        snapshot_a, snapshot_b
+                    )
+                except Exception as e:
+                    Lg.error(f"差价历史计算失败: {a.key} / {b.key}, {e}")
+
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                Lg.error(f"差价历史写入失败: {e}")
+            await asyncio.sleep(self.interval_ms / 1000)
+
+
+spread_recorder = SpreadRecorder()
+
+
+def decode_rows(chunk: dict[str, np.ndarray]) -> list[dict]:
+    """scan 的结果 -> 与 SymbolRow 相同的差价字段, 每行一个 dict"""
+    res = []
+    for ts, diff_ab, diff_ba, qccj, flags in zip(
+        chunk["ts"].tolist(),
+        chunk["diff_ab"].tolist(),
+        chunk["diff_ba"].tolist(),
+        chunk["qccj"].tolist(),
+        chunk["flags"].tolist(),
+    ):
+        res.append(
+            {
+                "timestamp": ts,
+                "diffAb": from_scaled(diff_ab, bool(flags & FLAG_DIFF_AB_NEG)),
+                "diffBa": from_scaled(diff_ba, bool(flags & FLAG_DIFF_BA_NEG)),
+                # 推荐方向由 diffAb 的符号决定, 与 SpreadColumns 相同
+                "direction": direction_name((diff_ab > 0) - (diff_ab < 0)),
+                "qccj": (
+                    from_scaled(qccj, bool(flags & FLAG_QCCJ_NEG))
+                    if flags & FLAG_HAS_QCCJ
+                    else None
+                ),
+            }
+        )
+    return res
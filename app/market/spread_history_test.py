@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+import numpy as np
+
+from app.market.instruments import instruments
+from app.market.spread_engine import SpreadColumns, spread_fields
+from app.market.spread_history import (
+    HistoryWriter,
+    SpreadRecorder,
+    decode_rows,
+    list_segments,
+    scan,
+)
+
+
+def test_record_and_scan(tmp_path):
+    directory = str(tmp_path)
+    # 每个分段 60s, 最多 5 行, 写满或跨时间窗口都会切换分段
+    writer = HistoryWriter(directory, segment_s=60, segment_rows=5)
+    recorder = SpreadRecorder(writer, mappings="")
+
+    key = (("binance", "spot", None), ("okx", "swap", None))
+    sids = instruments.symbol_ids(["HISTAUSDT", "HISTBUSDT"])
+    expected = []
+    for i in range(10):
+        bid_a = [Decimal("100"), Decimal("2.5")]
+        ask_a = [Decimal("100.01"), Decimal("2.51")]
+        bid_b = [Decimal(100 + i), Decimal("2.49")]
+        ask_b = [Decimal(100 + i) + Decimal("0.02"), Decimal("2.5")]
+        spreads = SpreadColumns(bid_a, ask_a, bid_b, ask_b)
+        ts = 1_700_000_000_000 + i * 20_000
+        recorder.on_spreads(key, sids, spreads, ts)
+        expected.append((ts, spread_fields(spreads.row(0))))
+
+    # 只记录全市场的映射
+    recorder.on_spreads((("binance", "spot", "X"), key[1]), sids, spreads, 0)
+    recorder.flush()
+    writer.close()
+    assert len(list_segments(directory)) > 1
+
+    pair = "binance-spot/okx-swap HISTAUSDT"
+    rows = [
+        ele
+        for chunk in scan(pair, 0, 2**62, directory, chunk_rows=3)
+        for ele in decode_rows(chunk)
+    ]
+    assert [ele["timestamp"] for ele in rows] == [ts for ts, _ in expected]
+    for row, (_, fields) in zip(rows, expected):
+        assert row["diffAb"] == fields["diffAb"]
+        assert row["diffBa"] == fields["diffBa"]
+        assert row["direction"] == fields.get("direction")
+        assert row["qccj"] == fields.get("qccj")
+
+    # 时间范围 [start, end)
+    start, end = expected[2][0], expected[5][0]
+    chunks = list(scan(pair, start, end, directory))
+    ts = np.concatenate([ele["ts"] for ele in chunks])
+    assert ts.tolist() == [ele[0] for ele in expected[2:5]]
+
+    assert list(scan("binance-spot/okx-swap NONE", 0, 2**62, directory)) == []
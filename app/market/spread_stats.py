@@ -0,0 +1,246 @@
+"""差价的在线统计
+
+每个 SpreadBook 按 symbol id 维护 diffAb 的统计, 随每次重新计算增量更新, 不回看历史,
+每个 symbol 占用固定大小的内存:
+
+- EWMA 均值 / 方差: 按时间衰减 (半衰期 spread_stats_halflife_s), 差价在两次更新之间保持不变,
+  即每个值按其持续的时长加权
+- z-score: (当前 diffAb - 均值) / 标准差, 样本数不足 spread_stats_min_samples 时为空
+- 分位数: P² 算法 (Jain & Chlamtac), 每个分位数 5 个标记, 统计全部更新 (不衰减)
+
+所有操作都按列 (numpy) 进行, 一次处理一批 symbol
+"""
+
+import math
+from decimal import Decimal
+
+import numpy as np
+
+from app.config import spread_stats_halflife_s, spread_stats_min_samples
+from app.market.spread_engine import (
+    _EPS,
+    _MAX_SCALED,
+    SCALE,
+    adjust_precision,
+    from_scaled,
+)
+
+# 分位数 -> SymbolRow 字段
+QUANTILES = {0.05: "diffAbP05", 0.5: "diffAbP50", 0.95: "diffAbP95"}
+
+
+class P2Quantiles:
+    """按行的 P² 分位数估计, 每行每个分位数 5 个标记 (高度 + 位置)"""
+
+    def __init__(self, quantiles: list[float]):
+        self.quantiles = np.array(quantiles, dtype=np.float64)
+        p = self.quantiles[:, None]
+        # 期望位置的增量, 第 n 个观测后期望位置为 1 + (n - 1) * _rates
+        self._rates = np.hstack(
+            (np.zeros_like(p), p / 2, p, (1 + p) / 2, np.ones_like(p))
+        )
+
+        q = len(quantiles)
+        self.count = np.zeros(0, dtype=np.int64)
+        # 前 5 个观测直接保存在 heights 中
+        self.heights = np.zeros((0, q, 5), dtype=np.float64)
+        self.positions = np.zeros((0, q, 5), dtype=np.float64)
+
+    def grow(self, size: int):
+        n = len(self.count)
+        if size <= n:
+            return
+        size = max(size, n * 2)
+        q = len(self.quantiles)
+        self.count = np.concatenate((self.count, np.zeros(size - n, dtype=np.int64)))
+        self.heights = np.concatenate((self.heights, np.zeros((size - n, q, 5))))
+        self.positions = np.concatenate((self.positions, np.zeros((size - n, q, 5))))
+
+    def update(self, idx: np.ndarray, x: np.ndarray):
+        """idx: 行号, 不重复; x: 对应的观测值"""
+        count = self.count[idx]
+
+        warm = count < 5
+        if warm.any():
+            rows, c = idx[warm], count[warm]
+            self.heights[rows, :, c] = x[warm][:, None]
+            full = rows[c == 4]
+            if len(full):
+                self.heights[full] = np.sort(self.heights[full], axis=2)
+                self.positions[full] = np.arange(1, 6, dtype=np.float64)
+
+        if not warm.all():
+            run = ~warm
+            self._step(idx[run], x[run], count[run] + 1)
+
+        self.count[idx] = count + 1
+
+    def values(self, i: int) -> list[float | None]:
+        """第 i 行的各分位数, 没有观测时为 None"""
+        count = int(self.count[i])
+        if count == 0:
+            return [None] * len(self.quantiles)
+        if count >= 5:
+            return self.heights[i, :, 2].tolist()
+
+        # 观测不足 5 个, 取最近秩
+        samples = np.sort(self.heights[i, 0, :count])
+        return [
+            float(samples[int(round(p * (count - 1)))]) for p in self.quantiles.tolist()
+        ]
+
+    def _step(self, idx: np.ndarray, x: np.ndarray, n_obs: np.ndarray):
+        q = self.heights[idx]
+        n = self.positions[idx]
+        x = x[:, None]
+
+        # 更新两端的标记, 找到 x 所在的区间 k (0..3), 其后的标记位置 +1
+        q[..., 0] = np.minimum(q[..., 0], x)
+        q[..., 4] = np.maximum(q[..., 4], x)
+        k = (q[..., 1:4] <= x[..., None]).sum(axis=2)
+        n += np.arange(5) > k[..., None]
+
+        desired = 1 + (n_obs - 1)[:, None, None] * self._rates
+
+        for i in (1, 2, 3):
+            qi, qm, qp = q[..., i], q[..., i - 1], q[..., i + 1]
+            ni, nm, np_ = n[..., i], n[..., i - 1], n[..., i + 1]
+            d = desired[..., i] - ni
+            up = (d >= 1) & (np_ - ni > 1)
+            down = (d <= -1) & (nm - ni < -1)
+            adjust = up | down
+            if not adjust.any():
+                continue
+
+            s = np.where(up, 1.0, -1.0)
+            # 相邻标记的位置至少相差 1, 不会除以 0
+            parabolic = qi + s / (np_ - nm) * (
+                (ni - nm + s) * (qp - qi) / (np_ - ni)
+                + (np_ - ni - s) * (qi - qm) / (ni - nm)
+            )
+            linear = qi + s * (np.where(up, qp, qm) - qi) / (np.where(up, np_, nm) - ni)
+            new = np.where((qm < parabolic) & (parabolic < qp), parabolic, linear)
+
+            q[..., i] = np.where(adjust, new, qi)
+            n[..., i] = ni + np.where(adjust, s, 0.0)
+
+        self.heights[idx] = q
+        self.positions[idx] = n
+
+
+class SpreadStats:
+    """按 symbol id 下标的 diffAb 统计, 由 SpreadBook 在重新计算时调用 (已持有 book 的锁)"""
+
+    def __init__(
+        self,
+        halflife_s: float = spread_stats_halflife_s,
+        min_samples: int = spread_stats_min_samples,
+    ):
+        self.decay = math.log(2) / (halflife_s * 1000)
+        self.min_samples = min_samples
+
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0, dtype=np.float64)
+        self.var = np.zeros(0, dtype=np.float64)
+        # 上一次的值和时间, 下一次更新时按持续的时长计入均值
+        self.last = np.zeros(0, dtype=np.float64)
+        self.last_at = np.zeros(0, dtype=np.int64)
+        self.quantiles = P2Quantiles(list(QUANTILES))
+        # sid -> (计算时的 count, fields 的结果), count 变化即失效
+        self._fields: dict[int, tuple[int, dict]] = {}
+
+    def grow(self, size: int):
+        n = len(self.count)
+        if size <= n:
+            return
+        size = max(size, n * 2)
+        self.count = np.concatenate((self.count, np.zeros(size - n, dtype=np.int64)))
+        for name in ("mean", "var", "last"):
+            setattr(self, name, np.concatenate((getattr(self, name), np.zeros(size - n))))
+        self.last_at = np.concatenate((self.last_at, np.zeros(size - n, dtype=np.int64)))
+        self.quantiles.grow(size)
+
+    def update(self, sids: np.ndarray, values: np.ndarray, now: int):
+        """sids: 不重复的 symbol id; values: 对应的 diffAb (%); now: ms"""
+        self.grow(int(sids.max()) + 1 if len(sids) else 0)
+        values = values.astype(np.float64)
+
+        first = self.count[sids] == 0
+        if first.any():
+            ids = sids[first]
+            self.mean[ids] = values[first]
+            self.var[ids] = 0
+
+        rest = sids[~first]
+        if len(rest):
+            dt = np.maximum(now - self.last_at[rest], 0)
+            alpha = -np.expm1(-self.decay * dt)
+            diff = self.last[rest] - self.mean[rest]
+            incr = alpha * diff
+            self.mean[rest] += incr
+            self.var[rest] = (1 - alpha) * (self.var[rest] + diff * incr)
+
+        self.last[sids] = values
+        self.last_at[sids] = now
+        self.count[sids] += 1
+        self.quantiles.update(sids, values)
+
+    def zscores(self, sids: np.ndarray) -> np.ndarray:
+        """各 symbol 当前值的 z-score, 不可用时为 nan; sids 必须都已 update 过"""
+        std = np.sqrt(self.var[sids])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            z = (self.last[sids] - self.mean[sids]) / std
+        ok = (self.count[sids] >= self.min_samples) & (std > 0)
+        return np.where(ok, z, np.nan)
+
+    def fields(self, sid: int) -> dict:
+        """SymbolRow 的统计字段, 没有数据的字段不返回, 结果被多次读取共享, 不要修改
+
+        每个返回的行都会调用: 两次 update 之间只计算一次, 按标量计算, 不创建 numpy 数组
+        """
+        if sid >= len(self.count):
+            return {}
+        count = int(self.count[sid])
+        if count == 0:
+            return {}
+        cached = self._fields.get(sid)
+        if cached is not None and cached[0] == count:
+            return cached[1]
+
+        res = self._fields_of(sid)
+        self._fields[sid] = (count, res)
+        return res
+
+    def _fields_of(self, sid: int) -> dict:
+        mean = float(self.mean[sid])
+        std = math.sqrt(float(self.var[sid]))
+        res = {"diffAbMean": _to_decimal(mean), "diffAbStd": _to_decimal(std)}
+        if self.count[sid] >= self.min_samples and std > 0:
+            res["diffAbZ"] = _to_decimal((float(self.last[sid]) - mean) / std)
+        for name, value in zip(QUANTILES.values(), self.quantiles.values(sid)):
+            if value is not None:
+                res[name] = _to_decimal(value)
+        return res
+
+
+def _to_decimal(val: float) -> Decimal | None:
+    """保留 4 位小数 (四舍五入), 同 adjust_precision
+
+    同 spread_engine._round_half_up: 放大 10^4 后按整数取舍; 只有小数部分接近 .5 或超出范围时,
+    按 float 的最短十进制表示 (repr) 用 Decimal 取舍, 而不是 float 的二进制值
+    """
+    if not math.isfinite(val):
+        return None
+
+    a = abs(val) * SCALE
+    if a < _MAX_SCALED and abs(a - math.floor(a) - 0.5) >= _EPS:
+        q = math.floor(a + 0.5)
+        if not q:
+            return _ZERO
+        return from_scaled(-q if val < 0 else q, False)
+
+    res = adjust_precision(Decimal(repr(val)))
+    return res if res else _ZERO
+
+
+_ZERO = Decimal("0")
@@ -0,0 +1,154 @@
+import math
+import random
+from decimal import Decimal
+
+import numpy as np
+
+from app.market.quote_cache import QuoteSnapshot
+from app.market.quote_table import QuoteTable
+from app.market.spread_book import SpreadBook
+from app.market.spread_engine import SCALE, adjust_precision
+from app.market.spread_stats import P2Quantiles, SpreadStats, _to_decimal
+
+
+def test_p2_quantiles_close_to_exact():
+    rng = np.random.default_rng(7)
+    quantiles = P2Quantiles([0.05, 0.5, 0.95])
+    quantiles.grow(3)
+
+    # 3 行各自独立, 每次只更新其中一部分
+    samples = [[], [], []]
+    for _ in range(5000):
+        idx = np.flatnonzero(rng.random(3) < 0.7)
+        x = rng.normal(loc=idx * 10.0, scale=1.0 + idx)
+        quantiles.update(idx, x)
+        for i, v in zip(idx.tolist(), x.tolist()):
+            samples[i].append(v)
+
+    for i in range(3):
+        exact = np.quantile(samples[i], [0.05, 0.5, 0.95])
+        assert np.allclose(quantiles.values(i), exact, atol=0.1 * (1 + i))
+
+    # 观测不足 5 个时取最近秩
+    few = P2Quantiles([0.5])
+    few.grow(1)
+    for v in (3.0, 1.0, 2.0):
+        few.update(np.array([0]), np.array([v]))
+    assert few.values(0) == [2.0]
+
+
+def test_ewma_matches_reference():
+    halflife_s = 10
+    stats = SpreadStats(halflife_s=halflife_s, min_samples=3)
+
+    random.seed(1)
+    mean = var = last = 0.0
+    at = 0
+    for i in range(200):
+        now = i * random.randint(100, 3000)
+        now = max(now, at)
+        x = random.uniform(-1, 1)
+        stats.update(np.array([5]), np.array([x]), now)
+
+        # 上一次的值按持续的时长计入
+        if i == 0:
+            mean, var = x, 0.0
+        else:
+            alpha = 1 - math.exp(-math.log(2) * (now - at) / (halflife_s * 1000))
+            diff = last - mean
+            mean += alpha * diff
+            var = (1 - alpha) * (var + alpha * diff * diff)
+        last, at = x, now
+
+    assert math.isclose(stats.mean[5], mean, abs_tol=1e-9)
+    assert math.isclose(stats.var[5], var, abs_tol=1e-9)
+    z = stats.zscores(np.array([5]))[0]
+    assert math.isclose(z, (last - mean) / math.sqrt(var), rel_tol=1e-9)
+
+    fields = stats.fields(5)
+    assert set(fields) == {
+        "diffAbMean",
+        "diffAbStd",
+        "diffAbZ",
+        "diffAbP05",
+        "diffAbP50",
+        "diffAbP95",
+    }
+    assert stats.fields(4) == {}
+
+
+def gen_snapshot(version: int, prices: dict[str, Decimal], label: str):
+    return QuoteSnapshot(
+        key=label,
+        table=QuoteTable.from_prices(
+            [(sy, label, p, p + Decimal("0.01"), version) for sy, p in prices.items()]
+        ),
+        fetched_at=0,
+        version=version,
+    )
+
+
+def test_spread_book_sort_by_zscore(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr("app.market.spread_book.time.time", lambda: clock[0])
+
+    prices_a = {"ZSAUSDT": Decimal(100), "ZSBUSDT": Decimal(100)}
+    prices_b = {"ZSAUSDT": Decimal(101), "ZSBUSDT": Decimal(100)}
+
+    book = SpreadBook()
+    book.stats.min_samples = 3
+    for version in range(1, 40):
+        clock[0] = version
+        # ZSB 的差价一直在 0 附近波动, 最后一次突然放大; ZSA 的差价较大但稳定
+        prices_b["ZSAUSDT"] = Decimal(101) + Decimal(version % 2) / 100
+        prices_b["ZSBUSDT"] = Decimal(100) + Decimal(version % 3) / 100
+        if version == 39:
+            prices_b["ZSBUSDT"] = Decimal("100.5")
+        book.update(
+            gen_snapshot(version, prices_a, "a"), gen_snapshot(version, prices_b, "b")
+        )
+
+    by_spread = [entry.a[0] for entry in book.top_n(None)]
+    by_z = [entry.a[0] for entry in book.top_n(None, sort_by="zscore")]
+    assert by_spread == ["ZSAUSDT", "ZSBUSDT"]
+    assert by_z == ["ZSBUSDT", "ZSAUSDT"]
+    assert book.top_n(1, sort_by="zscore")[0].stats["diffAbZ"] > 3
+
+
+def test_to_decimal_rounds_half_up():
+    # 0.00015 / 2.00025 的二进制值略小于十进制值, f"{val:.4f}" 会舍去
+    assert _to_decimal(0.00015) == Decimal("0.0002")
+    assert _to_decimal(2.00025) == Decimal("2.0003")
+    assert _to_decimal(-2.12345) == Decimal("-2.1235")
+    assert _to_decimal(0.2) == Decimal("0.2")
+    assert str(_to_decimal(-0.00001)) == "0"
+    assert _to_decimal(float("nan")) is None
+
+
+def test_to_decimal_matches_decimal_rounding():
+    rng = np.random.default_rng(7)
+    values = np.concatenate(
+        (
+            rng.normal(0, 1, 2000),
+            rng.normal(0, 1e4, 500),
+            # 放大后恰好落在 .5 附近
+            (np.arange(-500, 500) + 0.5) / SCALE,
+            np.array([1e5, -3e7, 1e-9, 0.0, -0.0]),
+        )
+    )
+    for val in values.tolist():
+        expected = adjust_precision(Decimal(repr(val)))
+        res = _to_decimal(val)
+        assert res == expected and str(res) == str(expected or Decimal("0")), val
+
+
+def test_fields_cached_until_update():
+    stats = SpreadStats(halflife_s=1, min_samples=1)
+    stats.update(np.array([3]), np.array([0.5]), 1000)
+    first = stats.fields(3)
+    assert stats.fields(3) is first
+
+    stats.update(np.array([3]), np.array([0.7]), 2000)
+    second = stats.fields(3)
+    assert second is not first
+    assert second["diffAbP95"] == Decimal("0.7") != first["diffAbP95"]
@@ -0,0 +1,165 @@
+import asyncio
+import json
+from typing import Any, Awaitable, Callable
+
+from app.models.http_model import Resp
+from app.models.watch_models import SymbolRow, SymbolRowReq
+from app.utils import json_util
+from app.utils.log_util import Lg
+
+# 比较行是否变化时忽略的字段
+_VOLATILE_FIELDS = {"ageA", "ageB"}
+
+
+def row_key(row: SymbolRow) -> str:
+    return f"{row.bookA}|{row.bookB}|{row.symbol}"
+
+
+class Subscriber:
+    def __init__(self, max_pending: int = 16):
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max_pending)
+        # 消费太慢, 积压的增量被丢弃后需要重新推送全量
+        self.need_full = True
+
+
+class SpreadStream:
+    """同一组查询参数共享一个计算循环, 计算结果以增量的形式推送给所有订阅者"""
+
+    def __init__(
+        self,
+        key: str,
+        params: SymbolRowReq,
+        interval_ms: int,
+        compute: Callable[[SymbolRowReq], Awaitable[list[SymbolRow]]],
+        on_idle: Callable[[str], None],
+    ):
+        self.key = key
+        self.params = params
+        self.interval_ms = interval_ms
+        self.compute = compute
+        self.on_idle = on_idle
+
+        # row key -> 序列化后的行
+        self.rows: dict[str, dict[str, Any]] = {}
+        self.order: list[str] = []
+        self.subscribers: set[Subscriber] = set()
+        self.task: asyncio.Task | None = None
+        self.ready = asyncio.Event()
+
+    def subscribe(self) -> Subscriber:
+        sub = Subscriber()
+        self.subscribers.add(sub)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        elif self.ready.is_set():
+            self._push(sub, None)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+        if not self.subscribers:
+            if self.task:
+                self.task.cancel()
+            self.on_idle(self.key)
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                rows = await self.compute(self.params)
+                diff = self._apply(rows)
+                self.ready.set()
+                for sub in list(self.subscribers):
+                    self._push(sub, diff)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                Lg.error(f"spread stream error, key: {self.key}, ex: {e}")
+                failed = json_util.dumps(Resp.failed(str(e)).model_dump()).decode()
+                for sub in list(self.subscribers):
+                    self._offer(sub, failed)
+
+            await asyncio.sleep(self.interval_ms / 1000)
+
+    def _apply(self, rows: list[SymbolRow]) -> dict[str, Any] | None:
+        """用新一轮的结果更新状态, 返回增量, 没有变化返回 None"""
+        upsert = []
+        new_rows: dict[str, dict[str, Any]] = {}
+        for row in rows:
+            key = row_key(row)
+            dumped = dict(json_util.model_values(row))
+            new_rows[key] = dumped
+
+            old = self.rows.get(key)
+            if old is None or any(
+                old[k] != v for k, v in dumped.items() if k not in _VOLATILE_FIELDS
+            ):
+                upsert.append(dumped)
+            else:
+                # 没有变化的行沿用旧的 age
+                new_rows[key] = old
+
+        remove = [key for key in self.rows if key not in new_rows]
+        order = list(new_rows)
+        order_changed = order != self.order
+
+        self.rows = new_rows
+        self.order = order
+
+        if not upsert and not remove and not order_changed:
+            return None
+
+        return {
+            "full": False,
+            "upsert": upsert,
+            "remove": remove,
+            "order": order if order_changed else None,
+        }
+
+    def _push(self, sub: Subscriber, diff: dict[str, Any] | None):
+        if sub.need_full:
+            diff = {
+                "full": True,
+                "upsert": list(self.rows.values()),
+                "remove": [],
+                "order": self.order,
+            }
+        if diff is None:
+            return
+
+        if self._offer(sub, Resp.ok_bytes(diff).decode()):
+            sub.need_full = False
+
+    def _offer(self, sub: Subscriber, msg: str) -> bool:
+        try:
+            sub.queue.put_nowait(msg)
+            return True
+        except asyncio.QueueFull:
+            # 丢弃积压的增量, 下一轮推送全量
+            while not sub.queue.empty():
+                sub.queue.get_nowait()
+            sub.need_full = True
+            return False
+
+
+class SpreadStreamHub:
+    def __init__(self):
+        self.streams: dict[str, SpreadStream] = {}
+
+    def subscribe(
+        self,
+        params: SymbolRowReq,
+        interval_ms: int,
+        compute: Callable[[SymbolRowReq], Awaitable[list[SymbolRow]]],
+    ) -> tuple[SpreadStream, Subscriber]:
+        key = json.dumps([params.model_dump(), interval_ms], sort_keys=True)
+        stream = self.streams.get(key)
+        if stream is None:
+            stream = SpreadStream(
+                key, params, interval_ms, compute, lambda k: self.streams.pop(k, None)
+            )
+            self.streams[key] = stream
+
+        return stream, stream.subscribe()
+
+
+spread_stream_hub = SpreadStreamHub()
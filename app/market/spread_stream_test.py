@@ -0,0 +1,93 @@
+import json
+from decimal import Decimal
+
+from app.market.spread_stream import SpreadStream, Subscriber
+from app.models.watch_models import SymbolRow
+
+
+def make_row(symbol: str, bid_b: str = "101", age: int = 0) -> SymbolRow:
+    return SymbolRow(
+        symbol=symbol,
+        bookA="币安-现货",
+        bidPriceA=Decimal("100"),
+        askPriceA=Decimal("100.1"),
+        bookB="币安-永续合约",
+        bidPriceB=Decimal(bid_b),
+        askPriceB=Decimal("101.1"),
+        timestamp=1,
+        ageA=age,
+        ageB=age,
+    )
+
+
+def make_stream() -> SpreadStream:
+    async def compute(params):
+        return []
+
+    return SpreadStream("k", None, 1000, compute, lambda k: None)  # type: ignore
+
+
+def keys(rows: list[dict]) -> list[str]:
+    return [r["symbol"] for r in rows]
+
+
+def test_apply_delta():
+    stream = make_stream()
+
+    diff = stream._apply([make_row("BTCUSDT"), make_row("ETHUSDT")])
+    assert diff is not None
+    assert keys(diff["upsert"]) == ["BTCUSDT", "ETHUSDT"]
+    assert diff["remove"] == []
+    assert [k.split("|")[-1] for k in diff["order"]] == ["BTCUSDT", "ETHUSDT"]
+
+    # BTC 消失, ETH 只有年龄变化, DOGE 新增
+    diff = stream._apply([make_row("ETHUSDT", age=500), make_row("DOGEUSDT")])
+    assert diff is not None
+    assert keys(diff["upsert"]) == ["DOGEUSDT"]
+    assert [k.split("|")[-1] for k in diff["remove"]] == ["BTCUSDT"]
+    assert [k.split("|")[-1] for k in diff["order"]] == ["ETHUSDT", "DOGEUSDT"]
+    # 没有变化的行沿用旧的年龄
+    assert stream.rows[stream.order[0]]["ageA"] == 0
+
+    # 只有年龄变化, 没有增量
+    assert stream._apply([make_row("ETHUSDT", age=900), make_row("DOGEUSDT")]) is None
+
+    # 价格变化, 顺序不变时不带 order
+    diff = stream._apply([make_row("ETHUSDT", bid_b="102"), make_row("DOGEUSDT")])
+    assert diff is not None
+    assert keys(diff["upsert"]) == ["ETHUSDT"]
+    assert diff["remove"] == [] and diff["order"] is None
+
+    # 只有顺序变化
+    diff = stream._apply([make_row("DOGEUSDT"), make_row("ETHUSDT", bid_b="102")])
+    assert diff is not None
+    assert diff["upsert"] == [] and diff["remove"] == []
+    assert [k.split("|")[-1] for k in diff["order"]] == ["DOGEUSDT", "ETHUSDT"]
+
+
+def test_queue_full_resyncs_with_full():
+    stream = make_stream()
+    sub = Subscriber(max_pending=2)
+    stream.subscribers.add(sub)
+
+    def next_msg() -> dict:
+        return json.loads(sub.queue.get_nowait())["data"]
+
+    stream._apply([make_row("BTCUSDT")])
+    stream._push(sub, None)
+    stream._push(sub, stream._apply([make_row("BTCUSDT", bid_b="102")]))
+    assert sub.queue.full()
+
+    # 订阅者不消费, 放不下时丢弃积压的增量
+    stream._push(sub, stream._apply([make_row("BTCUSDT", bid_b="103")]))
+    assert sub.need_full and sub.queue.empty()
+
+    # 下一条是全量
+    stream._push(sub, stream._apply([make_row("BTCUSDT", bid_b="104")]))
+    msg = next_msg()
+    assert msg["full"] is True
+    assert [r["bidPriceB"] for r in msg["upsert"]] == ["104"]
+    assert not sub.need_full
+
+    stream._push(sub, stream._apply([make_row("BTCUSDT", bid_b="105")]))
+    assert next_msg()["full"] is False
@@ -2,6 +2,8 @@ from typing import Any
 
 from pydantic import BaseModel
 
+from app.utils import json_util
+
 
 class Resp(BaseModel):
     code: int
@@ -15,3 +17,8 @@ class Resp(BaseModel):
     @staticmethod
     def failed(err: str):
         return Resp(code=1, message=err, data=None)
+
+    @staticmethod
+    def ok_bytes(data: Any = None) -> bytes:
+        """同 Resp.ok(data), 直接序列化为 json bytes, 跳过 pydantic 校验"""
+        return json_util.dumps({"code": 0, "message": "", "data": data})
@@ -3,9 +3,11 @@ from enum import Enum
 from typing import Generic, Optional, TypeAlias, TypeVar
 
 from objprint import add_objprint  # type: ignore
-from pydantic import BaseModel, computed_field
+from pydantic import BaseModel, computed_field, field_validator
 
 from app.errors import biz_error
+from app.utils.cls_util import get_cls_from_path
+from app.utils.str_util import parse_symbols
 
 # -------------------------------------------- models for our watching api
 
@@ -13,6 +15,14 @@ from app.errors import biz_error
 BasicPrice: TypeAlias = tuple[str, str, Decimal, Decimal, int]
 
 
+def index_by_symbol(prices: list[BasicPrice]) -> dict[str, BasicPrice]:
+    """symbol -> price, symbol 重复时以第一条为准"""
+    index: dict[str, BasicPrice] = {}
+    for ele in prices:
+        index.setdefault(ele[0], ele)
+    return index
+
+
 class SymbolRow(BaseModel):
     symbol: str
 
@@ -46,13 +56,35 @@ class SymbolRow(BaseModel):
 
     # ---------------- 合约 -----------------
 
-    # 资金费率 ,最近更新的资金费率
+    # 资金费率 ,最近更新的资金费率 (%), 取合约盘口 (b 优先)
     lastFundingRate: Decimal | None = None
-    # 指数差价
+    # 指数差价 (%), (标记价格 - 指数价格) / 标记价格
     zscj: Decimal | None = None
 
+    # 盘口 a/b 各自的资金费率和指数差价, 现货盘口为空
+    lastFundingRateA: Decimal | None = None
+    zscjA: Decimal | None = None
+    lastFundingRateB: Decimal | None = None
+    zscjB: Decimal | None = None
+
     # ---------------- 合约 -----------------
 
+    # 盘口 a/b 行情快照的年龄 (距离从交易所拉取的时间), ms
+    ageA: int | None = None
+    ageB: int | None = None
+
+    # ---------------- 统计, 见 spread_stats -----------------
+
+    # diffAb 的 EWMA 均值 / 标准差 (%)
+    diffAbMean: Decimal | None = None
+    diffAbStd: Decimal | None = None
+    # 当前 diffAb 偏离均值的标准差倍数, 样本不足时为空
+    diffAbZ: Decimal | None = None
+    # diffAb 的 5% / 50% / 95% 分位数 (%)
+    diffAbP05: Decimal | None = None
+    diffAbP50: Decimal | None = None
+    diffAbP95: Decimal | None = None
+
 
 class SymbolRowReq(BaseModel):
     """A row in the table for watching"""
@@ -66,6 +98,8 @@ class SymbolRowReq(BaseModel):
     bookA: Optional[str] = None
     # 盘口 B, ',' supported
     bookB: Optional[str] = None
+    # 排序: spread (默认, 推荐方向的差价降序) / zscore (|diffAbZ| 降序, 没有 z-score 的排在最后)
+    sortBy: Optional[str] = None
 
 
 class TradeDirection(Enum):
@@ -85,10 +119,15 @@ class BookOptions(BaseModel):
 # ----------------------------------------------------------------- bybit models
 
 class BybitTicker(BaseModel):
-    ask1Price: Decimal
-    bid1Price: Decimal
+    # 没有挂单时为 "", 不能让一行导致整个列表解析失败
+    ask1Price: Decimal | None
+    bid1Price: Decimal | None
     symbol: str
-    
+
+    @field_validator("ask1Price", "bid1Price", mode="before")
+    @classmethod
+    def _empty_as_none(cls, v):
+        return v or None
 
 class BybitResult(BaseModel):
     category: str
@@ -148,7 +187,24 @@ class MarkPrice(BaseModel):
 
 
 
-# ----------------------------------------------------------  todo
+def fill_funding(row: SymbolRow, a: "ExchangeMarket", b: "ExchangeMarket"):
+    """填充合约盘口的资金费率和指数差价"""
+    # avoid circular import
+    from app.market.funding_store import funding_store
+
+    if a.market == "swap":
+        funding = funding_store.get(a.exchange, row.symbol)
+        if funding:
+            row.lastFundingRateA, row.zscjA = funding
+            row.lastFundingRate, row.zscj = funding
+    if b.market == "swap":
+        funding = funding_store.get(b.exchange, row.symbol)
+        if funding:
+            row.lastFundingRateB, row.zscjB = funding
+            row.lastFundingRate, row.zscj = funding
+
+
+# ----------------------------------------------------------  盘口 / 映射
 
 
 @add_objprint
@@ -167,16 +223,20 @@ class ExchangeMarket:
         self.market = m
 
         exchanges: list = datasource.get("exchanges")  # type: ignore
-        handler_cls = next(
+        handler_path = next(
             (ele.get("handler") for ele in exchanges if ele.get("id") == self.exchange),
             None,
         )
-        if not handler_cls:
+        if not handler_path:
             raise biz_error.of(
                 f"can't resolve handler, exchange: {self.exchange}, market: {self.market}"
             )
 
-        self.handler_cls = handler_cls
+        self.handler_cls = get_cls_from_path(handler_path)
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return (self.exchange, self.market)
 
     def __eq__(self, other):
         if not isinstance(other, ExchangeMarket):
@@ -184,23 +244,58 @@ class ExchangeMarket:
 
         return other.exchange == self.exchange and other.market == self.market
 
-    def get_mark_price(self, params: SymbolRowReq) -> list[MarkPrice]:
+    def __hash__(self):
+        return hash(self.key)
+
+    async def get_mark_price(self, params: SymbolRowReq) -> list[MarkPrice]:
         """only for swap market"""
 
         if self.market != "swap":
             return []
-        return self.handler_cls(params).get_mark_price()
+        return await self.handler_cls(params).get_mark_price()
         # get_mark_price_caller = methodcaller("get_mark_price")
         # return get_mark_price_caller(self.handler_cls())
 
-    def get_basic_price(self, params: SymbolRowReq):
+    async def get_snapshot(self, params: SymbolRowReq):
+        """从进程内共享缓存中取行情快照, 过期才会去交易所拉取
+
+        指定了 symbols 时, 若全市场快照仍然有效则直接复用全市场快照
+        """
+        # avoid circular import
+        from app.config import market_ws_snapshot_ttl_ms
+        from app.market.market_data import get_live_book
+        from app.market.quote_cache import quote_cache
+
+        # ws 行情可用时, 读内存表很廉价, 快照只需要很短的有效期
+        ttl_ms = None
+        if get_live_book(self.exchange, self.market):
+            ttl_ms = market_ws_snapshot_ttl_ms
+
+        full_key = (self.exchange, self.market, None)
+        symbols = parse_symbols(params.symbols)
+        if not symbols:
+            return await quote_cache.get(
+                full_key, lambda: self.get_basic_price(params), ttl_ms
+            )
+
+        snapshot = quote_cache.peek(full_key, ttl_ms)
+        if snapshot is not None:
+            return snapshot
+
+        key = (self.exchange, self.market, tuple(sorted(symbols)))
+        return await quote_cache.get(
+            key, lambda: self.get_basic_price(params), ttl_ms
+        )
+
+    async def get_basic_price(self, params: SymbolRowReq):
         handler = self.handler_cls(params)
         method = getattr(handler, f"get_{self.market}", None)
         if not method:
             raise biz_error.of(
                 f"can't resolve handler method, exchange: {self.exchange}, market: {self.market}"
             )
-        prices: list[BasicPrice] = method()
+        # list[BasicPrice] 或 QuoteTable (ws 行情)
+        prices = await method()
         return prices
 
 
@@ -209,24 +304,42 @@ class WatchMapping:
         self.a = a
         self.b = b
 
-    def get_watch_res(self, params: SymbolRowReq):
-        res = []
+    async def get_watch_res(
+        self, params: SymbolRowReq, snapshots: dict | None = None
+    ):
+        """
+        snapshots: ExchangeMarket.key -> QuoteSnapshot, 由调用方统一拉取;
+            不传则各自从缓存中获取
+        """
+        # avoid circular import
+        from app.market.spread_book import spread_books
+        from app.market.spread_engine import spread_fields
+
+        if snapshots is None:
+            snapshots = {}
+        snapshot_a = snapshots.get(self.a.key) or await self.a.get_snapshot(params)
+        snapshot_b = snapshots.get(self.b.key) or await self.b.get_snapshot(params)
+        age_a = snapshot_a.age_ms()
+        age_b = snapshot_b.age_ms()
 
-        source_a = self.a.get_basic_price(params)
-        source_b = self.b.get_basic_price(params)
+        # 每个映射维护一份增量更新的差价排名, 只有买一卖一变化的 symbol 会重新计算
+        book = spread_books.get((snapshot_a.key, snapshot_b.key))
+        book.update(snapshot_a, snapshot_b)
 
         # if no symbols specified in the params
         # then take all symbols from the spot data
-        symbols = params.symbols if params.symbols else [ele[0] for ele in source_a]
-
-        for sy in symbols:
-            a = next((x for x in source_a if x[0] == sy), None)
-            b = next((x for x in source_b if x[0] == sy), None)
-            if not a or not b:
-                continue
-
-            (a_symbol, a_em, a_bid, a_ask, a_ts) = a
-            (b_symbol, b_em, b_bid, b_ask, b_ts) = b
+        symbols = parse_symbols(params.symbols)
+
+        # 若传递direction，则根据direction过滤; 只为前 n 条创建 SymbolRow
+        resolved_top_n: list[SymbolRow] = []
+        for entry in book.top_n(
+            params.topN,
+            params.direction,
+            set(symbols) if symbols else None,
+            params.sortBy,
+        ):
+            (a_symbol, a_em, a_bid, a_ask, a_ts) = entry.a
+            (b_symbol, b_em, b_bid, b_ask, b_ts) = entry.b
 
             ts = a_ts if a_ts else b_ts
             # 盘差: ( 卖 - 买 )/ 卖
@@ -242,47 +355,37 @@ class WatchMapping:
             #     )
             #     * 100
             # )
-            row = SymbolRow(
-                symbol=sy,
-                bookA=a_em,
-                bidPriceA=a_bid,
-                askPriceA=a_ask,
-                bookB=b_em,
-                bidPriceB=b_bid,
-                askPriceB=b_ask,
-                timestamp=ts,
+            resolved_top_n.append(
+                SymbolRow(
+                    symbol=a_symbol,
+                    bookA=a_em,
+                    bidPriceA=a_bid,
+                    askPriceA=a_ask,
+                    bookB=b_em,
+                    bidPriceB=b_bid,
+                    askPriceB=b_ask,
+                    timestamp=ts,
+                    ageA=age_a,
+                    ageB=age_b,
+                    **spread_fields(entry.spread),
+                    **entry.stats,
+                )
             )
 
-            self.calc_direction(row)
-
-            # 若传递direction，则根据direction过滤
-            if params.direction and params.direction.strip():
-                if row.direction and row.direction.upper() == params.direction.upper():
-                    res.append(row)
-            else:
-                res.append(row)
-
-        resolved_top_n = self.get_top_n(res, params.topN)
-
-        # mark_prices_a = self.a.get_mark_price(params)
-        # mark_prices_b = self.b.get_mark_price(params)
-
-        # todo
-        #
-        # for row in resolved_top_n:
-        #     price = next((x for x in prices if x.symbol == row.symbol), None)
-        #     if price:
-        #         # 资金费率
-        #         row.lastFundingRate = self._adjust_precision(
-        #             price.lastFundingRate * 100
-        #         )
-        #         row.zscj = self._adjust_precision(
-        #             ((price.markPrice - price.indexPrice) / price.markPrice) * 100
-        #         )
+        # 资金费率由后台定时刷新, 这里只读内存
+        if self.a.market == "swap" or self.b.market == "swap":
+            for row in resolved_top_n:
+                fill_funding(row, self.a, self.b)
 
         return resolved_top_n
 
+    # ------------------------------------------------------ 参考实现
+    # 逐行 Decimal 计算 / 全量排序, 请求路径已由 SpreadBook (spread_engine) 取代, 不再调用;
+    # 保留作为结果的基准: spread_engine_test 校验 SpreadColumns 与 calc_direction 完全一致,
+    # tools/bench_watch.py 以其为性能对照. 修改计算规则时两边需同步
+
     def get_top_n(self, rows: list[SymbolRow], top_n: int) -> list[SymbolRow]:
+        """参考实现, 见上"""
         # 排序
         def sort_attr(x: SymbolRow):
             if x.direction == TradeDirection.A_B.name:
@@ -299,6 +402,7 @@ class WatchMapping:
         return res_sorted
 
     def calc_direction(self, row: SymbolRow):
+        """参考实现, 见上"""
         # calc the direction
         # a -> b, b买一 - a卖一
         row.diffAb = ((row.bidPriceB - row.askPriceA) / row.bidPriceB) * 100
@@ -1,22 +1,37 @@
+import asyncio
+import json
 from decimal import Decimal
+from typing import Awaitable, Callable
 
-from binance.spot import Spot  # type: ignore
-from binance.um_futures import UMFutures  # type: ignore
-
+from app.clients.http_transport import HttpStatusError, http_transport
+from app.config import binance_spot_base_url, binance_um_base_url
+from app.market.quote_table import QuoteTable
 from app.models.watch_models import BasicPrice, MarkPrice, SymbolRowReq
-from app.routers.handlers.watch_handler_interface import IWatchHandler
+from app.routers.handlers.watch_handler_interface import (
+    FetchMode,
+    IWatchHandler,
+    choose_fetch_mode,
+)
+
+# 请求权重, https://developers.binance.com/docs/zh-CN/binance-spot-api-docs/rest-api/market-data-endpoints
+# 现货 bookTicker: 单个 2, 多个 (symbols 参数) 4, 全部 4
+SPOT_BOOK_TICKER_WEIGHT = (2, 4, 4)
+# https://developers.binance.com/docs/zh-CN/derivatives/usds-margined-futures/market-data/rest-api
+# 合约 bookTicker: 单个 2, 全部 5, 不支持多个
+UM_BOOK_TICKER_WEIGHT = (2, 5)
+# 合约 premiumIndex: 单个 1, 全部 10
+UM_MARK_PRICE_WEIGHT = (1, 10)
 
 
 class BinanceWatchHandler(IWatchHandler):
+    exchange = "binance"
+
     def __init__(self, params: SymbolRowReq):
         super().__init__(params.topN, params.direction, params.symbols)
-        self.spot_client = Spot(base_url="https://api.binance.com")
-        self.um_futures_client = UMFutures()
 
-
-    def get_spot(
+    async def get_spot(
         self,
-    ) -> list[BasicPrice]:
+    ) -> list[BasicPrice] | QuoteTable:
         """Spot market, 最优挂单 (买一卖一)
 
         Args:
@@ -26,8 +41,50 @@ class BinanceWatchHandler(IWatchHandler):
         Returns:
             symbol 买一价，卖一价
         """
-        tickers: list[dict] = self.spot_client.book_ticker(symbols=self.symbols)
-        # logging.info(spot_client.book_ticker(symbols=["BTCUSDT", "BNBUSDT"]))
+        # avoid circular import
+        from app.market.market_data import get_live_book
+
+        # ws 行情可用时直接读内存表
+        live = get_live_book("binance", "spot")
+        if live:
+            table = live.table(self.symbols)
+            if table is not None:
+                return table
+
+        single_weight, multi_weight, all_weight = SPOT_BOOK_TICKER_WEIGHT
+        mode = choose_fetch_mode(self.symbols, single_weight, all_weight, multi_weight)
+
+        venue_symbols = self.venue_symbols("spot")
+
+        async def fetch_all():
+            return await self._spot("/api/v3/ticker/bookTicker", weight=all_weight)
+
+        tickers: list[dict] = []
+        if mode == FetchMode.ALL:
+            tickers = self._filter(await fetch_all(), venue_symbols)
+        elif mode == FetchMode.MULTI:
+            tickers = await self._or_all(
+                self._spot(
+                    "/api/v3/ticker/bookTicker",
+                    {"symbols": json.dumps(venue_symbols, separators=(",", ":"))},
+                    multi_weight,
+                ),
+                fetch_all,
+                venue_symbols,
+            )
+        else:
+            tickers = await self._or_all(
+                asyncio.gather(
+                    *(
+                        self._spot(
+                            "/api/v3/ticker/bookTicker", {"symbol": sy}, single_weight
+                        )
+                        for sy in venue_symbols or []
+                    )
+                ),
+                fetch_all,
+                venue_symbols,
+            )
 
         if tickers is None:
             raise Exception("spot - 获取市场最优挂单失败")
@@ -42,7 +99,7 @@ class BinanceWatchHandler(IWatchHandler):
                 if float(bid_price) > 0 and float(ask_price) > 0:
                     res.append(
                         (
-                            symbol,
+                            self.canonical("spot", symbol),
                             "币安-现货",
                             Decimal(bid_price).normalize(),
                             Decimal(ask_price).normalize(),
@@ -52,7 +109,7 @@ class BinanceWatchHandler(IWatchHandler):
 
         return res
 
-    def get_swap(self) -> list[BasicPrice]:
+    async def get_swap(self) -> list[BasicPrice] | QuoteTable:
         """期货市场最优挂单 (买一卖一)
 
         Args:
@@ -61,16 +118,41 @@ class BinanceWatchHandler(IWatchHandler):
         Returns:
             symbol, 买一价，卖一价
         """
+        # avoid circular import
+        from app.market.market_data import get_live_book
+
+        live = get_live_book("binance", "swap")
+        if live:
+            table = live.table(self.symbols)
+            if table is not None:
+                return table
+
+        # 合约不支持一次请求多个 symbol, symbol 较多时拉全市场再过滤, 只需一次往返
+        venue_symbols = self.venue_symbols("swap")
+        single_weight, all_weight = UM_BOOK_TICKER_WEIGHT
+
+        async def fetch_all():
+            return await self._um("/fapi/v1/ticker/bookTicker", weight=all_weight)
 
         tickers = []
-        if self.symbols is None:
-            tickers = self.um_futures_client.book_ticker()
+        if choose_fetch_mode(self.symbols, single_weight, all_weight) == FetchMode.SINGLE:
+            tickers = await self._or_all(
+                asyncio.gather(
+                    *(
+                        self._um(
+                            "/fapi/v1/ticker/bookTicker", {"symbol": sy}, single_weight
+                        )
+                        for sy in venue_symbols or []
+                    )
+                ),
+                fetch_all,
+                venue_symbols,
+            )
         else:
-            for sy in self.symbols:
-                ticker = self.um_futures_client.book_ticker(symbol=sy)
-                tickers.append(ticker)
+            tickers = self._filter(await fetch_all(), venue_symbols)
 
-        if not tickers:
+        # 过滤后为空 (symbols 在合约市场都不存在) 不是错误
+        if tickers is None:
             raise Exception("swap - 获取市场最优挂单失败")
 
         res: list[BasicPrice] = []
@@ -84,7 +166,7 @@ class BinanceWatchHandler(IWatchHandler):
                 if float(bid_price) > 0 and float(ask_price) > 0:
                     res.append(
                         (
-                            symbol,
+                            self.canonical("swap", symbol),
                             "币安-永续合约",
                             Decimal(bid_price).normalize(),
                             Decimal(ask_price).normalize(),
@@ -94,16 +176,72 @@ class BinanceWatchHandler(IWatchHandler):
 
         return res
 
-    def get_mark_price(self):
-        symbols = self.symbols
-        prices = []
-        if not symbols:
-            for ele in self.um_futures_client.mark_price():
-                parsed = MarkPrice.model_validate(ele)
-                prices.append(parsed)
+    async def get_mark_price(self):
+        symbols = self.venue_symbols("swap")
+        single_weight, all_weight = UM_MARK_PRICE_WEIGHT
+
+        async def fetch_all():
+            return await self._um("/fapi/v1/premiumIndex", weight=all_weight)
+
+        if choose_fetch_mode(symbols, single_weight, all_weight) == FetchMode.SINGLE:
+            items = await self._or_all(
+                asyncio.gather(
+                    *(
+                        self._um("/fapi/v1/premiumIndex", {"symbol": sy}, single_weight)
+                        for sy in symbols or []
+                    )
+                ),
+                fetch_all,
+                symbols,
+            )
         else:
-            for sy in symbols:
-                price = MarkPrice.model_validate(self.um_futures_client.mark_price(sy))
-                prices.append(price)
+            items = self._filter(await fetch_all(), symbols)
+
+        prices = []
+        for ele in items:
+            # 交割合约没有资金费率
+            if not ele.get("lastFundingRate"):
+                continue
+            prices.append(MarkPrice.model_validate(ele))
+
+        for price in prices:
+            price.symbol = self.canonical("swap", price.symbol)
 
         return prices
+
+    async def _spot(self, path: str, params: dict | None = None, weight: int = 1):
+        return await http_transport.aget_json(
+            binance_spot_base_url, path, params, weight
+        )
+
+    async def _um(self, path: str, params: dict | None = None, weight: int = 1):
+        return await http_transport.aget_json(binance_um_base_url, path, params, weight)
+
+    async def _or_all(
+        self,
+        fetch: Awaitable,
+        fetch_all: Callable[[], Awaitable],
+        venue_symbols: list[str] | None,
+    ):
+        """按 symbol 请求 (单个或多个), 任意一个 symbol 不存在 (-1121, eg. 已下架) 整个请求都失败,
+        此时改为拉全市场再过滤
+        """
+        try:
+            return await fetch
+        except HttpStatusError as e:
+            if not _is_invalid_symbol(e):
+                raise
+            return self._filter(await fetch_all(), venue_symbols)
+
+    def _filter(self, items: list[dict], venue_symbols: list[str] | None) -> list[dict]:
+        """全市场的结果只保留指定的 symbols"""
+        if not venue_symbols or not items:
+            return items
+
+        symbols = set(venue_symbols)
+        return [ele for ele in items if ele.get("symbol") in symbols]
+
+
+def _is_invalid_symbol(e: HttpStatusError) -> bool:
+    """币安 -1121 Invalid symbol"""
+    return e.status_code == 400 and '"code":-1121' in e.text.replace(" ", "")
@@ -1,6 +1,6 @@
-from binance.spot import Spot  # type: ignore
-from binance.um_futures import UMFutures  # type: ignore
+import asyncio
 
+from app.models.watch_models import SymbolRowReq
 from app.routers.handlers.binance import (
     BinanceWatchHandler,
 )
@@ -8,5 +8,66 @@ from app.routers.handlers.binance import (
 
 # pytest -sk "test_WatchHandler_fill_mark_price"
 def test_WatchHandler_fill_mark_price():
-    handler = BinanceWatchHandler()(Spot(base_url="https://api.binance.com"), UMFutures())
-    handler.handle_mark_price(["BTCUSDT"])
\ No newline at end of file
+    handler = BinanceWatchHandler(SymbolRowReq(symbols="BTCUSDT"))
+    prices = asyncio.run(handler.get_mark_price())
+    assert [ele.symbol for ele in prices] == ["BTCUSDT"]
+
+
+def test_spot_multi_falls_back_on_invalid_symbol(monkeypatch):
+    from app.clients.http_transport import HttpStatusError
+    from app.routers.handlers import binance
+
+    calls = []
+
+    async def fake_get_json(base_url, path, params=None, weight=1):
+        calls.append(params)
+        if params and "symbols" in params:
+            raise HttpStatusError(400, path, '{"code":-1121,"msg":"Invalid symbol."}')
+        return [
+            {"symbol": sy, "bidPrice": "1", "askPrice": "1.1"}
+            for sy in ("BTCUSDT", "ETHUSDT", "BNBUSDT", "XRPUSDT")
+        ]
+
+    monkeypatch.setattr(binance.http_transport, "aget_json", fake_get_json)
+    handler = BinanceWatchHandler(
+        SymbolRowReq(symbols="BTCUSDT,ETHUSDT,BNBUSDT,GONEUSDT")
+    )
+    res = asyncio.run(handler.get_spot())
+    assert sorted(ele[0] for ele in res) == ["BNBUSDT", "BTCUSDT", "ETHUSDT"]
+    # 先按 symbols 请求, 失败后拉全市场
+    assert len(calls) == 2 and "symbols" in calls[0] and calls[1] is None
+
+
+
+def test_single_invalid_symbol_falls_back(monkeypatch):
+    from app.clients.http_transport import HttpStatusError
+    from app.routers.handlers import binance
+
+    calls = []
+
+    async def fake_get_json(base_url, path, params=None, weight=1):
+        calls.append(params)
+        if params and "symbol" in params:
+            raise HttpStatusError(400, path, '{"code":-1121,"msg":"Invalid symbol."}')
+        return [{"symbol": "BTCUSDT", "bidPrice": "1", "askPrice": "1.1", "time": 1}]
+
+    monkeypatch.setattr(binance.http_transport, "aget_json", fake_get_json)
+    # 单个 symbol 走逐个请求
+    handler = BinanceWatchHandler(SymbolRowReq(symbols="GONEUSDT"))
+
+    assert asyncio.run(handler.get_spot()) == []
+    assert calls == [{"symbol": "GONEUSDT"}, None]
+
+    calls.clear()
+    assert asyncio.run(handler.get_swap()) == []
+    assert calls == [{"symbol": "GONEUSDT"}, None]
+
+def test_swap_empty_subset(monkeypatch):
+    from app.routers.handlers import binance
+
+    async def fake_get_json(base_url, path, params=None, weight=1):
+        return [{"symbol": "BTCUSDT", "bidPrice": "1", "askPrice": "1.1", "time": 1}]
+
+    monkeypatch.setattr(binance.http_transport, "aget_json", fake_get_json)
+    handler = BinanceWatchHandler(SymbolRowReq(symbols="AUSDT,BUSDT,CUSDT"))
+    assert asyncio.run(handler.get_swap()) == []
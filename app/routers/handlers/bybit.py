@@ -1,7 +1,9 @@
+import asyncio
 from decimal import Decimal
 
-from pybit.unified_trading import HTTP  # type: ignore
-
+from app.clients.http_transport import http_transport
+from app.config import bybit_base_url
+from app.market.quote_table import QuoteTable
 from app.models.watch_models import (
     BasicPrice,
     BybitRespWrapper,
@@ -9,11 +11,20 @@ from app.models.watch_models import (
     MarkPrice,
     SymbolRowReq,
 )
-from app.routers.handlers.watch_handler_interface import IWatchHandler
-from app.utils.log_util import Lg
+from app.routers.handlers.watch_handler_interface import (
+    FetchMode,
+    IWatchHandler,
+    choose_fetch_mode,
+)
+
+
+# 限速按 ip 统计, 单个 symbol 和全市场的 get_tickers 都算一次请求
+TICKER_WEIGHT = (1, 1)
 
 
 class BybitWatchHandler(IWatchHandler):
+    exchange = "bybit"
+
     def __init__(self, params: SymbolRowReq | None = None):
         super().__init__(
             top_n=params.topN if params else None,
@@ -21,18 +32,36 @@ class BybitWatchHandler(IWatchHandler):
             symbols=params.symbols if params else None,
         )
 
-        self.session = HTTP()
+    async def _get_prices(self, cate: str) -> list[BasicPrice] | QuoteTable:
+        # avoid circular import
+        from app.market.market_data import get_live_book
+
+        market = "spot" if cate == "spot" else "swap"
+        # ws 行情可用时直接读内存表, 每个 symbol 都带有自己的推送时间
+        live = get_live_book("bybit", market)
+        if live:
+            table = live.table(self.symbols)
+            if table is not None:
+                return table
 
-    def _get_prices(self, cate: str) -> list[BasicPrice]:
         res: list[BasicPrice] = []
 
+        venue_symbols = self.venue_symbols(market)
         tickers: list[BybitTicker] = []
         ts = 0
-        if self.symbols:
-            for sy in self.symbols:
-                res_wrapper = BybitRespWrapper.model_validate(
-                    self.session.get_tickers(category=cate, symbol=sy)
+        if choose_fetch_mode(self.symbols, *TICKER_WEIGHT) == FetchMode.SINGLE:
+            items = await asyncio.gather(
+                *(
+                    http_transport.aget_json(
+                        bybit_base_url,
+                        "/v5/market/tickers",
+                        {"category": cate, "symbol": sy},
+                    )
+                    for sy in venue_symbols or []
                 )
+            )
+            for ele in items:
+                res_wrapper = BybitRespWrapper.model_validate(ele)
 
                 if not ts:
                     ts = res_wrapper.time
@@ -42,7 +71,9 @@ class BybitWatchHandler(IWatchHandler):
                     tickers.append(one)
         else:
             wrapper = BybitRespWrapper.model_validate(
-                self.session.get_tickers(category=cate)
+                await http_transport.aget_json(
+                    bybit_base_url, "/v5/market/tickers", {"category": cate}
+                )
             )
             if not ts:
                 ts = wrapper.time
@@ -50,37 +81,59 @@ class BybitWatchHandler(IWatchHandler):
             if wrapper and wrapper.result and wrapper.result.list:
                 tickers = wrapper.result.list
 
-        for ele in tickers:
-            market = "现货" if cate == "spot" else "永续"
-
-            bid = None
-            ask = None
-            try:
-                bid = Decimal(ele.bid1Price)
-                ask = Decimal(ele.ask1Price)
-            except Exception as e:
-                Lg.error(
-                    f"bybit best price invalid, bid1Pricd: {ele.bid1Price}, ask2Price: {ele.ask1Price}, symbol: {ele.symbol}. ex: {e}"
-                )
+            # 拉的是全市场, 按 symbols 过滤, 只需一次往返
+            if venue_symbols:
+                symbols = set(venue_symbols)
+                tickers = [ele for ele in tickers if ele.symbol in symbols]
 
-            if bid and ask:
+        label = "Bybit-现货" if cate == "spot" else "Bybit-永续"
+        for ele in tickers:
+            # 没有挂单的一侧为 None
+            if ele.bid1Price and ele.ask1Price:
                 res.append(
                     (
-                        ele.symbol,
-                        f"Bybit-{market}",
-                        Decimal(ele.bid1Price),
-                        Decimal(ele.ask1Price),
+                        self.canonical(market, ele.symbol),
+                        label,
+                        ele.bid1Price,
+                        ele.ask1Price,
                         ts,
                     )
                 )
 
         return res
 
-    def get_spot(self) -> list[BasicPrice]:
-        return self._get_prices("spot")
+    async def get_spot(self) -> list[BasicPrice] | QuoteTable:
+        return await self._get_prices("spot")
 
-    def get_swap(self) -> list[BasicPrice]:
-        return self._get_prices("linear")
+    async def get_swap(self) -> list[BasicPrice] | QuoteTable:
+        return await self._get_prices("linear")
+
+    async def get_mark_price(self) -> list[MarkPrice]:
+        """永续合约的 tickers 自带标记价格, 指数价格, 资金费率"""
+        data = await http_transport.aget_json(
+            bybit_base_url, "/v5/market/tickers", {"category": "linear"}
+        )
 
-    def get_mark_price(self) -> list[MarkPrice]:
-        return []
+        wanted = set(self.symbols) if self.symbols else None
+        res: list[MarkPrice] = []
+        for ele in data["result"]["list"]:
+            # 未上线 / 交割合约没有资金费率
+            if not (
+                ele.get("markPrice") and ele.get("indexPrice") and ele.get("fundingRate")
+            ):
+                continue
+
+            symbol = self.canonical("swap", ele["symbol"])
+            if wanted is not None and symbol not in wanted:
+                continue
+            res.append(
+                MarkPrice(
+                    symbol=symbol,
+                    markPrice=Decimal(ele["markPrice"]),
+                    indexPrice=Decimal(ele["indexPrice"]),
+                    lastFundingRate=Decimal(ele["fundingRate"]),
+                    time=data["time"],
+                )
+            )
+
+        return res
@@ -1,3 +1,5 @@
+import asyncio
+
 
 
 from objprint import op
@@ -7,5 +9,5 @@ from app.routers.handlers.bybit import BybitWatchHandler
 
 def test_bybit():
     handler = BybitWatchHandler()
-    res = handler._get_prices("spot")
+    res = asyncio.run(handler._get_prices("spot"))
     op(res)
\ No newline at end of file
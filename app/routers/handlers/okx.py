@@ -1,7 +1,10 @@
+import asyncio
 from decimal import Decimal
 
-from okx.MarketData import MarketAPI  # type: ignore
-
+from app.clients.http_transport import http_transport
+from app.config import okx_base_url
+from app.market.instruments import instruments
+from app.market.quote_table import QuoteTable
 from app.models.watch_models import (
     BasicPrice,
     MarkPrice,
@@ -9,53 +12,121 @@ from app.models.watch_models import (
     SymbolRowReq,
     Ticker,
 )
-from app.routers.handlers.watch_handler_interface import IWatchHandler
+from app.routers.handlers.watch_handler_interface import (
+    FetchMode,
+    IWatchHandler,
+    choose_fetch_mode,
+)
+
+# 限速: get_ticker / get_tickers 均为 20次/2s, 按权重 1 计
+TICKER_WEIGHT = (1, 1)
+
+# 统一 symbol 中常见的计价币种, 用于还原产品 id
+QUOTE_CCYS = ("USDT", "USDC", "USD", "BTC", "ETH", "EUR")
+# 永续合约的保证金币种, 拉取对应的指数价格
+INDEX_QUOTE_CCYS = ("USDT", "USDC", "USD")
+
+
+def okx_symbol(inst_id: str, inst_type: str) -> tuple[str, str]:
+    """产品 id 转换为统一的 symbol, 优先使用产品表, 未加载时按 id 的格式转换
+
+    Returns:
+        (symbol, market)
+    """
+    canonical = instruments.canonical(
+        "okx", "swap" if inst_type == "SWAP" else "spot", inst_id
+    )
+    if canonical:
+        return canonical, "欧易-永续合约" if inst_type == "SWAP" else "欧易-现货"
+
+    symbol = inst_id
+    market = ""
+
+    # spot : "ZIL-USDT-SWAP"
+    # swap: "ZIL-USDT"
+    if inst_type == "SWAP":
+        symbol = symbol.rsplit("-", 1)[0]
+        market = "永续合约"
+    elif inst_type == "SPOT":
+        market = "现货"
+    symbol = symbol.replace("-", "", 1)
+
+    return symbol, f"欧易-{market}"
+
+
+def okx_inst_id(symbol: str, inst_type: str) -> str | None:
+    """okx_symbol 的逆运算, 'BTCUSDT' -> 'BTC-USDT' / 'BTC-USDT-SWAP', 无法识别返回 None"""
+    inst_id = instruments.inst_id(
+        "okx", "swap" if inst_type == "SWAP" else "spot", symbol
+    )
+    if inst_id:
+        return inst_id
+
+    for ccy in QUOTE_CCYS:
+        if symbol.endswith(ccy) and len(symbol) > len(ccy):
+            inst_id = f"{symbol[: -len(ccy)]}-{ccy}"
+            return f"{inst_id}-SWAP" if inst_type == "SWAP" else inst_id
+    return None
 
 
 class OkxWatchHandler(IWatchHandler):
+    exchange = "okx"
+
     def __init__(self, params: SymbolRowReq):
         super().__init__(
             params.topN if params else None,
             params.direction if params else None,
             params.symbols if params else None,
         )
-        self.market_api = MarketAPI()
 
-    def _get_prices(self, instType: str) -> list[BasicPrice]:
+    async def _get_prices(self, instType: str) -> list[BasicPrice] | QuoteTable:
+        # avoid circular import
+        from app.market.market_data import get_live_book
+
+        # ws 行情可用时直接读内存表
+        live = get_live_book("okx", "spot" if instType == "SPOT" else "swap")
+        if live:
+            table = live.table(self.symbols)
+            if table is not None:
+                return table
+
         res: list[BasicPrice] = []
 
         tickers: list[Ticker] = []
-        if self.symbols:
-            for sy in self.symbols:
-                # todo
-                wrap = RespWrapper[Ticker].model_validate(
-                    self.market_api.get_ticker(sy + "-" + instType)
+        inst_ids = [okx_inst_id(sy, instType) for sy in self.symbols or []]
+        mode = choose_fetch_mode(self.symbols, *TICKER_WEIGHT)
+        if mode == FetchMode.SINGLE and all(inst_ids):
+            items = await asyncio.gather(
+                *(
+                    http_transport.aget_json(
+                        okx_base_url, "/api/v5/market/ticker", {"instId": inst_id}
+                    )
+                    for inst_id in inst_ids
                 )
-                tickers.append(wrap.data[0])
+            )
+            for ele in items:
+                wrap = RespWrapper[Ticker].model_validate(ele)
+                tickers += wrap.data
         else:
+            # 拉全市场, 转换 symbol 后再按 symbols 过滤, 只需一次往返
             wrap = RespWrapper[Ticker].model_validate(
-                self.market_api.get_tickers(instType=instType)
+                await http_transport.aget_json(
+                    okx_base_url, "/api/v5/market/tickers", {"instType": instType}
+                )
             )
             tickers += wrap.data
 
+        wanted = set(self.symbols) if self.symbols else None
         for ele in tickers:
             if ele.bidPx and ele.askPx and ele.ts:
-                symbol: str = ele.symbol  # type: ignore
+                symbol, market = okx_symbol(ele.symbol, instType)  # type: ignore
 
-                market = ""
-
-                # spot : "ZIL-USDT-SWAP"
-                # swap: "ZIL-USDT"
-                if instType == "SWAP":
-                    symbol = symbol.rsplit("-", 1)[0]
-                    market = "永续合约"
-                elif instType == "SPOT":
-                    market = "现货"
-                symbol = symbol.replace("-", "", 1)
+                if wanted is not None and symbol not in wanted:
+                    continue
 
                 to_add = (
                     symbol,
-                    f"欧易-{market}",
+                    market,
                     Decimal(ele.bidPx),
                     Decimal(ele.askPx),
                     int(ele.ts),
@@ -64,11 +135,55 @@ class OkxWatchHandler(IWatchHandler):
 
         return res
 
-    def get_spot(self):
-        return self._get_prices("SPOT")
+    async def get_spot(self) -> list[BasicPrice] | QuoteTable:
+        return await self._get_prices("SPOT")
+
+    async def get_swap(self) -> list[BasicPrice] | QuoteTable:
+        return await self._get_prices("SWAP")
+
+    async def get_mark_price(self) -> list[MarkPrice]:
+        """永续合约的标记价格, 指数价格, 资金费率, 均使用全市场接口"""
+        marks, fundings, *indexes = await asyncio.gather(
+            http_transport.aget_json(
+                okx_base_url, "/api/v5/public/mark-price", {"instType": "SWAP"}
+            ),
+            http_transport.aget_json(
+                okx_base_url, "/api/v5/public/funding-rate", {"instId": "ANY"}
+            ),
+            *(
+                http_transport.aget_json(
+                    okx_base_url, "/api/v5/market/index-tickers", {"quoteCcy": ccy}
+                )
+                for ccy in INDEX_QUOTE_CCYS
+            ),
+        )
 
-    def get_swap(self) -> list[BasicPrice]:
-        return self._get_prices("SWAP")
+        rates = {ele["instId"]: ele.get("fundingRate") for ele in fundings["data"]}
+        # 指数 instId 与合约的 uly 相同, eg. BTC-USDT
+        index_prices = {
+            ele["instId"]: ele.get("idxPx") for res in indexes for ele in res["data"]
+        }
 
-    def get_mark_price(self) -> list[MarkPrice]:
-        return []
+        wanted = set(self.symbols) if self.symbols else None
+        res: list[MarkPrice] = []
+        for ele in marks["data"]:
+            inst_id = ele["instId"]
+            rate = rates.get(inst_id)
+            index_price = index_prices.get(inst_id.rsplit("-", 1)[0])
+            if not (ele.get("markPx") and rate and index_price):
+                continue
+
+            symbol, _ = okx_symbol(inst_id, "SWAP")
+            if wanted is not None and symbol not in wanted:
+                continue
+            res.append(
+                MarkPrice(
+                    symbol=symbol,
+                    markPrice=Decimal(ele["markPx"]),
+                    indexPrice=Decimal(index_price),
+                    lastFundingRate=Decimal(rate),
+                    time=int(ele["ts"]),
+                )
+            )
+
+        return res
@@ -1,3 +1,5 @@
+import asyncio
+
 
 from objprint import op
 
@@ -7,5 +9,5 @@ from app.routers.handlers.okx import OkxWatchHandler
 def test_okx():
     
     handler = OkxWatchHandler(None)
-    prices = handler.get_spot()
+    prices = asyncio.run(handler.get_spot())
     op(prices)
@@ -1,50 +1,113 @@
 import abc
+import asyncio
 from decimal import ROUND_HALF_UP, Decimal
-
-from app.models.watch_models import BasicPrice, MarkPrice, SymbolRow, TradeDirection
+from enum import Enum
+
+from app.market.funding_store import funding_store
+from app.market.instruments import instruments
+from app.market.quote_table import QuoteTable
+from app.models.watch_models import (
+    BasicPrice,
+    MarkPrice,
+    SymbolRow,
+    TradeDirection,
+    index_by_symbol,
+)
+from app.utils.str_util import parse_symbols
+
+
+class FetchMode(Enum):
+    """指定了 symbols 时, 拉取行情的方式"""
+
+    # 全市场接口 + 本地过滤
+    ALL = "all"
+    # 一次请求带多个 symbol
+    MULTI = "multi"
+    # 逐个 symbol 请求
+    SINGLE = "single"
+
+
+def choose_fetch_mode(
+    symbols: list[str] | None,
+    single_weight: int,
+    all_weight: int,
+    multi_weight: int | None = None,
+    max_single_calls: int = 3,
+) -> FetchMode:
+    """根据 symbol 数量和各接口的请求权重选择拉取方式
+
+    Args:
+        single_weight: 单个 symbol 请求的权重
+        all_weight: 全市场请求的权重
+        multi_weight: 多 symbol 请求的权重, 交易所不支持则为 None
+        max_single_calls: 逐个请求最多允许的次数, 超过则多出的往返延迟不划算
+    """
+    if not symbols:
+        return FetchMode.ALL
+
+    n = len(symbols)
+    # (权重, 往返次数, 返回数据量), 依次比较
+    candidates = [(all_weight, 1, 1, FetchMode.ALL)]
+    if multi_weight is not None:
+        candidates.append((multi_weight, 1, 0, FetchMode.MULTI))
+    if n <= max_single_calls:
+        candidates.append((n * single_weight, n, 0, FetchMode.SINGLE))
+
+    return min(candidates, key=lambda x: x[:3])[3]
 
 
 class IWatchHandler(abc.ABC):
+    # 交易所 id, 同 datasource
+    exchange = ""
+
     def __init__(self, top_n: int | None = None, direction: str | None = None, symbols: str | None = None):
         self.top_n = top_n
         self.direction = direction
+        self.symbols = parse_symbols(symbols)
+
+    def canonical(self, market: str, inst_id: str) -> str:
+        """交易所产品 id -> 统一 symbol, 产品表未加载时原样返回"""
+        return instruments.canonical(self.exchange, market, inst_id) or inst_id
 
-        sy = None
-        if symbols and symbols.strip():
-            sy = [s.strip().upper() for s in symbols.split(",")]
-            
-        self.symbols = sy
+    def venue_symbols(self, market: str) -> list[str] | None:
+        """请求参数中的统一 symbol -> 交易所产品 id"""
+        if not self.symbols:
+            return self.symbols
+        return [
+            instruments.inst_id(self.exchange, market, sy) or sy for sy in self.symbols
+        ]
 
     @abc.abstractmethod
-    def get_spot(self) -> list[BasicPrice]:
+    async def get_spot(self) -> list[BasicPrice] | QuoteTable:
         pass
 
     @abc.abstractmethod
-    def get_swap(self) -> list[BasicPrice]:
+    async def get_swap(self) -> list[BasicPrice] | QuoteTable:
         pass
 
     @abc.abstractmethod
-    def get_mark_price(self) -> list[MarkPrice]:
-        pass
+    async def get_mark_price(self) -> list[MarkPrice]:
+        """永续合约的标记价格, 指数价格, 资金费率, 由 funding_store 定时调用"""
 
-    def get_res(
+    async def get_res(
         self,
     ):
         res: list[SymbolRow] = []
 
-        source_a = self.get_spot()
-        source_b = self.get_swap()
+        spot, swap = await asyncio.gather(self.get_spot(), self.get_swap())
+        index_a = index_by_symbol(QuoteTable.of(spot).rows())
+        index_b = index_by_symbol(QuoteTable.of(swap).rows())
 
         # if no symbols specified in the params
         # then take all symbols from the spot data
-        symbols = self.symbols if self.symbols else [ele[0] for ele in source_a]
+        symbols = self.symbols if self.symbols else index_a.keys()
 
         for sy in symbols:
-            a = next((x for x in source_a if x[0] == sy), None)
-            b = next((x for x in source_b if x[0] == sy), None)
+            a = index_a.get(sy)
+            b = index_b.get(sy)
             if a and b:
-                (a_symbol, a_bid, a_ask, a_ts) = a
-                (b_symbol, b_bid, b_ask, b_ts) = b
+                (a_symbol, a_em, a_bid, a_ask, a_ts) = a
+                (b_symbol, b_em, b_bid, b_ask, b_ts) = b
 
                 ts = a_ts if a_ts else b_ts
                 # 盘差: ( 卖 - 买 )/ 卖
@@ -85,17 +148,12 @@ class IWatchHandler(abc.ABC):
 
         resolved_top_n = self.get_top_n(res)
 
-        prices = self.get_mark_price()
+        # 资金费率由后台定时刷新 (funding_store), 不在请求中拉取
         for row in resolved_top_n:
-            price = next((x for x in prices if x.symbol == row.symbol), None)
-            if price:
-                # 资金费率
-                row.lastFundingRate = self._adjust_precision(
-                    price.lastFundingRate * 100
-                )
-                row.zscj = self._adjust_precision(
-                    ((price.markPrice - price.indexPrice) / price.markPrice) * 100
-                )
+            funding = funding_store.get(self.exchange, row.symbol)
+            if funding:
+                row.lastFundingRate, row.zscj = funding
+                row.lastFundingRateB, row.zscjB = funding
 
         return resolved_top_n
 
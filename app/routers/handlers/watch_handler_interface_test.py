@@ -0,0 +1,39 @@
+from app.routers.handlers.binance import (
+    SPOT_BOOK_TICKER_WEIGHT,
+    UM_BOOK_TICKER_WEIGHT,
+    UM_MARK_PRICE_WEIGHT,
+)
+from app.routers.handlers.watch_handler_interface import FetchMode, choose_fetch_mode
+
+
+def symbols(n: int) -> list[str]:
+    return [f"S{i}USDT" for i in range(n)]
+
+
+def test_choose_fetch_mode_spot():
+    single, multi, all_ = SPOT_BOOK_TICKER_WEIGHT
+    mode = lambda syms: choose_fetch_mode(syms, single, all_, multi)
+
+    assert mode(None) == FetchMode.ALL
+    assert mode([]) == FetchMode.ALL
+    assert mode(symbols(1)) == FetchMode.SINGLE
+    # 权重相同时, 往返少的优先
+    assert mode(symbols(2)) == FetchMode.MULTI
+    assert mode(symbols(3)) == FetchMode.MULTI
+    assert mode(symbols(50)) == FetchMode.MULTI
+
+
+def test_choose_fetch_mode_swap():
+    single, all_ = UM_BOOK_TICKER_WEIGHT
+    mode = lambda syms: choose_fetch_mode(syms, single, all_)
+
+    assert mode(symbols(1)) == FetchMode.SINGLE
+    assert mode(symbols(2)) == FetchMode.SINGLE
+    # 3 * 2 > 5
+    assert mode(symbols(3)) == FetchMode.ALL
+
+    single, all_ = UM_MARK_PRICE_WEIGHT
+    mode = lambda syms: choose_fetch_mode(syms, single, all_)
+    assert mode(symbols(3)) == FetchMode.SINGLE
+    # 超过 max_single_calls
+    assert mode(symbols(4)) == FetchMode.ALL
@@ -1,17 +1,36 @@
-from fastapi import APIRouter, Depends
+import asyncio
 
-from app.config import datasource
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.clients.rate_limiter import rate_limits
+from app.config import (
+    datasource,
+    history_candle_max_points,
+    http_etag_age_bucket_ms,
+    watch_stream_interval_ms,
+    watch_stream_min_interval_ms,
+)
+from app.market.funding_store import funding_store
+from app.market.spread_candles import choose_resolution, decode_candles, read_candles
+from app.market.spread_history import decode_rows, now_ms, scan
+from app.market.spread_stream import spread_stream_hub
+from app.errors import biz_error
 from app.models.http_model import Resp
 from app.models.watch_models import (
     BookOptions,
     ExchangeMarket,
+    SymbolRow,
     SymbolRowReq,
     WatchMapping,
 )
+from app.utils.http_cache import conditional_response, make_etag
+from app.utils import json_util
+from app.utils.json_util import model_values
+from app.utils.str_util import parse_symbols
 
 router = APIRouter(prefix="/api/watch", tags=["watch"])
 
-
 def resolve_exchange_markets(book: str) -> list[ExchangeMarket]:
     """
     'binance-spot,binance-future' -> ExchangeMarket
@@ -58,22 +77,245 @@ def resolve_ab_mappings(book_a: str | None, book_b: str | None) -> list[WatchMap
     return res
 
 
-@router.get("/book-tickers")
-def watch(params: SymbolRowReq = Depends()):
-    res = []
-    
-    mappings = resolve_ab_mappings(params.bookA, params.bookB)
+def resolve_fetch_plan(mappings: list[WatchMapping]) -> list[ExchangeMarket]:
+    """所有映射涉及到的盘口, 去重, 保持出现顺序"""
+    res: dict[ExchangeMarket, None] = {}
+    for ele in mappings:
+        res.setdefault(ele.a)
+        res.setdefault(ele.b)
+
+    return list(res)
+
+
+async def fetch_snapshots(plan: list[ExchangeMarket], params: SymbolRowReq) -> dict:
+    """每个盘口只拉取一次, 不同盘口并发拉取
+
+    Returns:
+        ExchangeMarket.key -> QuoteSnapshot
+    """
+    snapshots = await asyncio.gather(*(ele.get_snapshot(params) for ele in plan))
+    return {ele.key: snapshot for ele, snapshot in zip(plan, snapshots)}
+
+
+async def compute_watch_rows(
+    params: SymbolRowReq,
+    mappings: list[WatchMapping] | None = None,
+    snapshots: dict | None = None,
+) -> list[SymbolRow]:
+    """mappings / snapshots: 调用方已经解析 / 拉取过时传入"""
+    res: list[SymbolRow] = []
+
+    if mappings is None:
+        mappings = resolve_ab_mappings(params.bookA, params.bookB)
+    if snapshots is None:
+        snapshots = await fetch_snapshots(resolve_fetch_plan(mappings), params)
 
     for ele in mappings:
-        rows = ele.get_watch_res(params)
+        rows = await ele.get_watch_res(params, snapshots)
         res += rows
 
+    return res
+
+
+ROW_LAYOUTS = ("rows", "columns")
+
+
+def watch_etag(
+    params: SymbolRowReq, layout: str, mappings: list[WatchMapping], snapshots: dict
+) -> str:
+    """由规范化的查询参数和各盘口快照的数据版本生成, 不需要先计算结果
+
+    响应中带有快照的年龄 (ageA/ageB), 年龄按 http_etag_age_bucket_ms 取整后也计入 ETag,
+    数据没有变化时, 缓存的响应体 (和 304) 最多沿用一个粒度, 之后重新生成
+    """
+    now = now_ms()
+    swap_exchanges = sorted(
+        {m.exchange for ele in mappings for m in (ele.a, ele.b) if m.market == "swap"}
+    )
+    return make_etag(
+        "book-tickers",
+        [(ele.a.key, ele.b.key) for ele in mappings],
+        sorted(set(parse_symbols(params.symbols) or [])),
+        (params.direction or "").strip().upper(),
+        params.topN,
+        (params.sortBy or "").strip().lower(),
+        layout,
+        sorted(
+            (key, ele.data_version, ele.age_ms(now) // http_etag_age_bucket_ms)
+            for key, ele in snapshots.items()
+        ),
+        [(e, funding_store.version(e)) for e in swap_exchanges],
+    )
+
+
+def dump_rows(rows: list[SymbolRow], layout: str = "rows") -> bytes:
+    """
+    layout:
+        rows: 每行一个对象, 与 Resp.ok(rows) 的输出逐字节一致
+        columns: 每个字段一个数组, {"symbol": [...], "bookA": [...], ...}
+    """
+    if layout == "rows":
+        return Resp.ok_bytes([model_values(row) for row in rows])
+    if layout == "columns":
+        values = [model_values(row) for row in rows]
+        return Resp.ok_bytes(
+            {field: [ele[field] for ele in values] for field in SymbolRow.model_fields}
+        )
+    raise biz_error.of(f"unsupported layout: {layout}")
+
+
+@router.get("/book-tickers")
+async def watch(
+    request: Request, params: SymbolRowReq = Depends(), layout: str = "rows"
+):
+    """layout: rows (默认) / columns, 见 dump_rows
+
+    带 ETag, 行情没有变化时 If-None-Match 直接返回 304, 不再计算差价.
+    304 的判断在拉取快照 (fetch_snapshots, 通常命中快照缓存或 ws 行情表) 之后:
+    ETag 需要快照的数据版本, 拉取本身不访问交易所时代价很小
+    """
+    if layout not in ROW_LAYOUTS:
+        raise biz_error.of(f"unsupported layout: {layout}")
 
-    return Resp.ok(res)
+    mappings = resolve_ab_mappings(params.bookA, params.bookB)
+    snapshots = await fetch_snapshots(resolve_fetch_plan(mappings), params)
+
+    async def render() -> bytes:
+        rows = await compute_watch_rows(params, mappings, snapshots)
+        return dump_rows(rows, layout)
+
+    etag = watch_etag(params, layout, mappings, snapshots)
+    return await conditional_response(request, etag, render)
+
+
+@router.get("/book-tickers/stream")
+async def watch_stream(
+    params: SymbolRowReq = Depends(), interval: int = watch_stream_interval_ms
+):
+    """SSE 推送, 参数同 /book-tickers
+
+    首条消息为全量 (full=true), 之后只推送有变化的行:
+    {"full": false, "upsert": [SymbolRow], "remove": [row key], "order": [row key] | null}
+    row key: "{bookA}|{bookB}|{symbol}", order 为排序有变化时的最新顺序
+
+    interval: 推送间隔 ms, 不能小于服务端配置的下限
+    """
+    # 参数有误时直接返回错误, 而不是建立连接
+    resolve_ab_mappings(params.bookA, params.bookB)
+
+    interval = max(interval, watch_stream_min_interval_ms)
+    stream, sub = spread_stream_hub.subscribe(params, interval, compute_watch_rows)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    msg = await asyncio.wait_for(sub.queue.get(), timeout=15)
+                    yield f"data: {msg}\n\n"
+                except asyncio.TimeoutError:
+                    # 心跳, 避免被代理断开
+                    yield ": ping\n\n"
+        finally:
+            stream.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def history_pair(book_a: str, book_b: str, symbol: str) -> str:
+    """差价历史中的 "映射 symbol", 盘口无效时报错"""
+    a, b = ExchangeMarket(book_a), ExchangeMarket(book_b)
+    return f"{a.exchange}-{a.market}/{b.exchange}-{b.market} {symbol.strip().upper()}"
+
+
+@router.get("/history/ticks")
+def history_ticks(
+    bookA: str,
+    bookB: str,
+    symbol: str,
+    start: int | None = None,
+    end: int | None = None,
+):
+    """差价历史, 只有采集进程记录了的全市场映射才有数据 (见 history_mappings)
+
+    bookA / bookB: 单个盘口, 如 binance-spot / binance-swap
+    start / end: ms, [start, end), 默认最近一小时
+    返回 Resp, data 为 [{"timestamp", "diffAb", "diffBa", "direction", "qccj"}], 按时间升序;
+    逐块读取分段文件并流式输出, 不在内存中拼接整个结果
+    """
+    pair = history_pair(bookA, bookB, symbol)
+    end = end or now_ms()
+    start = start if start is not None else end - 3600_000
+    if start >= end:
+        raise biz_error.of("start must be less than end")
+
+
+    def body():
+        yield b'{"code":0,"message":"","data":['
+        first = True
+        for chunk in scan(pair, start, end):
+            rows = json_util.dumps(decode_rows(chunk))[1:-1]
+            if rows:
+                yield rows if first else b"," + rows
+                first = False
+        yield b"]}"
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+@router.get("/history/candles")
+def history_candles(
+    bookA: str,
+    bookB: str,
+    symbol: str,
+    start: int | None = None,
+    end: int | None = None,
+    points: int = 1000,
+):
+    """diffAb 的 K 线, 参数同 /history/ticks
+
+    points: 最多的点数, 按时间范围选择不超过该点数的最细级别 (1s / 1m / 5m / 1h)
+    返回 Resp, data 为 {"resolution": "1m", "candles": [{"timestamp", "open", "high", "low", "close"}]}
+    """
+    pair = history_pair(bookA, bookB, symbol)
+    now = now_ms()
+    end = end or now
+    start = start if start is not None else end - 86400_000
+    if start >= end:
+        raise biz_error.of("start must be less than end")
+    if points <= 0 or points > history_candle_max_points:
+        raise biz_error.of(f"points must be in (0, {history_candle_max_points}]")
+
+    resolution = choose_resolution(start, end, points)
+    candles = read_candles(pair, resolution, start, end, now)
+    return Response(
+        Resp.ok_bytes(
+            {"resolution": resolution, "candles": decode_candles(candles)[-points:]}
+        ),
+        media_type="application/json",
+    )
+
+
+@router.get("/rate-limits")
+def rate_limit_status():
+    """各交易所 rest 请求的剩余额度"""
+    return Resp.ok(rate_limits.status())
 
 
 @router.get("/book-options")
-def gen_book_options():
+async def book_options(request: Request):
+    """盘口可选项, 由配置生成, 进程内不变"""
+
+    async def render() -> bytes:
+        return Resp.ok_bytes(gen_book_options())
+
+    return await conditional_response(request, make_etag("book-options"), render)
+
+
+def gen_book_options() -> list[BookOptions]:
     """生成盘口可选项"""
     res = []
 
@@ -85,4 +327,4 @@ def gen_book_options():
             label = f"{ex.get('label')}-{ma.get('label')}"
             res.append(BookOptions(id=id, label=label))
 
-    return Resp.ok(res)
+    return res
@@ -3,3 +3,56 @@ from app.routers.watch import resolve_ab_mappings
 
 def test_resolve_ab_mappings():
     resolve_ab_mappings()
+
+
+def test_watch_mapping_join(monkeypatch):
+    import asyncio
+    from decimal import Decimal
+
+    from app.market.quote_cache import quote_cache
+    from app.models.watch_models import ExchangeMarket, SymbolRowReq
+
+    async def fake_prices(self, params):
+        if self.market == "spot":
+            return [
+                ("BTCUSDT", "币安-现货", Decimal("100"), Decimal("101"), 1),
+                ("ETHUSDT", "币安-现货", Decimal("10"), Decimal("10.1"), 1),
+                ("DOGEUSDT", "币安-现货", Decimal("1"), Decimal("1.01"), 1),
+            ]
+        return [
+            ("ETHUSDT", "币安-永续合约", Decimal("10.3"), Decimal("10.4"), 2),
+            ("BTCUSDT", "币安-永续合约", Decimal("102"), Decimal("103"), 2),
+        ]
+
+    monkeypatch.setattr(ExchangeMarket, "get_basic_price", fake_prices)
+    quote_cache.clear()
+
+    (mapping,) = resolve_ab_mappings("binance-spot", "binance-swap")
+    rows = asyncio.run(mapping.get_watch_res(SymbolRowReq()))
+    assert [r.symbol for r in rows] == ["ETHUSDT", "BTCUSDT"]
+    assert rows[0].diffAb == Decimal("1.9417")
+
+    rows = asyncio.run(
+        mapping.get_watch_res(SymbolRowReq(symbols="btcusdt, dogeusdt"))
+    )
+    assert [r.symbol for r in rows] == ["BTCUSDT"]
+    quote_cache.clear()
+
+
+def test_watch_etag_changes_with_age_bucket(monkeypatch):
+    from types import SimpleNamespace
+
+    from app.models.watch_models import SymbolRowReq
+    from app.routers import watch
+
+    now = [10_000]
+    monkeypatch.setattr(watch, "now_ms", lambda: now[0])
+    snap = SimpleNamespace(data_version=3, age_ms=lambda t: t - 9_500)
+    etag = lambda: watch.watch_etag(SymbolRowReq(), "rows", [], {"k": snap})
+
+    first = etag()
+    now[0] += 300
+    assert etag() == first
+    # 年龄跨过一个粒度, 缓存的 ageA/ageB 不再沿用
+    now[0] += 300
+    assert etag() != first
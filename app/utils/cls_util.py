@@ -1,7 +1,15 @@
+import functools
 import importlib
 from typing import Type
 
 
+@functools.cache
+def get_cls_from_path(class_path: str) -> Type:
+    """'a.b.C' -> C, Nested class not supported"""
+    module_path, class_name = class_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_path), class_name)
+
+
 def create_instance_from_cls_path(class_path: str, *args, **kwargs):
     """Nested class not supported"""
     try:
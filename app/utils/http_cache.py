@@ -0,0 +1,140 @@
+"""条件请求 (ETag / If-None-Match) 和响应压缩
+
+- ETag 由调用方给出的版本号 (行情快照版本, 规范化后的查询参数等) 计算, 不需要先生成响应体;
+  If-None-Match 命中时直接返回 304
+- 同一个 ETag 的响应体只生成一次并缓存, 之后的请求返回完全相同的字节 (强 ETag)
+- 响应体较大且客户端支持时压缩, 优先 br (需安装 brotli), 其次 gzip;
+  不同的压缩方式是不同的表示, ETag 加上后缀区分
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.config import (
+    http_body_cache_entries,
+    http_compress_min_bytes,
+    http_gzip_level,
+)
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+# 版本号只在进程内有意义, 混入进程标识, 避免不同 worker 的相同版本号产生相同的 ETag
+_PROCESS_NONCE = f"{os.getpid()}-{os.urandom(8).hex()}"
+
+
+def make_etag(*parts: Any) -> str:
+    raw = repr((_PROCESS_NONCE, parts)).encode()
+    return f'"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """If-None-Match 中是否包含 etag (弱比较)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for ele in header.split(","):
+        ele = ele.strip()
+        if ele == "*" or ele.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def choose_encoding(request: Request) -> str | None:
+    accepted = {
+        ele.split(";")[0].strip().lower()
+        for ele in request.headers.get("accept-encoding", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str | None) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=4)  # type: ignore
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=http_gzip_level, mtime=0)
+    return body
+
+
+class BodyCache:
+    """(etag, 压缩方式) -> 响应体, LRU"""
+
+    def __init__(self, max_entries: int = http_body_cache_entries):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str | None], bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple[str, str | None]) -> bytes | None:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: tuple[str, str | None], body: bytes):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+body_cache = BodyCache()
+
+
+async def conditional_response(
+    request: Request,
+    etag: str,
+    render: Callable[[], Awaitable[bytes]],
+    media_type: str = "application/json",
+) -> Response:
+    """
+    etag: make_etag 的结果, 相同的 etag 必须对应相同的内容
+    render: 生成未压缩的响应体, 只在缓存中没有时调用
+    """
+    encoding = choose_encoding(request)
+
+    # 压缩后的表示使用不同的 etag
+    raw_body = body_cache.get((etag, None))
+    if raw_body is not None and len(raw_body) < http_compress_min_bytes:
+        encoding = None
+    variant = f'{etag[:-1]}-{encoding}"' if encoding else etag
+    headers = {"ETag": variant, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+    # 客户端持有的可能是未压缩的表示 (响应体较小时不压缩)
+    for ele in (variant, etag):
+        if if_none_match(request, ele):
+            headers["ETag"] = ele
+            return Response(status_code=304, headers=headers)
+
+    body = body_cache.get((etag, encoding))
+    if body is None:
+        if raw_body is None:
+            raw_body = await render()
+            body_cache.put((etag, None), raw_body)
+
+        if encoding and len(raw_body) >= http_compress_min_bytes:
+            body = compress(raw_body, encoding)
+            body_cache.put((etag, encoding), body)
+        else:
+            # 太小不压缩, 使用原始表示的 etag
+            encoding = None
+            body = raw_body
+            headers["ETag"] = etag
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
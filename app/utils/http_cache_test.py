@@ -0,0 +1,48 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.http_cache import conditional_response, make_etag
+
+
+def test_conditional_response():
+    app = FastAPI()
+    renders = []
+
+    @app.get("/data")
+    async def data(request: Request, version: int, size: int = 10):
+        async def render() -> bytes:
+            renders.append(version)
+            return b"x" * size
+
+        etag = make_etag("data", size, version)
+        return await conditional_response(request, etag, render)
+
+    client = TestClient(app)
+
+    res = client.get("/data?version=1", headers={"Accept-Encoding": "identity"})
+    etag = res.headers["etag"]
+    assert res.status_code == 200 and res.content == b"x" * 10
+
+    # 版本没变, 直接 304, 不再生成响应体
+    res = client.get("/data?version=1", headers={"If-None-Match": etag})
+    assert res.status_code == 304 and res.headers["etag"] == etag
+    assert renders == [1]
+
+    res = client.get("/data?version=2", headers={"If-None-Match": etag})
+    assert res.status_code == 200 and res.headers["etag"] != etag
+
+    # 较大的响应体压缩, 压缩后的表示使用不同的 etag
+    res = client.get(
+        "/data?version=1&size=4096",
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert res.headers["content-encoding"] == "gzip"
+    assert res.content == b"x" * 4096
+    gz_etag = res.headers["etag"]
+    assert gz_etag.endswith('-gzip"')
+
+    res = client.get(
+        "/data?version=1&size=4096",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": gz_etag},
+    )
+    assert res.status_code == 304
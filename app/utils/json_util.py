@@ -0,0 +1,42 @@
+"""响应体的 json 序列化
+
+直接把 dict / list 写成 bytes, 不经过 pydantic 的校验和 jsonable_encoder.
+安装了 orjson 时使用 orjson, 否则回退到标准库 json, 两者输出的字节完全一致
+(紧凑格式, 非 ascii 字符不转义, Decimal 输出为字符串, 与 pydantic 的 json 模式相同)
+"""
+
+import json
+from decimal import Decimal
+from typing import Any
+
+from pydantic import BaseModel
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(
+        obj,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def model_values(model: BaseModel) -> dict[str, Any]:
+    """模型的字段 -> 值, 按字段定义的顺序, 不复制也不转换"""
+    return model.__dict__
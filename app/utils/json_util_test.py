@@ -0,0 +1,45 @@
+import json
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.models.http_model import Resp
+from app.models.watch_models import SymbolRow
+from app.routers.watch import dump_rows
+
+
+def gen_rows() -> list[SymbolRow]:
+    row = SymbolRow(
+        symbol="BTCUSDT",
+        bookA="币安-现货",
+        bidPriceA=Decimal("65000.10"),
+        askPriceA=Decimal("1E+2"),
+        bookB="欧易-永续合约",
+        bidPriceB=Decimal("0.00000012"),
+        askPriceB=Decimal("-0"),
+        diffAb=Decimal("1.234E-7"),
+        timestamp=1,
+        ageA=3,
+    )
+    row.lastFundingRate = Decimal("0.01")
+    return [row, SymbolRow.model_validate(row.model_dump() | {"symbol": "ETHUSDT"})]
+
+
+def test_dump_rows_same_as_resp():
+    rows = gen_rows()
+    # 原来的输出: Resp -> jsonable_encoder -> JSONResponse
+    expected = JSONResponse(jsonable_encoder(Resp.ok(rows))).body
+
+    assert dump_rows(rows) == expected
+    assert dump_rows([]) == JSONResponse(jsonable_encoder(Resp.ok([]))).body
+
+
+def test_dump_rows_columns():
+    rows = gen_rows()
+    data = json.loads(dump_rows(rows, "columns"))["data"]
+
+    assert list(data) == list(SymbolRow.model_fields)
+    assert data["symbol"] == ["BTCUSDT", "ETHUSDT"]
+    assert data["askPriceA"] == ["1E+2", "1E+2"]
+    assert data["diffBa"] == [None, None]
@@ -9,4 +9,11 @@
 #         res = Decimal(target)
 #     except Exception as ex:
 #         Lg.error(f"to_decimal error: {ex}")
-        
\ No newline at end of file
+
+
+def parse_symbols(symbols: str | None) -> list[str] | None:
+    """'btcusdt, ethusdt' -> ['BTCUSDT', 'ETHUSDT'], 空串返回 None"""
+    if not symbols or not symbols.strip():
+        return None
+
+    return [s.strip().upper() for s in symbols.split(",") if s.strip()]
@@ -1,3 +1,8 @@
 uv sync
-gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8387 app:fast_app
 
+# 采集进程独占交易所行情, 发布到共享内存; worker 只读共享内存
+MARKET_ROLE=collector python -m app.market.collector &
+COLLECTOR_PID=$!
+trap 'kill $COLLECTOR_PID' EXIT
+
+MARKET_ROLE=reader gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8387 app:fast_app
@@ -0,0 +1,292 @@
+"""/book-tickers 计算路径的基准测试
+
+使用合成的行情 (不访问交易所), 对 100 / 1k / 10k 个 symbol 和 1 ~ 9 个映射分别测量:
+
+    resolve       resolve_ab_mappings
+    watch_cold    get_watch_res, 全新的差价表 (首次请求)
+    watch_steady  get_watch_res, 每轮 1% 的 symbol 价格变化 (常态)
+    watch_same    get_watch_res, 价格没有变化
+    calc_direction  WatchMapping.calc_direction 逐行计算 (旧实现, 对照)
+    spread_columns  SpreadColumns 整列计算
+    get_top_n       WatchMapping.get_top_n 对全部行排序 (旧实现, 对照)
+    book_top_n      SpreadBook.top_n
+    resp_legacy     Resp.ok -> jsonable_encoder -> JSONResponse
+    resp_bytes      dump_rows
+
+每项先预热, 关闭 gc 后重复测量, 输出中位数 / 最小值 (ms) 和单次执行的内存分配 (tracemalloc, KiB).
+随机数种子固定, 同一台机器上不同提交的结果可以直接比较:
+
+    python tools/bench_watch.py --json bench_base.json
+    python tools/bench_watch.py --compare bench_base.json | tee bench_output.txt
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from app.market.quote_cache import quote_cache  # noqa: E402
+from app.market.spread_book import spread_books  # noqa: E402
+from app.market.spread_engine import SpreadColumns  # noqa: E402
+from app.models.http_model import Resp  # noqa: E402
+from app.models.watch_models import (  # noqa: E402
+    ExchangeMarket,
+    SymbolRow,
+    SymbolRowReq,
+)
+from app.routers.watch import (  # noqa: E402
+    compute_watch_rows,
+    dump_rows,
+    resolve_ab_mappings,
+)
+
+SPOT_BOOKS = ["binance-spot", "okx-spot", "bybit-spot"]
+SWAP_BOOKS = ["binance-swap", "okx-swap", "bybit-swap"]
+LABELS = {
+    "binance": "币安",
+    "okx": "欧易",
+    "bybit": "Bybit",
+    "spot": "现货",
+    "swap": "永续合约",
+}
+
+
+class Fixture:
+    """各盘口的合成行情, b 盘口缺少约 10% 的 symbol"""
+
+    def __init__(self, n_symbols: int, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.symbols = [f"B{i}USDT" for i in range(n_symbols)]
+        # 每个 symbol 的基准价, 小数位数不同
+        self.base = {
+            sy: Decimal(self.rng.randint(1, 10**6)).scaleb(-self.rng.randint(0, 6))
+            for sy in self.symbols
+        }
+        self.prices: dict[tuple[str, str], dict[str, tuple]] = {}
+        for book in SPOT_BOOKS + SWAP_BOOKS:
+            e, m = book.split("-")
+            self.prices[(e, m)] = {
+                sy: self._quote(sy)
+                for sy in self.symbols
+                if m == "spot" or self.rng.random() > 0.1
+            }
+
+    def _quote(self, symbol: str) -> tuple[Decimal, Decimal]:
+        base = self.base[symbol]
+        tick = Decimal(1).scaleb(base.as_tuple().exponent - 1)  # type: ignore
+        bid = base + tick * self.rng.randint(-50, 50)
+        return bid, bid + tick * self.rng.randint(1, 5)
+
+    def tick(self, ratio: float = 0.01):
+        """每个盘口随机 ratio 的 symbol 价格变化"""
+        for prices in self.prices.values():
+            for sy in self.rng.sample(list(prices), max(1, int(len(prices) * ratio))):
+                prices[sy] = self._quote(sy)
+
+    def basic_prices(self, key: tuple[str, str]) -> list[tuple]:
+        e, m = key
+        label = f"{LABELS[e]}-{LABELS[m]}"
+        return [(sy, label, bid, ask, 1) for sy, (bid, ask) in self.prices[key].items()]
+
+
+def mapping_books(n: int) -> tuple[str, str]:
+    """n 个映射对应的 bookA / bookB, n = a 的个数 * b 的个数"""
+    for a in range(1, 4):
+        if n % a == 0 and n // a <= 3:
+            return ",".join(SPOT_BOOKS[:a]), ",".join(SWAP_BOOKS[: n // a])
+    raise ValueError(f"unsupported mapping count: {n}, must be a * b with a, b <= 3")
+
+
+def measure(fn: Callable, setup: Callable | None, repeat: int, warmup: int = 2):
+    """返回 (耗时 ms 列表, 分配的 KiB, 峰值 KiB)"""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            if setup:
+                setup()
+            t = time.perf_counter_ns()
+            fn()
+            times.append((time.perf_counter_ns() - t) / 1e6)
+    finally:
+        gc.enable()
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    res = fn()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del res
+    return times, (after - before) / 1024, (peak - before) / 1024
+
+
+def run_case(n_symbols: int, n_mappings: int, repeat: int, top_n: int) -> dict:
+    fixture = Fixture(n_symbols)
+
+    async def fake_prices(self, params):
+        return fixture.basic_prices(self.key)
+
+    ExchangeMarket.get_basic_price = fake_prices  # type: ignore
+    book_a, book_b = mapping_books(n_mappings)
+    params = SymbolRowReq(bookA=book_a, bookB=book_b, topN=top_n)
+    loop = asyncio.new_event_loop()
+
+    def watch():
+        return loop.run_until_complete(compute_watch_rows(params))
+
+    def cold():
+        quote_cache.clear()
+        spread_books.clear()
+
+    def steady():
+        fixture.tick()
+        quote_cache.clear()
+
+    # 全部 symbol 的 SymbolRow (旧实现的输入), 取第一个映射
+    mapping = resolve_ab_mappings(book_a, book_b)[0]
+    prices_a = fixture.prices[mapping.a.key]
+    prices_b = fixture.prices[mapping.b.key]
+    joined = [(sy, prices_a[sy], prices_b[sy]) for sy in prices_a if sy in prices_b]
+
+    def full_rows() -> list[SymbolRow]:
+        return [
+            SymbolRow(
+                symbol=sy,
+                bookA="a",
+                bidPriceA=a[0],
+                askPriceA=a[1],
+                bookB="b",
+                bidPriceB=b[0],
+                askPriceB=b[1],
+                timestamp=1,
+            )
+            for sy, a, b in joined
+        ]
+
+    rows = full_rows()
+    for row in rows:
+        mapping.calc_direction(row)
+
+    cold()
+    watch()
+    book = next(iter(spread_books._books.values()))
+    top_rows = watch()
+
+    cases = {
+        "resolve": (lambda: resolve_ab_mappings(book_a, book_b), None),
+        "watch_cold": (watch, cold),
+        "watch_steady": (watch, steady),
+        "watch_same": (watch, quote_cache.clear),
+        "calc_direction": (lambda: [mapping.calc_direction(r) for r in rows], None),
+        "spread_columns": (
+            lambda: SpreadColumns(
+                [a[0] for _, a, _ in joined],
+                [a[1] for _, a, _ in joined],
+                [b[0] for _, _, b in joined],
+                [b[1] for _, _, b in joined],
+            ),
+            None,
+        ),
+        "get_top_n": (lambda: mapping.get_top_n(rows, top_n), None),
+        "book_top_n": (lambda: book.top_n(top_n), None),
+        "resp_legacy": (
+            lambda: JSONResponse(jsonable_encoder(Resp.ok(top_rows))).body,
+            None,
+        ),
+        "resp_bytes": (lambda: dump_rows(top_rows), None),
+    }
+
+    res = {}
+    for name, (fn, setup) in cases.items():
+        times, alloc, peak = measure(fn, setup, repeat)
+        res[name] = {
+            "median_ms": round(statistics.median(times), 3),
+            "min_ms": round(min(times), 3),
+            "alloc_kib": round(alloc, 1),
+            "peak_kib": round(peak, 1),
+        }
+
+    loop.close()
+    quote_cache.clear()
+    spread_books.clear()
+    return res
+
+
+def format_row(key: str, name: str, stat: dict, base: dict | None) -> str:
+    line = (
+        f"{key:<12} {name:<15} {stat['median_ms']:>10.3f} {stat['min_ms']:>10.3f}"
+        f" {stat['alloc_kib']:>11.1f} {stat['peak_kib']:>11.1f}"
+    )
+    if base:
+        old = base.get(key, {}).get(name)
+        if old and old["median_ms"] > 0:
+            delta = (stat["median_ms"] - old["median_ms"]) / old["median_ms"] * 100
+            line += f" {delta:>+8.1f}%"
+    return line
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--symbols", default="100,1000,10000")
+    parser.add_argument("--mappings", default="1,4,9")
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--top-n", type=int, default=200)
+    parser.add_argument("--json", help="结果写入该文件, 用于之后比较")
+    parser.add_argument("--compare", help="与之前 --json 的结果比较中位数")
+    args = parser.parse_args()
+
+    base = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)["results"]
+
+    header = f"{'case':<12} {'op':<15} {'median ms':>10} {'min ms':>10} {'alloc KiB':>11} {'peak KiB':>11}"
+    print(header + (" {:>9}".format("vs base") if base else ""))
+    print("-" * (len(header) + (10 if base else 0)))
+
+    results = {}
+    for n_symbols in [int(ele) for ele in args.symbols.split(",")]:
+        for n_mappings in [int(ele) for ele in args.mappings.split(",")]:
+            key = f"{n_symbols}x{n_mappings}"
+            results[key] = run_case(n_symbols, n_mappings, args.repeat, args.top_n)
+            for name, stat in results[key].items():
+                print(format_row(key, name, stat, base), flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "python": sys.version.split()[0],
+                    "repeat": args.repeat,
+                    "top_n": args.top_n,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,721 @@
+"""本地交易所模拟, 用于离线的压测和延迟测试
+
+在一个端口上模拟币安 (现货 / U 本位合约), 欧易, Bybit 的行情接口, 各盘口使用不同的路径前缀,
+这样各自的 base url 不同, 服务中按 base url 区分的限速器互不影响:
+
+    rest  http://{host}:{port}/binance-spot   /api/v3/ticker/bookTicker, /api/v3/exchangeInfo
+          http://{host}:{port}/binance-swap   /fapi/v1/ticker/bookTicker, /fapi/v1/premiumIndex, /fapi/v1/exchangeInfo
+          http://{host}:{port}/okx            /api/v5/market/tickers, /api/v5/market/ticker, /api/v5/market/index-tickers,
+                                              /api/v5/public/mark-price, /api/v5/public/funding-rate, /api/v5/public/instruments
+          http://{host}:{port}/bybit          /v5/market/tickers, /v5/market/instruments-info
+    ws    ws://{host}:{port}/binance-spot/stream, ws://{host}:{port}/binance-swap/stream  (bookTicker)
+          ws://{host}:{port}/okx/ws/v5/public                                              (tickers / bbo-tbt)
+          ws://{host}:{port}/bybit/v5/public/{spot,linear}                                 (orderbook.1 / tickers)
+    统计  http://{host}:{port}/sim/stats
+
+行情: 每个 symbol 有一个随机游走的中间价, 各盘口在其上有固定的偏移和随机的噪声, 因此盘口之间有差价.
+每 --tick-ms 随机 --move-ratio 比例的 symbol 价格变化, 变化的 symbol 通过 ws 推送.
+
+故障注入:
+    --latency-ms / --jitter-ms   rest 响应和 ws 推送的延迟
+    --error-rate / --errors      按比例返回错误, 可选 429 (带 Retry-After), -1021 (时间戳超出 recvWindow,
+                                 欧易 / Bybit 返回各自的时间戳错误), 500
+    --ws-disconnect-s            ws 连接存活该时长后由服务端断开, 用于测试重连
+
+    python tools/exchange_sim.py --symbols 2000 --tick-ms 100 --latency-ms 20 --error-rate 0.01
+    # 启动时输出服务所需的环境变量, 例如
+    eval "$(python tools/exchange_sim.py --print-env)"
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+
+VENUES = ("binance-spot", "binance-swap", "okx-spot", "okx-swap", "bybit-spot", "bybit-swap")
+QUOTE = "USDT"
+
+# 币安全市场接口的请求权重, 用于 X-MBX-USED-WEIGHT-1M
+BINANCE_WEIGHTS = {
+    "/api/v3/ticker/bookTicker": 4,
+    "/api/v3/exchangeInfo": 20,
+    "/fapi/v1/ticker/bookTicker": 5,
+    "/fapi/v1/premiumIndex": 10,
+    "/fapi/v1/exchangeInfo": 1,
+}
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class Market:
+    """所有盘口的行情"""
+
+    def __init__(self, n_symbols: int, move_ratio: float, seed: int):
+        self.rng = random.Random(seed)
+        self.move_ratio = move_ratio
+
+        named = ["BTC", "ETH", "SOL", "XRP", "DOGE", "BNB", "ADA", "TRX"]
+        self.bases = named[:n_symbols] + [f"SIM{i}" for i in range(n_symbols - len(named))]
+
+        self.mid: dict[str, float] = {}
+        self.decimals: dict[str, int] = {}
+        for base in self.bases:
+            mid = 10 ** self.rng.uniform(-3, 4.7)
+            self.mid[base] = mid
+            self.decimals[base] = max(0, 4 - math.floor(math.log10(mid)))
+
+        # 各盘口相对中间价的固定偏移
+        self.offsets = {
+            (venue, base): self.rng.gauss(0, 0.002) for venue in VENUES for base in self.bases
+        }
+        self.funding = {base: self.rng.gauss(0.0001, 0.0002) for base in self.bases}
+
+        # (盘口, base) -> (bid, ask, 更新时间)
+        self.quotes: dict[tuple[str, str], tuple[str, str, int]] = {}
+        self.update_id = itertools.count(1)
+        now = now_ms()
+        for venue in VENUES:
+            for base in self.bases:
+                self._requote(venue, base, now)
+
+    def step(self) -> list[str]:
+        """随机一部分 symbol 的价格变化, 返回变化的 base"""
+        n = max(1, int(len(self.bases) * self.move_ratio))
+        moved = self.rng.sample(self.bases, min(n, len(self.bases)))
+        now = now_ms()
+        for base in moved:
+            self.mid[base] *= math.exp(self.rng.gauss(0, 0.0005))
+            for venue in VENUES:
+                self._requote(venue, base, now)
+        return moved
+
+    def quote(self, venue: str, base: str) -> tuple[str, str, int]:
+        return self.quotes[(venue, base)]
+
+    def tick_size(self, base: str) -> str:
+        return f"{10 ** -self.decimals[base]:.{self.decimals[base]}f}"
+
+    def fmt(self, base: str, price: float) -> str:
+        return f"{price:.{self.decimals[base]}f}"
+
+    def mark_index(self, base: str) -> tuple[str, str]:
+        mid = self.mid[base]
+        return self.fmt(base, mid * (1 + self.rng.gauss(0, 0.0003))), self.fmt(base, mid)
+
+    def _requote(self, venue: str, base: str, now: int):
+        tick = 10 ** -self.decimals[base]
+        mid = self.mid[base] * (1 + self.offsets[(venue, base)] + self.rng.gauss(0, 0.0002))
+        bid = max(tick, round(mid / tick) * tick)
+        ask = bid + tick * self.rng.randint(1, 3)
+        self.quotes[(venue, base)] = (self.fmt(base, bid), self.fmt(base, ask), now)
+
+
+# ---------------------------------------------------------------- symbol 命名
+
+
+def binance_symbol(base: str) -> str:
+    return base + QUOTE
+
+
+def okx_inst_id(venue: str, base: str) -> str:
+    return f"{base}-{QUOTE}-SWAP" if venue == "okx-swap" else f"{base}-{QUOTE}"
+
+
+def base_of(symbol: str) -> str:
+    """BTCUSDT / BTC-USDT / BTC-USDT-SWAP -> BTC"""
+    symbol = symbol.upper()
+    if "-" in symbol:
+        return symbol.split("-")[0]
+    return symbol[: -len(QUOTE)] if symbol.endswith(QUOTE) else symbol
+
+
+class Faults:
+    def __init__(self, args: argparse.Namespace, seed: int):
+        self.rng = random.Random(seed)
+        self.latency_ms = args.latency_ms
+        self.jitter_ms = args.jitter_ms
+        self.error_rate = args.error_rate
+        self.errors = [ele.strip() for ele in args.errors.split(",") if ele.strip()]
+        self.ws_disconnect_s = args.ws_disconnect_s
+
+    def delay_s(self) -> float:
+        if not self.latency_ms and not self.jitter_ms:
+            return 0
+        return max(0.0, self.latency_ms + self.rng.uniform(-1, 1) * self.jitter_ms) / 1000
+
+    def pick_error(self) -> str | None:
+        if self.errors and self.error_rate and self.rng.random() < self.error_rate:
+            return self.rng.choice(self.errors)
+        return None
+
+
+def error_response(exchange: str, error: str) -> Response:
+    if error == "429":
+        body = {
+            "binance": {"code": -1003, "msg": "Too many requests."},
+            "okx": {"code": "50011", "msg": "Too Many Requests", "data": []},
+            "bybit": {"retCode": 10006, "retMsg": "Too many visits!", "result": {}},
+        }[exchange]
+        return JSONResponse(body, status_code=429, headers={"Retry-After": "1"})
+    if error == "-1021":
+        status, body = {
+            "binance": (
+                400,
+                {"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."},
+            ),
+            "okx": (400, {"code": "50102", "msg": "Timestamp request expired", "data": []}),
+            "bybit": (
+                200,
+                {"retCode": 10002, "retMsg": "invalid request, please check your server timestamp", "result": {}},
+            ),
+        }[exchange]
+        return JSONResponse(body, status_code=status)
+    return JSONResponse({"msg": "Internal error"}, status_code=500)
+
+
+class Subscriber:
+    """一个 ws 连接, 行情变化时由 tick 循环放入消息, 发送任务按延迟发送"""
+
+    def __init__(self, venue: str, render, faults: Faults):
+        self.venue = venue
+        # base -> 额外的订阅信息 (欧易的频道), 为 None 时订阅全部
+        self.bases: dict[str, str] | None = {}
+        self.render = render
+        self.faults = faults
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=50_000)
+        self.dropped = 0
+
+    def wants(self, base: str) -> bool:
+        return self.bases is None or base in self.bases
+
+    def push(self, base: str):
+        try:
+            self.queue.put_nowait((time.monotonic() + self.faults.delay_s(), base))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class Simulator:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.market = Market(args.symbols, args.move_ratio, args.seed)
+        self.faults = Faults(args, args.seed + 1)
+        self.subscribers: set[Subscriber] = set()
+
+        self.requests: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.ws_messages = 0
+        # 币安各盘口当前分钟的已用权重
+        self._weights: dict[str, tuple[int, int]] = {}
+
+    # ------------------------------------------------------------ 行情推送
+
+    async def run_ticks(self):
+        interval = self.args.tick_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            for base in self.market.step():
+                for sub in self.subscribers:
+                    if sub.wants(base):
+                        sub.push(base)
+
+    async def serve_ws(self, ws: WebSocket, sub: Subscriber, on_message):
+        """接收订阅 / 心跳消息, 同时发送推送, 任意一方结束时关闭连接"""
+        await ws.accept()
+        self.subscribers.add(sub)
+
+        async def receive():
+            while True:
+                reply = on_message(sub, await ws.receive_text())
+                for ele in reply or []:
+                    await ws.send_text(ele)
+
+        async def send():
+            while True:
+                due, base = await sub.queue.get()
+                wait = due - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await ws.send_text(sub.render(sub, base))
+                self.ws_messages += 1
+
+        tasks = [asyncio.create_task(receive()), asyncio.create_task(send())]
+        if self.faults.ws_disconnect_s:
+            tasks.append(asyncio.create_task(asyncio.sleep(self.faults.ws_disconnect_s)))
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.subscribers.discard(sub)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await ws.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------ rest
+
+    async def handle(self, request: Request, exchange: str, venue_key: str, build) -> Response:
+        path = request.url.path.split(venue_key, 1)[1]
+        self.requests[f"{venue_key}{path}"] += 1
+
+        delay = self.faults.delay_s()
+        if delay:
+            await asyncio.sleep(delay)
+
+        error = self.faults.pick_error()
+        if error:
+            self.errors[error] += 1
+            return error_response(exchange, error)
+
+        body = build(dict(request.query_params))
+        headers = {}
+        if exchange == "binance":
+            weight = 1 if "symbol" in request.query_params else BINANCE_WEIGHTS.get(path, 1)
+            headers["X-MBX-USED-WEIGHT-1M"] = str(self._use_weight(venue_key, weight))
+        return Response(json.dumps(body), media_type="application/json", headers=headers)
+
+    def _use_weight(self, venue: str, weight: int) -> int:
+        minute = int(time.time() // 60)
+        at, used = self._weights.get(venue, (minute, 0))
+        used = used + weight if at == minute else weight
+        self._weights[venue] = (minute, used)
+        return used
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self.market.bases),
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "ws_connections": len(self.subscribers),
+            "ws_messages": self.ws_messages,
+            "ws_dropped": sum(ele.dropped for ele in self.subscribers),
+        }
+
+
+# ---------------------------------------------------------------- 币安
+
+
+def binance_routes(app: FastAPI, sim: Simulator):
+    market = sim.market
+
+    def book_ticker(venue: str, base: str) -> dict:
+        bid, ask, ts = market.quote(venue, base)
+        res = {
+            "symbol": binance_symbol(base),
+            "bidPrice": bid,
+            "bidQty": "1.000",
+            "askPrice": ask,
+            "askQty": "1.000",
+        }
+        if venue == "binance-swap":
+            res["time"] = ts
+        return res
+
+    def select(params: dict) -> list[str] | None:
+        if "symbol" in params:
+            return [base_of(params["symbol"])]
+        if "symbols" in params:
+            return [base_of(ele) for ele in json.loads(params["symbols"])]
+        return None
+
+    def tickers(venue: str):
+        def build(params: dict):
+            bases = select(params)
+            rows = [book_ticker(venue, b) for b in (bases or market.bases) if b in market.mid]
+            return rows[0] if "symbol" in params and rows else rows
+
+        return build
+
+    def premium_index(params: dict):
+        rows = []
+        for base in select(params) or market.bases:
+            mark, index = market.mark_index(base)
+            rows.append(
+                {
+                    "symbol": binance_symbol(base),
+                    "markPrice": mark,
+                    "indexPrice": index,
+                    "estimatedSettlePrice": index,
+                    "lastFundingRate": f"{market.funding[base]:.8f}",
+                    "interestRate": "0.00010000",
+                    "nextFundingTime": (now_ms() // 28_800_000 + 1) * 28_800_000,
+                    "time": now_ms(),
+                }
+            )
+        return rows[0] if "symbol" in params else rows
+
+    def exchange_info(swap: bool):
+        def build(params: dict):
+            symbols = []
+            for base in market.bases:
+                ele = {
+                    "symbol": binance_symbol(base),
+                    "status": "TRADING",
+                    "baseAsset": base,
+                    "quoteAsset": QUOTE,
+                    "filters": [{"filterType": "PRICE_FILTER", "tickSize": market.tick_size(base)}],
+                }
+                if swap:
+                    ele["contractType"] = "PERPETUAL"
+                symbols.append(ele)
+            return {"timezone": "UTC", "serverTime": now_ms(), "symbols": symbols}
+
+        return build
+
+    routes = [
+        ("/binance-spot", "/api/v3/ticker/bookTicker", tickers("binance-spot")),
+        ("/binance-spot", "/api/v3/exchangeInfo", exchange_info(False)),
+        ("/binance-swap", "/fapi/v1/ticker/bookTicker", tickers("binance-swap")),
+        ("/binance-swap", "/fapi/v1/premiumIndex", premium_index),
+        ("/binance-swap", "/fapi/v1/exchangeInfo", exchange_info(True)),
+    ]
+    for prefix, path, build in routes:
+        add_rest(app, sim, "binance", prefix, path, build)
+
+    # ws: combined stream, {"method": "SUBSCRIBE", "params": ["btcusdt@bookTicker" | "!bookTicker"], "id": 1}
+    def render(sub: Subscriber, base: str) -> str:
+        data = book_ticker(sub.venue, base)
+        msg = {
+            "u": next(market.update_id),
+            "s": data["symbol"],
+            "b": data["bidPrice"],
+            "B": data["bidQty"],
+            "a": data["askPrice"],
+            "A": data["askQty"],
+        }
+        stream = f"{data['symbol'].lower()}@bookTicker"
+        if sub.venue == "binance-swap":
+            msg = {"e": "bookTicker", "E": now_ms(), "T": data["time"], **msg}
+            if sub.bases is None:
+                stream = "!bookTicker"
+        return json.dumps({"stream": stream, "data": msg})
+
+    def on_message(sub: Subscriber, raw: str):
+        msg = json.loads(raw)
+        if msg.get("method") == "SUBSCRIBE":
+            for ele in msg.get("params", []):
+                if ele == "!bookTicker":
+                    sub.bases = None
+                elif sub.bases is not None:
+                    sub.bases[base_of(ele.split("@")[0])] = ""
+        return [json.dumps({"result": None, "id": msg.get("id")})]
+
+    for venue in ("binance-spot", "binance-swap"):
+
+        @app.websocket(f"/{venue}/stream")
+        async def stream(ws: WebSocket, venue=venue):
+            await sim.serve_ws(ws, Subscriber(venue, render, sim.faults), on_message)
+
+
+# ---------------------------------------------------------------- 欧易
+
+
+def okx_routes(app: FastAPI, sim: Simulator):
+    market = sim.market
+
+    def venue_of(inst_type: str) -> str:
+        return "okx-swap" if inst_type.upper() == "SWAP" else "okx-spot"
+
+    def ticker(venue: str, base: str) -> dict:
+        bid, ask, ts = market.quote(venue, base)
+        return {
+            "instType": "SWAP" if venue == "okx-swap" else "SPOT",
+            "instId": okx_inst_id(venue, base),
+            "last": bid,
+            "askPx": ask,
+            "askSz": "1",
+            "bidPx": bid,
+            "bidSz": "1",
+            "ts": str(ts),
+        }
+
+    def wrap(data: list) -> dict:
+        return {"code": "0", "msg": "", "data": data}
+
+    def tickers(params: dict):
+        venue = venue_of(params.get("instType", "SPOT"))
+        return wrap([ticker(venue, base) for base in market.bases])
+
+    def single_ticker(params: dict):
+        inst_id = params.get("instId", "")
+        venue = "okx-swap" if inst_id.endswith("-SWAP") else "okx-spot"
+        base = base_of(inst_id)
+        return wrap([ticker(venue, base)] if base in market.mid else [])
+
+    def mark_price(params: dict):
+        rows = []
+        for base in market.bases:
+            mark, _ = market.mark_index(base)
+            rows.append(
+                {"instType": "SWAP", "instId": okx_inst_id("okx-swap", base), "markPx": mark, "ts": str(now_ms())}
+            )
+        return wrap(rows)
+
+    def funding_rate(params: dict):
+        return wrap(
+            [
+                {
+                    "instType": "SWAP",
+                    "instId": okx_inst_id("okx-swap", base),
+                    "fundingRate": f"{market.funding[base]:.8f}",
+                    "fundingTime": str((now_ms() // 28_800_000 + 1) * 28_800_000),
+                }
+                for base in market.bases
+            ]
+        )
+
+    def index_tickers(params: dict):
+        if params.get("quoteCcy", QUOTE) != QUOTE:
+            return wrap([])
+        rows = []
+        for base in market.bases:
+            _, index = market.mark_index(base)
+            rows.append({"instId": f"{base}-{QUOTE}", "idxPx": index, "ts": str(now_ms())})
+        return wrap(rows)
+
+    def instruments(params: dict):
+        swap = params.get("instType", "SPOT").upper() == "SWAP"
+        rows = []
+        for base in market.bases:
+            venue = "okx-swap" if swap else "okx-spot"
+            rows.append(
+                {
+                    "instType": "SWAP" if swap else "SPOT",
+                    "instId": okx_inst_id(venue, base),
+                    "uly": f"{base}-{QUOTE}" if swap else "",
+                    "baseCcy": "" if swap else base,
+                    "quoteCcy": "" if swap else QUOTE,
+                    "tickSz": market.tick_size(base),
+                    "ctVal": "1" if swap else "",
+                    "ctMult": "1" if swap else "",
+                    "state": "live",
+                }
+            )
+        return wrap(rows)
+
+    routes = [
+        ("/api/v5/market/tickers", tickers),
+        ("/api/v5/market/ticker", single_ticker),
+        ("/api/v5/public/mark-price", mark_price),
+        ("/api/v5/public/funding-rate", funding_rate),
+        ("/api/v5/market/index-tickers", index_tickers),
+        ("/api/v5/public/instruments", instruments),
+    ]
+    for path, build in routes:
+        add_rest(app, sim, "okx", "/okx", path, build)
+
+    # ws: {"op": "subscribe", "args": [{"channel": "tickers" | "bbo-tbt", "instId": "BTC-USDT"}]}
+    # 现货和合约共用一个连接, 按 instId 区分, 这里每个连接只推送首个订阅所属的市场
+    def render(sub: Subscriber, base: str) -> str:
+        channel = (sub.bases or {}).get(base, "tickers")
+        data = ticker(sub.venue, base)
+        arg = {"channel": channel, "instId": data["instId"]}
+        if channel == "bbo-tbt":
+            payload = {
+                "asks": [[data["askPx"], "1", "0", "1"]],
+                "bids": [[data["bidPx"], "1", "0", "1"]],
+                "ts": data["ts"],
+                "seqId": next(market.update_id),
+            }
+            return json.dumps({"arg": arg, "data": [payload]})
+        return json.dumps({"arg": arg, "data": [data]})
+
+    def on_message(sub: Subscriber, raw: str):
+        if raw == "ping":
+            return ["pong"]
+        msg = json.loads(raw)
+        replies = []
+        if msg.get("op") == "subscribe":
+            for arg in msg.get("args", []):
+                inst_id = arg.get("instId", "")
+                if not sub.bases:
+                    sub.venue = "okx-swap" if inst_id.endswith("-SWAP") else "okx-spot"
+                sub.bases[base_of(inst_id)] = arg.get("channel", "tickers")  # type: ignore
+                replies.append(json.dumps({"event": "subscribe", "arg": arg, "connId": "sim"}))
+        return replies
+
+    @app.websocket("/okx/ws/v5/public")
+    async def public(ws: WebSocket):
+        await sim.serve_ws(ws, Subscriber("okx-spot", render, sim.faults), on_message)
+
+
+# ---------------------------------------------------------------- Bybit
+
+
+def bybit_routes(app: FastAPI, sim: Simulator):
+    market = sim.market
+
+    def venue_of(category: str) -> str:
+        return "bybit-swap" if category == "linear" else "bybit-spot"
+
+    def ticker(venue: str, base: str) -> dict:
+        bid, ask, _ = market.quote(venue, base)
+        res = {
+            "symbol": binance_symbol(base),
+            "bid1Price": bid,
+            "bid1Size": "1",
+            "ask1Price": ask,
+            "ask1Size": "1",
+            "lastPrice": bid,
+        }
+        if venue == "bybit-swap":
+            mark, index = market.mark_index(base)
+            res.update(
+                markPrice=mark, indexPrice=index, fundingRate=f"{market.funding[base]:.8f}"
+            )
+        return res
+
+    def wrap(category: str, rows: list, cursor: str | None = None) -> dict:
+        result: dict = {"category": category, "list": rows}
+        if cursor is not None:
+            result["nextPageCursor"] = cursor
+        return {"retCode": 0, "retMsg": "OK", "result": result, "retExtInfo": {}, "time": now_ms()}
+
+    def tickers(params: dict):
+        category = params.get("category", "spot")
+        venue = venue_of(category)
+        bases = [base_of(params["symbol"])] if "symbol" in params else market.bases
+        return wrap(category, [ticker(venue, b) for b in bases if b in market.mid])
+
+    def instruments(params: dict):
+        category = params.get("category", "spot")
+        limit = int(params.get("limit", 500))
+        start = int(params.get("cursor") or 0)
+        rows = []
+        for base in market.bases[start : start + limit]:
+            ele = {
+                "symbol": binance_symbol(base),
+                "baseCoin": base,
+                "quoteCoin": QUOTE,
+                "status": "Trading",
+                "priceFilter": {"tickSize": market.tick_size(base)},
+            }
+            if category == "linear":
+                ele["contractType"] = "LinearPerpetual"
+            rows.append(ele)
+        end = start + limit
+        return wrap(category, rows, str(end) if end < len(market.bases) else "")
+
+    add_rest(app, sim, "bybit", "/bybit", "/v5/market/tickers", tickers)
+    add_rest(app, sim, "bybit", "/bybit", "/v5/market/instruments-info", instruments)
+
+    # ws: {"op": "subscribe", "args": ["orderbook.1.BTCUSDT" | "tickers.BTCUSDT"]}
+    def render(sub: Subscriber, base: str) -> str:
+        topic = (sub.bases or {}).get(base, "orderbook.1")
+        data = ticker(sub.venue, base)
+        ts = now_ms()
+        if topic == "tickers":
+            payload = {"symbol": data["symbol"], "bid1Price": data["bid1Price"], "ask1Price": data["ask1Price"]}
+        else:
+            seq = next(market.update_id)
+            payload = {
+                "s": data["symbol"],
+                "b": [[data["bid1Price"], "1"]],
+                "a": [[data["ask1Price"], "1"]],
+                "u": seq,
+                "seq": seq,
+            }
+        return json.dumps(
+            {"topic": f"{topic}.{data['symbol']}", "type": "snapshot", "ts": ts, "data": payload, "cts": ts}
+        )
+
+    def on_message(sub: Subscriber, raw: str):
+        msg = json.loads(raw)
+        op = msg.get("op")
+        if op == "ping":
+            return [json.dumps({"success": True, "ret_msg": "pong", "conn_id": "sim", "op": "ping"})]
+        if op == "subscribe":
+            for ele in msg.get("args", []):
+                topic, _, symbol = ele.rpartition(".")
+                sub.bases[base_of(symbol)] = topic  # type: ignore
+            return [json.dumps({"success": True, "ret_msg": "", "conn_id": "sim", "op": "subscribe"})]
+        return []
+
+    @app.websocket("/bybit/v5/public/{category}")
+    async def public(ws: WebSocket, category: str):
+        await sim.serve_ws(ws, Subscriber(venue_of(category), render, sim.faults), on_message)
+
+
+def add_rest(app: FastAPI, sim: Simulator, exchange: str, prefix: str, path: str, build):
+    async def endpoint(request: Request):
+        return await sim.handle(request, exchange, prefix, build)
+
+    app.add_api_route(prefix + path, endpoint, methods=["GET"])
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    sim = Simulator(args)
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI):
+        task = asyncio.create_task(sim.run_ticks())
+        yield
+        task.cancel()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/sim/stats")
+    def stats():
+        return sim.stats()
+
+    binance_routes(app, sim)
+    okx_routes(app, sim)
+    bybit_routes(app, sim)
+    return app
+
+
+def env_lines(host: str, port: int) -> list[str]:
+    http, ws = f"http://{host}:{port}", f"ws://{host}:{port}"
+    return [
+        f"export BINANCE_SPOT_BASE_URL={http}/binance-spot",
+        f"export BINANCE_UM_BASE_URL={http}/binance-swap",
+        f"export OKX_BASE_URL={http}/okx",
+        f"export BYBIT_BASE_URL={http}/bybit",
+        f"export BINANCE_SPOT_WS_BASE_URL={ws}/binance-spot",
+        f"export BINANCE_UM_WS_BASE_URL={ws}/binance-swap",
+        f"export OKX_WS_BASE_URL={ws}/okx",
+        f"export BYBIT_WS_BASE_URL={ws}/bybit",
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本地交易所模拟")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8391)
+    parser.add_argument("--symbols", type=int, default=500, help="每个盘口的 symbol 数")
+    parser.add_argument("--tick-ms", type=int, default=100, help="行情变化的间隔")
+    parser.add_argument("--move-ratio", type=float, default=0.05, help="每次变化的 symbol 比例")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="rest 请求返回错误的比例")
+    parser.add_argument("--errors", default="429,-1021", help="可选 429, -1021, 500")
+    parser.add_argument("--ws-disconnect-s", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--print-env", action="store_true", help="只输出服务所需的环境变量")
+    args = parser.parse_args()
+
+    if args.print_env:
+        print("\n".join(env_lines(args.host, args.port)))
+        return 0
+
+    print("\n".join(env_lines(args.host, args.port)), file=sys.stderr, flush=True)
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
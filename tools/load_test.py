@@ -0,0 +1,319 @@
+"""/api/watch/book-tickers 的端到端压测
+
+先通过 /api/auth/token 获取 token, 然后按场景的权重混合请求 /api/watch/book-tickers,
+按场景输出吞吐和延迟的 p50 / p95 / p99.
+
+两种发压方式:
+    闭环 (默认)   --concurrency 个并发, 每个收到响应后立即发下一个, 测最大吞吐
+    开环 (--rate) 按固定的总速率发出请求, 最多 --concurrency 个在途; 延迟从计划发出的时间算起,
+                  服务变慢时排队的时间也计入延迟 (避免 coordinated omission), 用于看给定负载下的延迟
+
+场景: 内置的见 SCENARIOS, 也可以用 --scenario 指定 (可重复):
+    --scenario "名称:权重:bookA=binance-spot&bookB=okx-swap&topN=50&symbols=BTCUSDT,ETHUSDT"
+
+服务: 默认压测 --url 上已经运行的服务; --serve 按 start.sh 的方式 (采集进程 + gunicorn UvicornWorker)
+在本地启动服务, 逗号分割的多个 worker 数会依次启动并压测, 用于确定 worker 数:
+
+    # 交易所行情可以使用本地模拟, 见 tools/exchange_sim.py
+    eval "$(python tools/exchange_sim.py --print-env)"
+    python tools/load_test.py --serve 1,2,4 --concurrency 64 --duration 30
+    python tools/load_test.py --url http://127.0.0.1:8387 --rate 200 --json load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+from urllib.parse import parse_qsl
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATCH_PATH = "/api/watch/book-tickers"
+
+# (名称, 权重, 参数)
+SCENARIOS = [
+    ("spot-swap", 4, {"bookA": "binance-spot", "bookB": "binance-swap", "topN": 200}),
+    ("cross-swap", 2, {"bookA": "binance-swap", "bookB": "okx-swap,bybit-swap", "topN": 200}),
+    ("all-books", 1, {"bookA": "binance-spot,okx-spot,bybit-spot", "bookB": "binance-swap,okx-swap,bybit-swap", "topN": 500}),
+    ("top-10", 2, {"bookA": "okx-spot", "bookB": "okx-swap", "topN": 10}),
+    ("symbols", 2, {"bookA": "binance-spot", "bookB": "bybit-swap", "symbols": "BTCUSDT,ETHUSDT,SOLUSDT", "topN": 200}),
+    ("zscore", 1, {"bookA": "binance-spot", "bookB": "binance-swap", "topN": 100, "sortBy": "zscore"}),
+]
+
+
+def parse_scenario(text: str) -> tuple[str, int, dict]:
+    name, weight, query = text.split(":", 2)
+    return name, int(weight), dict(parse_qsl(query))
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.statuses: Counter = Counter()
+        self.bytes = 0
+
+    def add(self, latency_ms: float, status: str, size: int):
+        self.latencies.append(latency_ms)
+        self.statuses[status] += 1
+        self.bytes += size
+
+    def summary(self, elapsed_s: float) -> dict:
+        values = sorted(self.latencies)
+        n = len(values)
+        ok = self.statuses["200"] + self.statuses["304"]
+        return {
+            "requests": n,
+            "ok": ok,
+            "errors": {k: v for k, v in self.statuses.items() if k not in ("200", "304")},
+            "not_modified": self.statuses["304"],
+            "rps": round(n / elapsed_s, 1) if elapsed_s else 0,
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2) if values else 0,
+            "avg_kib": round(self.bytes / max(ok, 1) / 1024, 1),
+        }
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, scenarios: list[tuple[str, int, dict]]):
+        self.args = args
+        self.scenarios = scenarios
+        self.rng = random.Random(args.seed)
+        self.weights = [ele[1] for ele in scenarios]
+        self.stats: dict[str, Stats] = {}
+        # 场景 -> 最近的 ETag, --etag 时带上 If-None-Match
+        self.etags: dict[str, str] = {}
+        self.recording = False
+
+    def pick(self) -> tuple[str, int, dict]:
+        return self.rng.choices(self.scenarios, weights=self.weights)[0]
+
+    async def login(self, client: httpx.AsyncClient) -> str:
+        res = await client.post("/api/auth/token", json={"password": self.args.password})
+        res.raise_for_status()
+        body = res.json()
+        if body.get("code") != 0:
+            raise RuntimeError(f"login failed: {body}")
+        return body["data"]["accessToken"]
+
+    async def request(self, client: httpx.AsyncClient, scheduled: float):
+        name, _, params = self.pick()
+        headers = {}
+        if self.args.etag and name in self.etags:
+            headers["If-None-Match"] = self.etags[name]
+        query = {**params, "layout": self.args.layout}
+
+        try:
+            res = await client.get(WATCH_PATH, params=query, headers=headers)
+            status, size = str(res.status_code), len(res.content)
+            # 业务错误 (参数有误, token 失效) 也是 200, 按 code 区分
+            if res.status_code == 200 and not res.content.startswith(b'{"code":0'):
+                status = "biz_error"
+            etag = res.headers.get("ETag")
+            if etag:
+                self.etags[name] = etag
+        except httpx.HTTPError as e:
+            status, size = type(e).__name__, 0
+
+        if self.recording:
+            latency = (time.perf_counter() - scheduled) * 1000
+            self.stats.setdefault(name, Stats()).add(latency, status, size)
+
+    async def closed_loop(self, client: httpx.AsyncClient, until: float):
+        async def worker():
+            while time.perf_counter() < until:
+                await self.request(client, time.perf_counter())
+
+        await asyncio.gather(*[worker() for _ in range(self.args.concurrency)])
+
+    async def open_loop(self, client: httpx.AsyncClient, until: float):
+        interval = 1 / self.args.rate
+        in_flight = asyncio.Semaphore(self.args.concurrency)
+        tasks: set[asyncio.Task] = set()
+
+        async def one(scheduled: float):
+            async with in_flight:
+                await self.request(client, scheduled)
+
+        next_at = time.perf_counter()
+        while next_at < until:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(one(next_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            next_at += interval
+        await asyncio.gather(*tasks)
+
+    async def run(self, url: str) -> dict:
+        limits = httpx.Limits(
+            max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency
+        )
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=self.args.timeout) as client:
+            token = await self.login(client)
+            client.headers["Authorization"] = f"Bearer {token}"
+            drive = self.open_loop if self.args.rate else self.closed_loop
+
+            if self.args.warmup:
+                await drive(client, time.perf_counter() + self.args.warmup)
+
+            self.stats.clear()
+            self.recording = True
+            start = time.perf_counter()
+            await drive(client, start + self.args.duration)
+            elapsed = time.perf_counter() - start
+            self.recording = False
+
+        total = Stats()
+        for ele in self.stats.values():
+            total.latencies += ele.latencies
+            total.statuses.update(ele.statuses)
+            total.bytes += ele.bytes
+        res = {name: self.stats[name].summary(elapsed) for name, _, _ in self.scenarios if name in self.stats}
+        res["total"] = total.summary(elapsed)
+        return res
+
+
+class Server:
+    """按 start.sh 的方式在本地启动服务: 采集进程 + gunicorn (MARKET_ROLE=reader)"""
+
+    def __init__(self, workers: int, port: int):
+        self.workers = workers
+        self.url = f"http://127.0.0.1:{port}"
+        self.port = port
+        self.procs: list[subprocess.Popen] = []
+
+    def __enter__(self):
+        env = {**os.environ, "MARKET_ROLE": "collector"}
+        self.procs.append(
+            subprocess.Popen([sys.executable, "-m", "app.market.collector"], cwd=ROOT, env=env)
+        )
+        env = {**os.environ, "MARKET_ROLE": "reader"}
+        self.procs.append(
+            subprocess.Popen(
+                [
+                    sys.executable, "-m", "gunicorn",
+                    "-k", "uvicorn.workers.UvicornWorker",
+                    "-w", str(self.workers),
+                    "-b", f"127.0.0.1:{self.port}",
+                    "--log-level", "warning",
+                    "app:fast_app",
+                ],
+                cwd=ROOT,
+                env=env,
+            )
+        )
+        self._wait_ready()
+        return self
+
+    def _wait_ready(self, timeout_s: float = 60):
+        deadline = time.time() + timeout_s
+        while time.time() < deadline:
+            try:
+                if httpx.get(f"{self.url}/openapi.json", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"server not ready in {timeout_s}s: {self.url}")
+
+    def __exit__(self, *exc):
+        for proc in reversed(self.procs):
+            proc.send_signal(signal.SIGTERM)
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def print_table(label: str, res: dict):
+    print(f"\n{label}")
+    header = (
+        f"{'scenario':<12} {'requests':>8} {'ok':>8} {'304':>6} {'rps':>8}"
+        f" {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'avg KiB':>8}  errors"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, s in res.items():
+        errors = ", ".join(f"{k}={v}" for k, v in s["errors"].items())
+        print(
+            f"{name:<12} {s['requests']:>8} {s['ok']:>8} {s['not_modified']:>6} {s['rps']:>8.1f}"
+            f" {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['max_ms']:>8.2f}"
+            f" {s['avg_kib']:>8.1f}  {errors}",
+            flush=True,
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="/api/watch/book-tickers 的端到端压测")
+    parser.add_argument("--url", default="http://127.0.0.1:8387", help="已经运行的服务")
+    parser.add_argument("--serve", help="按 start.sh 的方式启动服务, 值为 worker 数, ',' 分割依次压测")
+    parser.add_argument("--port", type=int, default=8397, help="--serve 时服务的端口")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=0, help="开环发压的总速率 (请求/s), 0 为闭环")
+    parser.add_argument("--duration", type=float, default=20, help="压测时长 s")
+    parser.add_argument("--warmup", type=float, default=3, help="预热时长 s, 不计入结果")
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--layout", default="rows", help="rows / columns")
+    parser.add_argument("--etag", action="store_true", help="带上 If-None-Match, 模拟轮询的前端")
+    parser.add_argument("--scenario", action="append", help="名称:权重:查询参数, 指定后不使用内置场景")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="结果写入该文件")
+    args = parser.parse_args()
+
+    scenarios = [parse_scenario(ele) for ele in args.scenario] if args.scenario else SCENARIOS
+    mode = f"open loop {args.rate}/s" if args.rate else "closed loop"
+    results = {}
+
+    if args.serve:
+        for workers in [int(ele) for ele in args.serve.split(",")]:
+            with Server(workers, args.port) as server:
+                res = asyncio.run(LoadTest(args, scenarios).run(server.url))
+            label = f"workers={workers}"
+            results[label] = res
+            print_table(f"{label}, concurrency={args.concurrency}, {mode}", res)
+    else:
+        res = asyncio.run(LoadTest(args, scenarios).run(args.url))
+        results[args.url] = res
+        print_table(f"{args.url}, concurrency={args.concurrency}, {mode}", res)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "concurrency": args.concurrency,
+                    "rate": args.rate,
+                    "duration": args.duration,
+                    "layout": args.layout,
+                    "etag": args.etag,
+                    "scenarios": [{"name": n, "weight": w, "params": p} for n, w, p in scenarios],
+                    "results": results,
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())